@@ -0,0 +1,186 @@
+"""
+API 서버 부하 테스트 - 세션 하나를 동시에 폴링하는 학생 N명 흉내
+각 클라이언트는 keep-alive 연결 하나로 입장 후 since 커서로 새 메시지를 계속 가져옴
+
+실행:
+    python loadtest.py --clients 500 --duration 20
+    python loadtest.py --spawn --clients 500   # server.py를 직접 띄워서 측정
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+class HttpConnection:
+    """keep-alive HTTP/1.1 연결 하나 (응답은 JSON)"""
+    
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+    
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+    
+    async def request(self, method, path, payload=None):
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "\r\n"
+        )
+        self.writer.write(head.encode('latin-1') + body)
+        await self.writer.drain()
+        
+        status_line, _, header_block = (await self.reader.readuntil(b"\r\n\r\n")).decode('latin-1').partition("\r\n")
+        headers = {}
+        for line in header_block.split("\r\n"):
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        data = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        return int(status_line.split(' ')[1]), json.loads(data) if data else None
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+class LoadStats:
+    """요청 지연 시간 / 오류 집계"""
+    
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.messages_received = 0
+    
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+async def poll_client(index, host, port, session_id, interval, stats, ready):
+    """학생 한 명: 입장 → since 커서로 폴링 반복 (취소될 때까지)"""
+    conn = HttpConnection(host, port)
+    try:
+        await conn.connect()
+        await conn.request('POST', f"/api/session/{session_id}/participant", {'username': f"학생{index}"})
+    except (OSError, asyncio.IncompleteReadError):
+        stats.errors += 1
+        ready.release()
+        return
+    ready.release()
+    
+    cursor = 0
+    try:
+        while True:
+            started = time.perf_counter()
+            status, data = await conn.request('GET', f"/api/session/{session_id}/messages?since={cursor}")
+            stats.latencies.append(time.perf_counter() - started)
+            if status != 200:
+                stats.errors += 1
+            else:
+                stats.messages_received += len(data['messages'])
+                cursor = data['cursor']
+            if interval:
+                await asyncio.sleep(interval)
+    except (OSError, asyncio.IncompleteReadError):
+        stats.errors += 1
+    finally:
+        conn.close()
+
+async def send_messages(host, port, session_id, deadline, rate):
+    """강사 한 명: 초당 rate개 메시지 전송"""
+    if rate <= 0:
+        return 0
+    conn = HttpConnection(host, port)
+    await conn.connect()
+    sent = 0
+    try:
+        while time.monotonic() < deadline:
+            await conn.request('POST', f"/api/session/{session_id}/message",
+                               {'username': '강사', 'message': f"공지 {sent}", 'type': 'instructor'})
+            sent += 1
+            await asyncio.sleep(1 / rate)
+    finally:
+        conn.close()
+    return sent
+
+async def run(url, clients, duration, interval, send_rate):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    
+    setup = HttpConnection(host, port)
+    await setup.connect()
+    _, data = await setup.request('POST', "/api/session")
+    setup.close()
+    session_id = data['session_id']
+    
+    stats = LoadStats()
+    ready = asyncio.Semaphore(0)
+    tasks = [
+        asyncio.create_task(poll_client(i, host, port, session_id, interval, stats, ready))
+        for i in range(clients)
+    ]
+    # 모든 클라이언트가 입장한 뒤부터 측정
+    for _ in range(clients):
+        await ready.acquire()
+    stats.latencies.clear()
+    started = time.monotonic()
+    deadline = started + duration
+    sender = asyncio.create_task(send_messages(host, port, session_id, deadline, send_rate))
+    
+    await asyncio.sleep(duration)
+    elapsed = time.monotonic() - started
+    requests_done = len(stats.latencies)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    sent = await sender
+    
+    print(f"클라이언트 {clients}명, {elapsed:.1f}초, 폴링 간격 {interval}s, 전송 {sent}건")
+    print(f"처리량: {requests_done / elapsed:,.0f} req/s (요청 {requests_done:,}건, 오류 {stats.errors}건)")
+    print(
+        "지연 시간: "
+        f"p50 {stats.percentile(50) * 1000:.1f}ms · "
+        f"p95 {stats.percentile(95) * 1000:.1f}ms · "
+        f"p99 {stats.percentile(99) * 1000:.1f}ms · "
+        f"평균 {statistics.fmean(stats.latencies) * 1000 if stats.latencies else 0:.1f}ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="API 서버 부하 테스트")
+    parser.add_argument('--url', default="http://127.0.0.1:5000")
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--interval', type=float, default=0, help="클라이언트별 폴링 간격 (초, 0이면 쉬지 않고 요청)")
+    parser.add_argument('--send-rate', type=float, default=2, help="강사 메시지 전송 속도 (초당)")
+    parser.add_argument('--spawn', action='store_true', help="server.py를 직접 실행해서 측정")
+    args = parser.parse_args()
+    
+    server = None
+    if args.spawn:
+        port = urlsplit(args.url).port or 5000
+        server = subprocess.Popen(
+            [sys.executable, str(Path(__file__).parent / "server.py"), '--host', '127.0.0.1', '--port', str(port)],
+            stdout=subprocess.DEVNULL
+        )
+        time.sleep(1)
+    try:
+        asyncio.run(run(args.url, args.clients, args.duration, args.interval, args.send_rate))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,759 @@
+"""
+강의 실시간 채팅 API 서버 - asyncio 버전
+app_api.py가 사용하는 세션/메시지 API를 메모리 저장소로 제공
+(표준 라이브러리만 사용, msgpack / zstandard가 설치되어 있으면 응답 형식/압축에 씀)
+
+종료된 세션(POST /api/session/<id>/archive)과 --archive-idle 시간 동안 활동이 없던 세션은
+--archive-dir에 세션별 gzip JSON 파일로 옮기고, 이후에는 읽기 전용으로 제공합니다.
+
+POST /api/messages는 여러 세션의 메시지를 요청 하나로 받아 세션마다 잠금 한 번으로 추가하고
+메시지별 결과를 돌려줍니다 (app_api.py의 WriteCoalescer가 몰린 전송을 묶어서 보냄).
+
+세션 GET 응답에는 세션이 바뀔 때마다 올라가는 버전으로 만든 ETag와 (바뀐 초가 지났으면) Last-Modified를 붙이고,
+If-None-Match(없으면 If-Modified-Since)가 지금과 같으면 본문 없이 304로 답합니다.
+
+응답 본문은 Accept에 application/msgpack이 있으면 MessagePack(없으면 JSON)으로,
+COMPRESS_MIN_SIZE 이상이면 Accept-Encoding에 따라 zstd > gzip으로 압축해서 보냅니다.
+
+실행:
+    python server.py --port 5000
+    python server.py --port 5000 --archive-dir ../data/archive --archive-idle 6
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import re
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs
+
+# 메시지 본문의 이스케이프/링크 변환은 앱(storage.py)과 같은 모듈 (저장소 최상위의 message_text.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from message_text import process_text
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 요청 헤더 최대 크기 / 본문 최대 크기 (바이트)
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+
+# 롱 폴링 최대 대기 시간 (초)
+MAX_WAIT = 30.0
+
+# 묶음 전송(POST /api/messages) 한 번에 받을 최대 메시지 수
+MAX_BATCH_SIZE = 500
+
+# 이전 메시지 페이지 기본 / 최대 크기
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# 메모리에 올려둘 보관 세션 수
+ARCHIVE_CACHE_SIZE = 16
+
+# 유휴 세션 확인 간격 (초)
+ARCHIVE_SWEEP_INTERVAL = 60.0
+
+# 모든 응답의 X-API-Version 헤더 (클라이언트가 예전 서버인지 알아보는 데 씀)
+#   1: 헤더 없던 서버, 2: 묶음 전송(POST /api/messages)과 세션 정보(GET /api/session/<id>/info)
+API_VERSION = 2
+
+# 응답 형식 / 이 크기(바이트) 이상인 본문만 압축 (작은 응답은 압축 헤더가 더 큼)
+JSON_TYPE = 'application/json'
+MSGPACK_TYPE = 'application/msgpack'
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 1
+
+# ETag에 붙이는 서버 실행마다 다른 값 (재시작 후 버전 번호가 겹쳐도 예전 ETag와 맞지 않게)
+INSTANCE_ID = uuid.uuid4().hex[:8]
+
+SESSION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+# 클라이언트가 붙여 보내는 메시지 ID (재시도로 같은 메시지가 다시 와도 한 번만 추가)
+MESSAGE_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+STATUS_TEXT = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    409: 'Conflict',
+    413: 'Payload Too Large',
+    431: 'Request Header Fields Too Large',
+    500: 'Internal Server Error',
+}
+
+class ChatSession:
+    """세션 하나의 메시지/참여자 저장소 (쓰기는 세션 잠금 안에서 한 번에 하나씩)"""
+    
+    def __init__(self, session_id):
+        self.id = session_id
+        self.created_at = datetime.now().isoformat()
+        self.messages = []
+        # 메시지 ID → 메시지 (재시도로 다시 온 메시지 확인용)
+        self.messages_by_id = {}
+        self.participants = {}
+        self.last_active = time.time()
+        # 메시지/참여자/보관 상태가 바뀔 때마다 올라감 (ETag, Last-Modified)
+        self.version = 0
+        self.modified_at = time.time()
+        # 보관된 세션은 읽기 전용
+        self.archived = False
+        self.lock = asyncio.Lock()
+        # 새 메시지가 오면 set 되고 새 Event로 교체됨 (기다리던 모든 요청에 전달)
+        self._new_message = asyncio.Event()
+    
+    async def append(self, msg):
+        """메시지 추가 (다음 seq를 붙여서) 후 기다리는 요청들에 알림 → 저장된 메시지"""
+        return (await self.append_many([msg]))[0]
+    
+    async def append_many(self, msgs):
+        """메시지 여러 개를 잠금 한 번으로 추가 (기다리는 요청들에는 한 번만 알림) → 저장된 메시지 목록
+        
+        이미 있는 ID의 메시지(응답을 못 받은 클라이언트의 재시도)는 다시 추가하지 않고 처음 것을 돌려줌
+        """
+        stored = []
+        added = False
+        async with self.lock:
+            if self.archived:
+                # 보관 직전에 세션을 받아간 요청
+                raise HttpError(409, '종료된 세션입니다')
+            for msg in msgs:
+                existing = self.messages_by_id.get(msg['id'])
+                if existing is not None:
+                    stored.append(existing)
+                    continue
+                msg['seq'] = len(self.messages) + 1
+                self.messages.append(msg)
+                self.messages_by_id[msg['id']] = msg
+                stored.append(msg)
+                added = True
+            if added:
+                self.touch()
+            self.last_active = time.time()
+            event, self._new_message = self._new_message, asyncio.Event()
+        event.set()
+        return stored
+    
+    async def add_participant(self, username):
+        """참여자 추가"""
+        async with self.lock:
+            self.participants[username] = {
+                'joined_at': datetime.now().isoformat()
+            }
+            self.touch()
+    
+    def touch(self):
+        """내용이 바뀜 (세션 잠금 안에서 호출)"""
+        self.version += 1
+        self.modified_at = time.time()
+    
+    def etag(self):
+        """지금 버전의 ETag (압축 여부와 상관없이 같은 내용이므로 약한 ETag)"""
+        suffix = 'a' if self.archived else ''
+        return f'W/"{INSTANCE_ID}-{self.version}{suffix}"'
+    
+    def messages_since(self, since):
+        """since 커서(이미 받은 메시지 수) 이후의 메시지와 다음 커서"""
+        return self.messages[since:], len(self.messages)
+    
+    def messages_before(self, before, limit):
+        """before(메시지 위치) 바로 앞의 최대 limit개와 더 이전 페이지용 커서 (없으면 None)"""
+        end = len(self.messages) if before is None else min(before, len(self.messages))
+        start = max(end - limit, 0)
+        return self.messages[start:end], start or None
+    
+    async def wait_for_messages(self, since, timeout):
+        """since 이후 메시지가 생길 때까지 최대 timeout초 대기 (롱 폴링)"""
+        if since < len(self.messages) or timeout <= 0:
+            return self.messages_since(since)
+        event = self._new_message
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.messages_since(since)
+    
+    def to_dict(self, since=0, limit=None):
+        """세션 정보 (limit을 주면 since 대신 최근 limit개와 'before' 커서)"""
+        data = {
+            'id': self.id,
+            'created_at': self.created_at,
+            'participants': self.participants,
+            'cursor': len(self.messages)
+        }
+        if limit is not None:
+            data['messages'], data['before'] = self.messages_before(None, limit)
+        else:
+            data['messages'], data['cursor'] = self.messages_since(since)
+        if self.archived:
+            data['archived'] = True
+        return data
+    
+    def to_record(self):
+        """보관 파일에 쓸 세션 전체"""
+        return {
+            'id': self.id,
+            'created_at': self.created_at,
+            'participants': self.participants,
+            'messages': self.messages,
+            'archived_at': int(time.time() * 1000)
+        }
+    
+    @classmethod
+    def from_record(cls, record):
+        """보관 파일 → 읽기 전용 세션"""
+        session = cls(record['id'])
+        session.created_at = record.get('created_at', session.created_at)
+        session.participants = record.get('participants', {})
+        session.messages = record.get('messages', [])
+        session.messages_by_id = {msg['id']: msg for msg in session.messages if 'id' in msg}
+        session.modified_at = record.get('archived_at', session.modified_at * 1000) / 1000
+        session.archived = True
+        return session
+
+class ChatStore:
+    """메모리 세션 저장소 (archive_dir을 주면 종료/유휴 세션을 압축 파일로 보관)"""
+    
+    def __init__(self, archive_dir=None):
+        self.sessions = {}
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self.archived = OrderedDict()
+        # 보관된 세션 색인 (세션 ID → 생성 시각 / 메시지 수), 보관 파일을 열지 않고 입장 확인
+        self.archive_index = {}
+        if self.archive_dir is not None:
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            self.archive_index = load_archive_index(self.archive_dir)
+    
+    async def create_session(self):
+        session_id = f"session-{int(time.time())}-{uuid.uuid4().hex[:6]}"
+        session = ChatSession(session_id)
+        self.sessions[session_id] = session
+        await session.append(make_system_message("세션이 시작되었습니다"))
+        return session
+    
+    def info(self, session_id):
+        """세션 메타데이터 (메시지 없이, 없으면 None)"""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            return {
+                'id': session_id,
+                'created_at': session.created_at,
+                'state': 'active',
+                'message_count': len(session.messages)
+            }
+        entry = self.archive_index.get(session_id)
+        if entry is None:
+            return None
+        return {'id': session_id, **entry}
+    
+    def archive_path(self, session_id):
+        if self.archive_dir is None or not SESSION_ID_PATTERN.fullmatch(session_id):
+            return None
+        return self.archive_dir / f"{session_id}.json.gz"
+    
+    async def get(self, session_id):
+        """진행 중인 세션, 없으면 보관된 세션 (둘 다 없으면 None)"""
+        session = self.sessions.get(session_id)
+        if session is not None:
+            return session
+        session = self.archived.get(session_id)
+        if session is not None:
+            self.archived.move_to_end(session_id)
+            return session
+        path = self.archive_path(session_id)
+        if path is None or not path.exists():
+            return None
+        record = await asyncio.to_thread(read_archive, path)
+        session = ChatSession.from_record(record)
+        self.archived[session_id] = session
+        while len(self.archived) > ARCHIVE_CACHE_SIZE:
+            self.archived.popitem(last=False)
+        return session
+    
+    async def archive(self, session_id):
+        """세션을 압축 파일로 옮기고 메모리에서 삭제 → 성공 여부"""
+        session = self.sessions.get(session_id)
+        if session is None or self.archive_dir is None:
+            return False
+        async with session.lock:
+            await asyncio.to_thread(write_archive, self.archive_path(session_id), session.to_record())
+            session.archived = True
+            session.touch()
+        entry = {'created_at': session.created_at, 'state': 'archived', 'message_count': len(session.messages)}
+        self.archive_index[session_id] = entry
+        await asyncio.to_thread(append_archive_index, self.archive_dir, {'id': session_id, **entry})
+        del self.sessions[session_id]
+        return True
+    
+    async def archive_idle(self, max_idle_seconds):
+        """마지막 활동 후 max_idle_seconds가 지난 세션을 모두 보관 → 보관한 세션 ID 목록"""
+        cutoff = time.time() - max_idle_seconds
+        idle = [session.id for session in self.sessions.values() if session.last_active < cutoff]
+        return [session_id for session_id in idle if await self.archive(session_id)]
+
+def write_archive(path, record):
+    """보관 파일 쓰기 (임시 파일에 쓴 뒤 교체)"""
+    tmp_path = path.with_suffix('.tmp')
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(record, f, ensure_ascii=False, separators=(',', ':'))
+    tmp_path.replace(path)
+
+def read_archive(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def append_archive_index(archive_dir, record):
+    with open(archive_dir / "index.jsonl", 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def load_archive_index(archive_dir):
+    """보관 색인 읽기 (색인 파일이 없으면 보관 파일을 한 번 훑어서 만듦)"""
+    index = {}
+    path = archive_dir / "index.jsonl"
+    if path.exists():
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.endswith("\n"):
+                    record = json.loads(line)
+                    index[record.pop('id')] = record
+        return index
+    for archive_path in archive_dir.glob("*.json.gz"):
+        record = read_archive(archive_path)
+        index[record['id']] = {
+            'created_at': record.get('created_at'),
+            'state': 'archived',
+            'message_count': len(record.get('messages', []))
+        }
+    with open(path, 'w', encoding='utf-8') as f:
+        for session_id, entry in index.items():
+            f.write(json.dumps({'id': session_id, **entry}, ensure_ascii=False) + "\n")
+    return index
+
+def make_message(username, message, msg_type='student'):
+    """일반 메시지 레코드 (시각은 epoch 밀리초 'ts', seq는 세션에 추가할 때 붙음)"""
+    ts = time.time_ns() // 1_000_000
+    return {
+        'id': f"msg-{ts}-{uuid.uuid4().hex[:6]}",
+        'username': username,
+        'message': message,
+        'type': msg_type,
+        'ts': ts,
+        **process_text(message)
+    }
+
+def make_system_message(text):
+    """시스템 메시지 레코드 (이름이 들어갈 수 있으므로 HTML은 이스케이프만)"""
+    ts = time.time_ns() // 1_000_000
+    return {
+        'id': f"sys-{ts}-{uuid.uuid4().hex[:6]}",
+        'text': text,
+        'type': 'system',
+        'ts': ts,
+        'html': process_text(text, linkify=False)['html']
+    }
+
+def build_message(data):
+    """요청 본문 → 메시지 레코드 (비어 있으면 400, 올바른 'id'가 있으면 그 ID를 그대로 씀)"""
+    msg_type = str(data.get('type') or 'student')
+    message = str(data.get('text' if msg_type == 'system' else 'message', '')).strip()
+    if not message:
+        raise HttpError(400, '메시지가 비어 있습니다')
+    if msg_type == 'system':
+        msg = make_system_message(message)
+    else:
+        msg = make_message(str(data.get('username') or '익명'), message, msg_type)
+    msg_id = data.get('id')
+    if isinstance(msg_id, str) and MESSAGE_ID_PATTERN.fullmatch(msg_id):
+        msg['id'] = msg_id
+    return msg
+
+class HttpError(Exception):
+    """HTTP 오류 응답"""
+    
+    def __init__(self, status, error):
+        super().__init__(error)
+        self.status = status
+        self.error = error
+
+class Request:
+    """파싱된 HTTP 요청 (처리 함수가 응답 헤더를 response_headers에 추가)"""
+    
+    def __init__(self, method, target, version, headers, body):
+        self.method = method
+        self.version = version
+        self.headers = headers
+        self.body = body
+        self.response_headers = {}
+        parts = urlsplit(target)
+        self.path = parts.path
+        self.query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+    
+    @property
+    def keep_alive(self):
+        connection = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+    
+    def json(self):
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            raise HttpError(400, '잘못된 JSON 본문')
+        if not isinstance(data, dict):
+            raise HttpError(400, 'JSON 객체가 필요합니다')
+        return data
+    
+    def int_param(self, name, default=0):
+        value = self.query.get(name)
+        if value is None or value == '':
+            return default
+        try:
+            return max(int(value), 0)
+        except ValueError:
+            raise HttpError(400, f"잘못된 {name} 값")
+    
+    def float_param(self, name, default=0.0):
+        value = self.query.get(name)
+        if value is None or value == '':
+            return default
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            raise HttpError(400, f"잘못된 {name} 값")
+
+async def read_request(reader):
+    """연결에서 요청 하나 읽기 (연결이 닫혔으면 None)"""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, '요청 헤더가 너무 큽니다')
+    
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, version = lines[0].split(' ', 2)
+    except ValueError:
+        raise HttpError(400, '잘못된 요청')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(400, '잘못된 Content-Length')
+    if length > MAX_BODY_SIZE:
+        raise HttpError(413, '요청 본문이 너무 큽니다')
+    body = await reader.readexactly(length) if length else b''
+    return Request(method.upper(), target, version, headers, body)
+
+def accepts(header, value):
+    """Accept / Accept-Encoding 헤더 값에 value가 q > 0으로 들어 있는지"""
+    for item in (header or '').split(','):
+        name, *params = item.split(';')
+        if name.strip().lower() != value:
+            continue
+        for param in params:
+            key, _, q = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    return float(q) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+def negotiate(request):
+    """요청에 맞는 (응답 형식, 압축 방식 또는 None)"""
+    media_type = JSON_TYPE
+    if msgpack is not None and accepts(request.headers.get('accept'), MSGPACK_TYPE):
+        media_type = MSGPACK_TYPE
+    accept_encoding = request.headers.get('accept-encoding')
+    if zstandard is not None and accepts(accept_encoding, 'zstd'):
+        return media_type, 'zstd'
+    if accepts(accept_encoding, 'gzip'):
+        return media_type, 'gzip'
+    return media_type, None
+
+def encode_body(payload, media_type=JSON_TYPE):
+    """응답 객체 → 본문 바이트"""
+    if media_type == MSGPACK_TYPE:
+        return msgpack.packb(payload)
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+def compress_body(body, encoding):
+    """본문 압축 (gzip은 mtime을 고정해서 같은 내용이면 같은 바이트)"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def build_response(status, payload, keep_alive=True, headers=None, media_type=JSON_TYPE, encoding=None):
+    """응답 바이트 만들기 (payload가 None이면 본문 없이: 304)"""
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}"]
+    body = b''
+    if payload is not None:
+        body = encode_body(payload, media_type)
+        charset = '; charset=utf-8' if media_type == JSON_TYPE else ''
+        lines.append(f"Content-Type: {media_type}{charset}")
+        if encoding is not None and len(body) >= COMPRESS_MIN_SIZE:
+            body = compress_body(body, encoding)
+            lines.append(f"Content-Encoding: {encoding}")
+        lines.append(f"Content-Length: {len(body)}")
+    lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+    lines.append(f"X-API-Version: {API_VERSION}")
+    lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body
+
+def not_modified(request, etag, modified_at):
+    """조건부 GET: 클라이언트가 가진 것이 지금과 같은지 (If-None-Match가 있으면 If-Modified-Since는 보지 않음)"""
+    tags = request.headers.get('if-none-match')
+    if tags is not None:
+        # 약한 비교 (W/ 접두사 무시)
+        tags = {tag.strip().removeprefix('W/') for tag in tags.split(',')}
+        return '*' in tags or etag.removeprefix('W/') in tags
+    since = request.headers.get('if-modified-since')
+    if not since:
+        return False
+    try:
+        since = parsedate_to_datetime(since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # Last-Modified는 초 단위이고 바뀐 초가 지난 뒤에만 주므로, 그 초까지 바뀐 내용은 클라이언트에 있음
+    return int(modified_at) <= since
+
+class ChatServer:
+    """asyncio 기반 채팅 API 서버"""
+    
+    def __init__(self, store=None):
+        self.store = store or ChatStore()
+        self.request_count = 0
+    
+    async def handle_connection(self, reader, writer):
+        """keep-alive 연결 하나에서 요청을 차례대로 처리"""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                    if request is None:
+                        break
+                    status, payload = await self.dispatch(request)
+                    keep_alive = request.keep_alive
+                    headers = request.response_headers
+                    media_type, encoding = negotiate(request)
+                    headers['Vary'] = 'Accept, Accept-Encoding'
+                except HttpError as e:
+                    status, payload, keep_alive = e.status, {'success': False, 'error': e.error}, False
+                    headers, media_type, encoding = None, JSON_TYPE, None
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                except Exception as e:
+                    status, payload, keep_alive = 500, {'success': False, 'error': str(e)}, False
+                    headers, media_type, encoding = None, JSON_TYPE, None
+                
+                self.request_count += 1
+                writer.write(build_response(status, payload, keep_alive, headers, media_type, encoding))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+    
+    async def dispatch(self, request):
+        """경로에 맞는 처리 함수 호출 → (상태 코드, JSON 응답)"""
+        parts = [part for part in request.path.split('/') if part]
+        method = request.method
+        
+        if not parts:
+            if method == 'GET':
+                return 200, {'success': True, 'status': 'ok', 'sessions': len(self.store.sessions), 'api_version': API_VERSION}
+            raise HttpError(405, '허용되지 않는 메서드')
+        
+        if parts == ['api', 'session']:
+            if method == 'POST':
+                session = await self.store.create_session()
+                return 200, {'success': True, 'session_id': session.id}
+            raise HttpError(405, '허용되지 않는 메서드')
+        
+        if parts == ['api', 'messages']:
+            if method == 'POST':
+                return 200, await self.post_messages(request)
+            raise HttpError(405, '허용되지 않는 메서드')
+        
+        if parts[:2] == ['api', 'session'] and parts[3:] == ['info']:
+            # 입장 확인용: 보관 파일을 열지 않고 색인만 봄
+            if method != 'GET':
+                raise HttpError(405, '허용되지 않는 메서드')
+            info = self.store.info(parts[2])
+            if info is None:
+                raise HttpError(404, '세션을 찾을 수 없습니다')
+            return 200, {'success': True, 'info': info}
+        
+        if len(parts) in (3, 4) and parts[:2] == ['api', 'session']:
+            session = await self.store.get(parts[2])
+            if session is None:
+                raise HttpError(404, '세션을 찾을 수 없습니다')
+            action = parts[3] if len(parts) == 4 else None
+            handler = {
+                (None, 'GET'): self.get_session,
+                ('messages', 'GET'): self.get_messages,
+                ('message', 'POST'): self.post_message,
+                ('participant', 'POST'): self.post_participant,
+                ('archive', 'POST'): self.post_archive,
+            }.get((action, method))
+            if handler is None:
+                raise HttpError(404, '지원하지 않는 요청')
+            if session.archived and method == 'POST' and action != 'archive':
+                raise HttpError(409, '종료된 세션입니다')
+            payload = await handler(session, request)
+            if method == 'GET':
+                # 응답을 만든 직후의 버전 (await 없이 이어지므로 응답 내용과 같은 시점)
+                etag = session.etag()
+                request.response_headers.update({'ETag': etag, 'Cache-Control': 'no-cache'})
+                # Last-Modified는 초 단위라 바뀐 그 초 안에 준 값은 같은 초의 다음 변경과 구별되지 않음
+                # → 그 초가 지난 뒤에만 붙임 (그 전에는 ETag로만 확인)
+                if int(session.modified_at) < int(time.time()):
+                    request.response_headers['Last-Modified'] = formatdate(session.modified_at, usegmt=True)
+                if not_modified(request, etag, session.modified_at):
+                    return 304, None
+            return 200, payload
+        
+        raise HttpError(404, '지원하지 않는 경로')
+    
+    async def get_session(self, session, request):
+        since = request.int_param('since', None)
+        limit = request.int_param('limit', None)
+        if since is not None or limit is None:
+            return {'success': True, 'session': session.to_dict(since or 0)}
+        return {'success': True, 'session': session.to_dict(limit=min(limit, MAX_PAGE_SIZE))}
+    
+    async def get_messages(self, session, request):
+        # before가 있거나 since 없이 limit만 있으면 이전 메시지 페이지 (최신부터 거꾸로)
+        before = request.int_param('before', None)
+        limit = request.int_param('limit', None)
+        if before is not None or (limit is not None and 'since' not in request.query):
+            messages, older = session.messages_before(before, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+            return {'success': True, 'messages': messages, 'before': older}
+        
+        # wait > 0이면 새 메시지가 올 때까지 기다렸다가 응답 (롱 폴링)
+        wait = min(request.float_param('wait'), MAX_WAIT)
+        messages, cursor = await session.wait_for_messages(request.int_param('since'), wait)
+        return {'success': True, 'messages': messages, 'cursor': cursor}
+    
+    async def post_message(self, session, request):
+        msg = await session.append(build_message(request.json()))
+        return {'success': True, 'message': msg}
+    
+    async def post_messages(self, request):
+        """여러 세션의 메시지를 한 번에 추가 → 보낸 순서대로 메시지별 결과"""
+        items = request.json().get('messages')
+        if not isinstance(items, list) or not items:
+            raise HttpError(400, '메시지가 비어 있습니다')
+        if len(items) > MAX_BATCH_SIZE:
+            raise HttpError(413, f'한 번에 최대 {MAX_BATCH_SIZE}개까지 보낼 수 있습니다')
+        
+        results = [None] * len(items)
+        by_session = {}
+        for i, item in enumerate(items):
+            try:
+                msg = build_message(item if isinstance(item, dict) else {})
+            except HttpError as e:
+                results[i] = {'success': False, 'error': e.error}
+                continue
+            by_session.setdefault(str(item.get('session_id', '')), []).append((i, msg))
+        
+        # 세션마다 잠금 한 번 (같은 세션 안에서는 보낸 순서대로 seq)
+        for session_id, entries in by_session.items():
+            session = await self.store.get(session_id)
+            if session is None:
+                error = '세션을 찾을 수 없습니다'
+            else:
+                try:
+                    stored = await session.append_many([msg for _, msg in entries])
+                    entries = [(i, msg) for (i, _), msg in zip(entries, stored)]
+                    error = None
+                except HttpError as e:
+                    error = e.error
+            for i, msg in entries:
+                results[i] = {'success': True, 'message': msg} if error is None else {'success': False, 'error': error}
+        return {'success': True, 'results': results}
+    
+    async def post_participant(self, session, request):
+        username = str(request.json().get('username', '')).strip()
+        if not username:
+            raise HttpError(400, '이름이 비어 있습니다')
+        await session.add_participant(username)
+        await session.append(make_system_message(f"{username}님이 입장했습니다"))
+        return {'success': True}
+    
+    async def post_archive(self, session, request):
+        if session.archived:
+            return {'success': True}
+        if self.store.archive_dir is None:
+            raise HttpError(400, '보관 폴더가 설정되지 않았습니다 (--archive-dir)')
+        return {'success': await self.store.archive(session.id)}
+
+async def sweep_idle_sessions(store, max_idle_seconds):
+    """유휴 세션을 주기적으로 보관"""
+    while True:
+        await asyncio.sleep(ARCHIVE_SWEEP_INTERVAL)
+        archived = await store.archive_idle(max_idle_seconds)
+        if archived:
+            print(f"📦 유휴 세션 {len(archived)}개 보관")
+
+async def serve(host, port, archive_dir=None, archive_idle_hours=0):
+    server = ChatServer(ChatStore(archive_dir))
+    listener = await asyncio.start_server(server.handle_connection, host, port, limit=MAX_HEADER_SIZE, backlog=1024)
+    print(f"🚀 API 서버 실행 중: http://{host}:{port}")
+    sweeper = None
+    if archive_dir and archive_idle_hours > 0:
+        sweeper = asyncio.create_task(sweep_idle_sessions(server.store, archive_idle_hours * 3600))
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        if sweeper is not None:
+            sweeper.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="강의 실시간 채팅 API 서버")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--archive-dir', default=None, help="종료/유휴 세션 보관 폴더 (없으면 보관하지 않음)")
+    parser.add_argument('--archive-idle', type=float, default=0, help="이 시간(시간 단위) 동안 활동이 없으면 보관 (0이면 끔)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.archive_dir, args.archive_idle))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,25 @@
 """
 강의 실시간 채팅 시스템 - Streamlit 버전
-Firebase Firestore를 사용한 실시간 채팅
+로컬 파일 저장소를 사용한 실시간 채팅
 """
 
 import streamlit as st
-import qrcode
-from io import BytesIO
-from datetime import datetime
 import time
+import threading
 import uuid
-import json
-import re
 from pathlib import Path
 
+from storage import WriteCoalescer, create_storage, make_message, make_system_message
+from chat_render import get_render_cache, show_history
+from chat_window import show_load_older, sync_window
+from presence import PresenceTracker
+from polling import (
+    auto_refresh_fragment, get_poll_schedule, poll_state, show_live_metric, show_poll_interval, show_poll_panel,
+    track_poll, wake_polling
+)
+from qr_code import get_qr_cache, qr_image
+from metrics import get_metrics_exporter, phase, show_metrics_panel, timed
+
 # 페이지 설정
 st.set_page_config(
     page_title="강의 실시간 채팅",
@@ -78,117 +85,215 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 데이터 저장 (간단한 JSON 파일 사용)
+# 데이터 저장 (저장 방식은 storage.py 참고)
+# - "log": 세션별 append-only 로그 (data/sessions/<세션 ID>.jsonl, 기본값)
+# - "json": 기존 방식 (data/sessions.json 전체를 매번 다시 저장)
+# - "sqlite": SQLite WAL 모드 (data/chat.db, 인덱스로 필요한 행만 읽고 씀)
+# - "memory": 프로세스 메모리 (재시작하면 사라짐)
+# - "http": API 서버 (API_SERVER, app_api.py와 같은 서버)
 DATA_DIR = Path(__file__).parent / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
-def load_sessions():
-    """세션 데이터 로드"""
-    sessions_file = DATA_DIR / "sessions.json"
-    if sessions_file.exists():
-        with open(sessions_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+def get_secret(key, default=None):
+    """Streamlit secrets 값 읽기 (secrets.toml이 없으면 기본값)"""
+    try:
+        return st.secrets.get(key, default)
+    except Exception:
+        return default
+
+STORAGE_MODE = get_secret("STORAGE_MODE", "log")
+API_SERVER = get_secret("API_SERVER", "http://localhost:5000")
+
+# QR 코드 캐시 (메모리 LRU 항목 수, data/qr/ 디스크 캐시 사용 여부)
+QR_CACHE_SIZE = int(get_secret("QR_CACHE_SIZE", 64))
+QR_DISK_CACHE = bool(get_secret("QR_DISK_CACHE", False))
+QR_CACHE_DIR = DATA_DIR / "qr"
+
+# 채팅 기록 렌더링 ("batch": HTML 하나로 묶어서, "per_message": 메시지마다 요소 하나)
+# CHAT_RENDER_CHUNK > 0이면 그 개수씩 나눠서 여러 덩어리로 표시
+CHAT_RENDER_MODE = get_secret("CHAT_RENDER_MODE", "batch")
+CHAT_RENDER_CHUNK = int(get_secret("CHAT_RENDER_CHUNK", 0))
+# 메시지별 HTML 캐시 크기 (프로세스 공용, 0이면 캐시하지 않음)
+CHAT_RENDER_CACHE_SIZE = int(get_secret("CHAT_RENDER_CACHE_SIZE", 5000))
+
+# 채팅 창에 유지할 최근 메시지 수 / "이전 메시지 더 보기" 한 번에 불러올 수
+CHAT_HISTORY_WINDOW = int(get_secret("CHAT_HISTORY_WINDOW", 200))
+CHAT_HISTORY_PAGE = int(get_secret("CHAT_HISTORY_PAGE", 100))
+
+# 학생 화면 새로고침(하트비트)이 이 시간(초) 동안 없으면 접속자 수에서 뺌
+PRESENCE_TTL = float(get_secret("PRESENCE_TTL", 30))
+# 사이드바 "참여자" 숫자만 이 간격(초)으로 다시 그림 (채팅 영역 새로고침과 따로)
+PRESENCE_REFRESH = float(get_secret("PRESENCE_REFRESH", PRESENCE_TTL / 3))
+
+# 자동 새로고침 간격 (초): 새 메시지가 오면 화면별 가장 짧은 간격으로, 조용하면 POLL_BACKOFF배씩 POLL_MAX_INTERVAL까지 늘림
+# 클라이언트마다 ±POLL_JITTER 비율로 간격을 흩어서 새로고침이 한꺼번에 몰리지 않게 함
+# (학생 화면은 접속 하트비트를 겸하므로 PRESENCE_TTL의 2/3을 넘지 않음)
+INSTRUCTOR_POLL_INTERVAL = float(get_secret("INSTRUCTOR_POLL_INTERVAL", 5))
+STUDENT_POLL_INTERVAL = float(get_secret("STUDENT_POLL_INTERVAL", 3))
+POLL_MAX_INTERVAL = float(get_secret("POLL_MAX_INTERVAL", 20))
+POLL_BACKOFF = float(get_secret("POLL_BACKOFF", 2))
+POLL_JITTER = float(get_secret("POLL_JITTER", 0.2))
+
+# 이 시간(시간 단위) 동안 활동이 없는 세션은 data/archive로 보관 (0이면 끔, http 모드는 서버가 담당)
+ARCHIVE_IDLE_HOURS = float(get_secret("ARCHIVE_IDLE_HOURS", 6))
+
+# 단계별 실행 시간 내보내기 (METRICS_FILE: Prometheus 텍스트 파일 경로, METRICS_PORT: 127.0.0.1:<포트>/metrics, 비우거나 0이면 끔)
+# METRICS_SIDEBAR를 켜면 강사 사이드바에 단계별 시간 디버그 패널 표시
+METRICS_FILE = get_secret("METRICS_FILE", "")
+METRICS_PORT = int(get_secret("METRICS_PORT", 0))
+METRICS_SIDEBAR = bool(get_secret("METRICS_SIDEBAR", False))
+
+# 몰린 메시지 전송을 모아서 저장소 쓰기 한 번으로 (WRITE_BATCH_DELAY_MS 동안 또는 WRITE_BATCH_SIZE개까지, 1이면 끔)
+WRITE_BATCH_DELAY_MS = float(get_secret("WRITE_BATCH_DELAY_MS", 5))
+WRITE_BATCH_SIZE = int(get_secret("WRITE_BATCH_SIZE", 64))
+# 쓰기마다 디스크까지 fsync (묶어서 쓰면 묶음마다 한 번, json/log/sqlite만)
+STORAGE_FSYNC = bool(get_secret("STORAGE_FSYNC", False))
 
-def save_sessions(sessions):
-    """세션 데이터 저장"""
-    sessions_file = DATA_DIR / "sessions.json"
-    with open(sessions_file, 'w', encoding='utf-8') as f:
-        json.dump(sessions, f, ensure_ascii=False, indent=2)
+@st.cache_resource
+def get_storage(backend, data_dir, api_server, fsync):
+    """프로세스 전체에서 공유하는 저장소"""
+    return create_storage(backend, data_dir=data_dir, api_server=api_server, fsync=fsync)
 
+def storage():
+    """현재 설정(STORAGE_MODE)의 저장소"""
+    store = get_storage(STORAGE_MODE, DATA_DIR, API_SERVER, STORAGE_FSYNC)
+    if ARCHIVE_IDLE_HOURS > 0:
+        get_idle_archiver(STORAGE_MODE, DATA_DIR, API_SERVER, STORAGE_FSYNC, ARCHIVE_IDLE_HOURS)
+    return store
+
+@st.cache_resource
+def get_write_coalescer(backend, data_dir, api_server, fsync, max_delay_ms, max_batch):
+    """프로세스당 하나뿐인 메시지 쓰기 묶음 스레드 (모든 브라우저 세션 공용)"""
+    return WriteCoalescer(get_storage(backend, data_dir, api_server, fsync), max_delay_ms / 1000, max_batch)
+
+def append_message(session_id, msg):
+    """메시지 레코드 추가 (WRITE_BATCH_SIZE > 1이면 다른 화면의 전송과 묶어서 씀) → 성공 여부"""
+    if WRITE_BATCH_SIZE <= 1:
+        return storage().append_message(session_id, msg)
+    coalescer = get_write_coalescer(
+        STORAGE_MODE, DATA_DIR, API_SERVER, STORAGE_FSYNC, WRITE_BATCH_DELAY_MS, WRITE_BATCH_SIZE
+    )
+    return coalescer.append(session_id, msg)
+
+class IdleArchiver:
+    """백그라운드 스레드에서 유휴 세션을 주기적으로 보관"""
+    
+    def __init__(self, store, max_idle_seconds, interval=600.0):
+        self.store = store
+        self.max_idle_seconds = max_idle_seconds
+        self.interval = interval
+        threading.Thread(target=self._run, name="idle-archiver", daemon=True).start()
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.store.archive_idle_sessions(self.max_idle_seconds)
+            except Exception:
+                # 다음 주기에 다시 시도
+                pass
+
+@st.cache_resource
+def get_idle_archiver(backend, data_dir, api_server, fsync, idle_hours):
+    """프로세스당 하나뿐인 유휴 세션 보관 스레드"""
+    return IdleArchiver(get_storage(backend, data_dir, api_server, fsync), idle_hours * 3600)
+
+@timed("storage.create_session")
 def create_session():
-    """새 세션 생성"""
-    session_id = f"session-{int(time.time())}-{uuid.uuid4().hex[:6]}"
-    sessions = load_sessions()
-    sessions[session_id] = {
-        'id': session_id,
-        'created_at': datetime.now().isoformat(),
-        'messages': [],
-        'participants': {}
-    }
-    save_sessions(sessions)
-    return session_id
+    """새 세션 생성 (시작 시스템 메시지 포함)"""
+    return storage().create_session()
 
+@timed("storage.add_message")
 def add_message(session_id, username, message, user_type='student'):
     """메시지 추가"""
-    sessions = load_sessions()
-    if session_id in sessions:
-        msg = {
-            'id': f"msg-{int(time.time())}-{uuid.uuid4().hex[:6]}",
-            'username': username,
-            'message': message,
-            'type': user_type,
-            'timestamp': datetime.now().isoformat()
-        }
-        sessions[session_id]['messages'].append(msg)
-        save_sessions(sessions)
-        return True
-    return False
+    return append_message(session_id, make_message(username, message, user_type))
 
+@timed("storage.add_participant")
 def add_participant(session_id, username):
-    """참여자 추가"""
-    sessions = load_sessions()
-    if session_id in sessions:
-        sessions[session_id]['participants'][username] = {
-            'joined_at': datetime.now().isoformat()
-        }
-        save_sessions(sessions)
-        # 시스템 메시지 추가
-        add_system_message(session_id, f"{username}님이 입장했습니다")
-        return True
-    return False
+    """참여자 추가 (입장 시스템 메시지 포함)"""
+    return storage().add_participant(session_id, username)
 
+@timed("storage.add_system_message")
 def add_system_message(session_id, text):
     """시스템 메시지 추가"""
-    sessions = load_sessions()
-    if session_id in sessions:
-        msg = {
-            'id': f"sys-{int(time.time())}-{uuid.uuid4().hex[:6]}",
-            'text': text,
-            'type': 'system',
-            'timestamp': datetime.now().isoformat()
-        }
-        sessions[session_id]['messages'].append(msg)
-        save_sessions(sessions)
-
-def get_session(session_id):
-    """세션 정보 가져오기"""
-    sessions = load_sessions()
-    return sessions.get(session_id)
-
-def generate_qr_code(data):
-    """QR 코드 생성"""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # BytesIO로 변환
-    buf = BytesIO()
-    img.save(buf, format='PNG')
-    buf.seek(0)
-    return buf
-
-def linkify_text(text):
-    """텍스트에서 URL을 찾아 클릭 가능한 링크로 변환"""
-    # URL 패턴 (http://, https:// 로 시작하는 URL)
-    url_pattern = r'(https?://[^\s]+)'
-    
-    # URL을 HTML 링크로 변환
-    def replace_url(match):
-        url = match.group(0)
-        return f'<a href="{url}" target="_blank" style="color: #667eea; text-decoration: underline;">{url}</a>'
-    
-    return re.sub(url_pattern, replace_url, text)
+    return append_message(session_id, make_system_message(text))
+
+@timed("storage.get_session")
+def get_session(session_id, since=None, limit=None):
+    """세션 정보 가져오기 (since 커서를 주면 그 이후에 추가된 메시지/참여자만, limit만 주면 최근 limit개)"""
+    return storage().get_session(session_id, since, limit)
+
+@timed("storage.session_info")
+def session_info(session_id):
+    """세션 메타데이터 (생성 시각 / 상태 / 메시지 수, 세션 색인만 읽음, 없으면 None)"""
+    return storage().session_info(session_id)
+
+def session_exists(session_id):
+    """세션 존재 여부 (메시지는 받지 않음, 보관된 세션 포함)"""
+    return session_info(session_id) is not None
+
+@timed("storage.end_session")
+def end_session(session_id):
+    """세션 종료: 종료 메시지를 남기고 압축 보관 파일로 옮김"""
+    add_system_message(session_id, "세션이 종료되었습니다")
+    return storage().archive_session(session_id)
+
+@timed("storage.get_messages")
+def get_messages(session_id, since=None):
+    """since 커서 이후의 새 메시지와 다음 커서 가져오기"""
+    return storage().list_messages(session_id, since)
+
+@timed("storage.get_older_messages")
+def get_older_messages(session_id, before, limit):
+    """before 커서 앞의 이전 메시지와 다음 before 커서 가져오기"""
+    return storage().list_messages_before(session_id, before, limit)
+
+def sync_chat(session_id):
+    """화면용 대화 기록 갱신 (chat_window.sync_window, 학생 화면의 새로고침은 접속 하트비트를 겸함)"""
+    chat = sync_window(session_id, get_session, CHAT_HISTORY_WINDOW)
+    if chat is not None and st.session_state.get('user_type') == 'student':
+        presence().heartbeat(session_id, client_id())
+    return chat
+
+def qr_cache():
+    """현재 설정의 QR 코드 캐시 (QR_DISK_CACHE면 파일에도 저장)"""
+    return get_qr_cache(QR_CACHE_SIZE, QR_CACHE_DIR if QR_DISK_CACHE else None)
+
+@st.cache_resource
+def get_presence(ttl):
+    """프로세스 전체에서 공유하는 접속자 추적"""
+    return PresenceTracker(ttl)
+
+def presence():
+    """현재 설정의 접속자 추적"""
+    return get_presence(PRESENCE_TTL)
+
+def show_participants(session_id):
+    """사이드바 접속자 수 (PRESENCE_REFRESH마다 이 숫자만 다시 그림)"""
+    show_live_metric("참여자", lambda: f"{presence().count(session_id)}명", PRESENCE_REFRESH)
+
+def client_id():
+    """브라우저 세션마다 고정된 클라이언트 ID"""
+    if 'client_id' not in st.session_state:
+        st.session_state.client_id = uuid.uuid4().hex
+    return st.session_state.client_id
+
+def poll_schedule():
+    """현재 화면(강사/학생)의 자동 새로고침 간격 정책"""
+    if st.session_state.get('user_type') == 'student':
+        return get_poll_schedule(STUDENT_POLL_INTERVAL, min(POLL_MAX_INTERVAL, PRESENCE_TTL * 2 / 3), POLL_BACKOFF, POLL_JITTER)
+    return get_poll_schedule(INSTRUCTOR_POLL_INTERVAL, POLL_MAX_INTERVAL, POLL_BACKOFF, POLL_JITTER)
+
+def render_cache():
+    """메시지 HTML 캐시 (CHAT_RENDER_CACHE_SIZE가 0이면 None)"""
+    return get_render_cache(CHAT_RENDER_CACHE_SIZE) if CHAT_RENDER_CACHE_SIZE > 0 else None
 
 # 메인 앱
+@timed("rerun")
 def main():
+    if METRICS_FILE or METRICS_PORT:
+        get_metrics_exporter(METRICS_FILE, METRICS_PORT)
+    
     # URL 파라미터로 모드 결정 (Streamlit 버전 호환)
     try:
         # Streamlit 1.30.0+ 방식
@@ -225,6 +330,7 @@ def main():
     elif st.session_state.user_type == 'student':
         show_student_interface()
 
+@timed("ui.mode_selection")
 def show_mode_selection():
     """모드 선택 화면"""
     st.markdown("""
@@ -249,14 +355,38 @@ def show_mode_selection():
         st.write("QR 코드를 스캔하거나 세션 ID를 입력하세요")
         session_input = st.text_input("세션 ID", key="student_session_id")
         if st.button("학생으로 참여", key="student") and session_input:
-            session = get_session(session_input)
-            if session:
+            if session_exists(session_input):
                 st.session_state.user_type = 'student'
                 st.session_state.session_id = session_input
                 st.rerun()
             else:
                 st.error("유효하지 않은 세션 ID입니다")
 
+@timed("ui.instructor_messages")
+def show_instructor_messages():
+    """강사 화면의 채팅 메시지 (자동 새로고침 때는 이 부분만 다시 실행)"""
+    session = sync_chat(st.session_state.session_id)
+    if not session:
+        return
+    track_poll(poll_schedule(), session, client_id())
+    
+    # 메시지 컨테이너
+    messages_container = st.container()
+    
+    with messages_container:
+        show_load_older(session, get_older_messages, CHAT_HISTORY_PAGE)
+        if not session['messages']:
+            st.info("💡 학생들의 질문과 의견이 여기에 표시됩니다")
+        else:
+            show_history(
+                session['messages'],
+                mode=CHAT_RENDER_MODE,
+                chunk_size=CHAT_RENDER_CHUNK,
+                cache=render_cache(),
+                session_id=st.session_state.session_id
+            )
+
+@timed("ui.instructor")
 def show_instructor_interface():
     """강사 인터페이스"""
     st.markdown("""
@@ -273,24 +403,24 @@ def show_instructor_interface():
             if st.button("🎯 새 세션 시작", use_container_width=True):
                 session_id = create_session()
                 st.session_state.session_id = session_id
-                add_system_message(session_id, "세션이 시작되었습니다")
                 st.rerun()
         else:
-            session = get_session(st.session_state.session_id)
+            session = sync_chat(st.session_state.session_id)
             if session:
                 st.success("🟢 세션 활성")
                 st.info(f"**세션 ID**\n{st.session_state.session_id}")
                 
                 # 참여자 수
-                participant_count = len(session['participants'])
-                st.metric("참여자", f"{participant_count}명")
+                # 접속 중인 학생 수 (하트비트 기준), 누적 입장 수는 참고로
+                show_participants(st.session_state.session_id)
+                st.caption(f"누적 입장 {len(session['participants'])}명")
                 
                 # QR 코드 생성
                 st.markdown("### 📱 QR 코드")
-                app_url = st.secrets.get("APP_URL", "https://lecture-chat.streamlit.app")
+                app_url = get_secret("APP_URL", "https://lecture-chat.streamlit.app")
                 session_url = f"{app_url}?session={st.session_state.session_id}"
                 
-                qr_img = generate_qr_code(session_url)
+                qr_img = qr_image(qr_cache(), session_url)
                 st.image(qr_img, caption="학생들이 스캔", use_column_width=True)
                 
                 st.code(session_url, language=None)
@@ -304,46 +434,34 @@ def show_instructor_interface():
                     use_container_width=True
                 )
                 
-                # 세션 종료
+                # 자동 새로고침 요청 수 (간격 조절 효과)
+                show_poll_panel()
+                
+                # 세션 종료 (기록은 data/archive에 보관되어 링크로 계속 볼 수 있음)
                 if st.button("🚪 세션 종료", use_container_width=True):
+                    end_session(st.session_state.session_id)
                     st.session_state.session_id = None
                     st.session_state.user_type = None
                     st.rerun()
+        
+        if METRICS_SIDEBAR:
+            show_metrics_panel()
     
     # 메인 채팅 영역
     if st.session_state.session_id:
-        session = get_session(st.session_state.session_id)
+        session = sync_chat(st.session_state.session_id)
         
         if session:
             # 채팅 메시지 표시
             st.markdown("### 💬 실시간 채팅")
             
-            # 메시지 컨테이너
-            messages_container = st.container()
-            
-            with messages_container:
-                if not session['messages']:
-                    st.info("💡 학생들의 질문과 의견이 여기에 표시됩니다")
-                else:
-                    for msg in session['messages']:
-                        if msg['type'] == 'system':
-                            st.markdown(f"""
-                            <div class="chat-message system-message">
-                                {msg['text']}
-                            </div>
-                            """, unsafe_allow_html=True)
-                        else:
-                            msg_time = datetime.fromisoformat(msg['timestamp']).strftime('%H:%M')
-                            msg_class = 'instructor-message' if msg['type'] == 'instructor' else 'student-message'
-                            # 링크를 클릭 가능하게 변환
-                            message_with_links = linkify_text(msg['message'])
-                            st.markdown(f"""
-                            <div class="chat-message {msg_class}">
-                                <strong>{msg['username']}</strong> 
-                                <span style="color: #999; font-size: 12px;">{msg_time}</span>
-                                <div style="margin-top: 4px;">{message_with_links}</div>
-                            </div>
-                            """, unsafe_allow_html=True)
+            # 자동 새로고침이 켜져 있으면 채팅 영역만 주기적으로 다시 실행
+            auto_refresh = st.session_state.get('instructor_auto_refresh', True)
+            refresh = auto_refresh_fragment(poll_schedule(), auto_refresh)
+            if refresh:
+                refresh(show_instructor_messages)()
+            else:
+                show_instructor_messages()
             
             # 메시지 입력
             st.markdown("---")
@@ -370,21 +488,85 @@ def show_instructor_interface():
                 )
                 # 메시지 카운터 증가 (입력창 초기화)
                 st.session_state.message_counter += 1
+                # 답이 곧 올 수 있으니 자동 새로고침 간격을 당김
+                wake_polling(poll_schedule())
                 st.rerun()
             
-            # 자동 새로고침 (5초마다)
+            # 자동 새로고침 (새 메시지가 없으면 간격이 점점 늘어남)
             st.markdown("---")
-            if st.checkbox("🔄 자동 새로고침 (5초)", value=True):
-                time.sleep(5)
-                st.rerun()
+            if st.checkbox("🔄 자동 새로고침", value=True, key="instructor_auto_refresh"):
+                show_poll_interval(poll_schedule())
+                if refresh is None:
+                    # fragment를 지원하지 않는 Streamlit 버전은 전체 페이지 새로고침
+                    with phase("sleep"):
+                        time.sleep(poll_state(poll_schedule())['scheduled'])
+                    st.rerun()
             else:
                 if st.button("🔄 수동 새로고침"):
                     st.rerun()
     else:
         st.info("👈 사이드바에서 '새 세션 시작'을 클릭하세요")
 
+@timed("ui.student_messages")
+def show_student_messages():
+    """학생 화면의 채팅 메시지 (자동 새로고침 때는 이 부분만 다시 실행)"""
+    session = sync_chat(st.session_state.session_id)
+    if not session:
+        return
+    if session.get('archived'):
+        # 보는 중에 강사가 세션을 종료함: 전체를 다시 실행해서 입력창을 없앰
+        st.rerun()
+    track_poll(poll_schedule(), session, client_id())
+    
+    messages_container = st.container()
+    
+    with messages_container:
+        show_load_older(session, get_older_messages, CHAT_HISTORY_PAGE)
+        show_history(
+            session['messages'],
+            me=st.session_state.username,
+            mode=CHAT_RENDER_MODE,
+            chunk_size=CHAT_RENDER_CHUNK,
+            cache=render_cache(),
+            session_id=st.session_state.session_id
+        )
+
+@timed("ui.archived")
+def show_archived_session(session):
+    """종료된 세션: 기록만 보여주고 입력창/자동 새로고침 없음"""
+    with st.sidebar:
+        if st.button("🚪 나가기", use_container_width=True):
+            st.session_state.clear()
+            st.rerun()
+    st.info("🔒 종료된 세션입니다. 대화 기록만 볼 수 있습니다.")
+    show_load_older(session, get_older_messages, CHAT_HISTORY_PAGE)
+    show_history(
+        session['messages'],
+        me=st.session_state.username,
+        mode=CHAT_RENDER_MODE,
+        chunk_size=CHAT_RENDER_CHUNK,
+        cache=render_cache(),
+        session_id=st.session_state.session_id
+    )
+
+@timed("ui.student")
 def show_student_interface():
     """학생 인터페이스"""
+    # QR/링크로 바로 들어온 경우도 색인만 보고 확인 (종료된 세션은 이름 없이 기록만 보기)
+    if not st.session_state.username:
+        info = session_info(st.session_state.session_id)
+        if info is None:
+            st.error("유효하지 않은 세션 ID입니다")
+            if st.button("처음으로"):
+                st.session_state.clear()
+                st.rerun()
+            return
+        if info['state'] == 'archived':
+            session = sync_chat(st.session_state.session_id)
+            if session:
+                show_archived_session(session)
+            return
+    
     # 이름 입력
     if not st.session_state.username:
         st.markdown("""
@@ -434,7 +616,7 @@ def show_student_interface():
     </div>
     """, unsafe_allow_html=True)
     
-    session = get_session(st.session_state.session_id)
+    session = sync_chat(st.session_state.session_id)
     
     if not session:
         st.error("세션을 찾을 수 없습니다")
@@ -443,15 +625,19 @@ def show_student_interface():
             st.rerun()
         return
     
+    if session.get('archived'):
+        show_archived_session(session)
+        return
+    
     # 사이드바
     with st.sidebar:
         st.markdown(f"### 👤 {st.session_state.username}")
         st.success("🟢 연결됨")
         
-        participant_count = len(session['participants'])
-        st.metric("참여자", f"{participant_count}명")
+        show_participants(st.session_state.session_id)
         
         if st.button("🚪 나가기", use_container_width=True):
+            presence().leave(st.session_state.session_id, client_id())
             add_system_message(
                 st.session_state.session_id,
                 f"{st.session_state.username}님이 퇴장했습니다"
@@ -459,32 +645,13 @@ def show_student_interface():
             st.session_state.clear()
             st.rerun()
     
-    # 메시지 표시
-    messages_container = st.container()
-    
-    with messages_container:
-        for msg in session['messages']:
-            if msg['type'] == 'system':
-                st.markdown(f"""
-                <div class="chat-message system-message">
-                    {msg['text']}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                msg_time = datetime.fromisoformat(msg['timestamp']).strftime('%H:%M')
-                is_mine = msg.get('username') == st.session_state.username
-                msg_class = 'instructor-message' if msg['type'] == 'instructor' else 'student-message'
-                display_name = '나' if is_mine else msg['username']
-                # 링크를 클릭 가능하게 변환
-                message_with_links = linkify_text(msg['message'])
-                
-                st.markdown(f"""
-                <div class="chat-message {msg_class}">
-                    <strong>{display_name}</strong> 
-                    <span style="color: #999; font-size: 12px;">{msg_time}</span>
-                    <div style="margin-top: 4px;">{message_with_links}</div>
-                </div>
-                """, unsafe_allow_html=True)
+    # 메시지 표시 (자동 새로고침이 켜져 있으면 이 영역만 주기적으로 다시 실행)
+    auto_refresh = st.session_state.get('student_auto_refresh', True)
+    refresh = auto_refresh_fragment(poll_schedule(), auto_refresh)
+    if refresh:
+        refresh(show_student_messages)()
+    else:
+        show_student_messages()
     
     # 메시지 입력
     st.markdown("---")
@@ -511,13 +678,19 @@ def show_student_interface():
         )
         # 메시지 카운터 증가 (입력창 초기화)
         st.session_state.message_counter += 1
+        # 답이 곧 올 수 있으니 자동 새로고침 간격을 당김
+        wake_polling(poll_schedule())
         st.rerun()
     
     # 자동 새로고침
     st.markdown("---")
-    if st.checkbox("🔄 자동 새로고침 (3초)", value=True):
-        time.sleep(3)
-        st.rerun()
+    if st.checkbox("🔄 자동 새로고침", value=True, key="student_auto_refresh"):
+        show_poll_interval(poll_schedule())
+        if refresh is None:
+            # fragment를 지원하지 않는 Streamlit 버전은 전체 페이지 새로고침
+            with phase("sleep"):
+                time.sleep(poll_state(poll_schedule())['scheduled'])
+            st.rerun()
     else:
         if st.button("🔄 수동 새로고침"):
             st.rerun()
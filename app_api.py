@@ -1,14 +1,25 @@
 """
 강의 실시간 채팅 시스템 - Streamlit + 로컬 API 서버 버전
-로컬 Flask API를 통한 세션 데이터 관리
+로컬 API 서버(api-server/server.py)를 통한 세션 데이터 관리
 """
 
 import streamlit as st
-import qrcode
-from io import BytesIO
-from datetime import datetime
 import time
-import requests
+import threading
+import uuid
+from pathlib import Path
+
+from storage import ApiClient, HttpStorage, WriteCoalescer, make_message, make_system_message
+from chat_render import get_render_cache, show_history
+from chat_window import show_load_older, sync_window
+from presence import PresenceTracker
+from polling import (
+    auto_refresh_fragment, get_poll_schedule, poll_state, show_live_metric, show_poll_interval, show_poll_panel,
+    track_poll, wake_polling
+)
+from qr_code import get_qr_cache, qr_image
+from metrics import get_metrics_exporter, phase, show_metrics_panel, timed
+from outbox import Outbox, SendQueue
 
 # 페이지 설정
 st.set_page_config(
@@ -75,106 +86,347 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def get_secret(key, default=None):
+    """Streamlit secrets 값 읽기 (secrets.toml이 없으면 기본값)"""
+    try:
+        return st.secrets.get(key, default)
+    except Exception:
+        return default
+
 # API 서버 URL (Streamlit secrets 또는 기본값)
-if hasattr(st, 'secrets') and 'API_SERVER' in st.secrets:
-    API_SERVER = st.secrets['API_SERVER']
-else:
-    API_SERVER = "http://localhost:5000"
+API_SERVER = get_secret("API_SERVER", "http://localhost:5000")
+
+# 연결 풀 / 재시도 설정
+API_POOL_SIZE = int(get_secret("API_POOL_SIZE", 32))
+API_RETRIES = int(get_secret("API_RETRIES", 2))
+API_BACKOFF = float(get_secret("API_BACKOFF", 0.3))
+
+# 세션/메시지 목록 응답 형식 ("auto": msgpack이 설치되어 있으면 MessagePack, "json") / 압축된 응답 요청 (zstd 또는 gzip)
+API_WIRE_FORMAT = get_secret("API_WIRE_FORMAT", "auto")
+API_COMPRESSION = bool(get_secret("API_COMPRESSION", True))
+
+# 서버 상태 확인 주기 / 상태 유효 시간 (초)
+API_HEALTH_INTERVAL = float(get_secret("API_HEALTH_INTERVAL", 5))
+API_HEALTH_TTL = float(get_secret("API_HEALTH_TTL", 15))
+
+# 로컬 데이터 폴더 (QR 코드 디스크 캐시)
+DATA_DIR = Path(__file__).parent / "data"
+
+# QR 코드 캐시 (메모리 LRU 항목 수, data/qr/ 디스크 캐시 사용 여부)
+QR_CACHE_SIZE = int(get_secret("QR_CACHE_SIZE", 64))
+QR_DISK_CACHE = bool(get_secret("QR_DISK_CACHE", False))
+QR_CACHE_DIR = DATA_DIR / "qr"
+
+# 채팅 기록 렌더링 ("batch": HTML 하나로 묶어서, "per_message": 메시지마다 요소 하나)
+# CHAT_RENDER_CHUNK > 0이면 그 개수씩 나눠서 여러 덩어리로 표시
+CHAT_RENDER_MODE = get_secret("CHAT_RENDER_MODE", "batch")
+CHAT_RENDER_CHUNK = int(get_secret("CHAT_RENDER_CHUNK", 0))
+# 메시지별 HTML 캐시 크기 (프로세스 공용, 0이면 캐시하지 않음)
+CHAT_RENDER_CACHE_SIZE = int(get_secret("CHAT_RENDER_CACHE_SIZE", 5000))
+
+# 채팅 창에 유지할 최근 메시지 수 / "이전 메시지 더 보기" 한 번에 불러올 수
+CHAT_HISTORY_WINDOW = int(get_secret("CHAT_HISTORY_WINDOW", 200))
+CHAT_HISTORY_PAGE = int(get_secret("CHAT_HISTORY_PAGE", 100))
+
+# 학생 화면 새로고침(하트비트)이 이 시간(초) 동안 없으면 접속자 수에서 뺌
+PRESENCE_TTL = float(get_secret("PRESENCE_TTL", 30))
+# 사이드바 "참여자" 숫자만 이 간격(초)으로 다시 그림 (채팅 영역 새로고침과 따로)
+PRESENCE_REFRESH = float(get_secret("PRESENCE_REFRESH", PRESENCE_TTL / 3))
+
+# 자동 새로고침 간격 (초): 새 메시지가 오면 화면별 가장 짧은 간격으로, 조용하면 POLL_BACKOFF배씩 POLL_MAX_INTERVAL까지 늘림
+# 클라이언트마다 ±POLL_JITTER 비율로 간격을 흩어서 새로고침이 한꺼번에 몰리지 않게 함
+# (학생 화면은 접속 하트비트를 겸하므로 PRESENCE_TTL의 2/3을 넘지 않음)
+INSTRUCTOR_POLL_INTERVAL = float(get_secret("INSTRUCTOR_POLL_INTERVAL", 3))
+STUDENT_POLL_INTERVAL = float(get_secret("STUDENT_POLL_INTERVAL", 2))
+POLL_MAX_INTERVAL = float(get_secret("POLL_MAX_INTERVAL", 20))
+POLL_BACKOFF = float(get_secret("POLL_BACKOFF", 2))
+POLL_JITTER = float(get_secret("POLL_JITTER", 0.2))
+
+# 단계별 실행 시간 내보내기 (METRICS_FILE: Prometheus 텍스트 파일 경로, METRICS_PORT: 127.0.0.1:<포트>/metrics, 비우거나 0이면 끔)
+# METRICS_SIDEBAR를 켜면 강사 사이드바에 단계별 시간 디버그 패널 표시
+METRICS_FILE = get_secret("METRICS_FILE", "")
+METRICS_PORT = int(get_secret("METRICS_PORT", 0))
+METRICS_SIDEBAR = bool(get_secret("METRICS_SIDEBAR", False))
+
+# 몰린 메시지 전송을 모아서 묶음 요청 하나로 (WRITE_BATCH_DELAY_MS 동안 또는 WRITE_BATCH_SIZE개까지, 1이면 끔)
+WRITE_BATCH_DELAY_MS = float(get_secret("WRITE_BATCH_DELAY_MS", 5))
+WRITE_BATCH_SIZE = int(get_secret("WRITE_BATCH_SIZE", 64))
+
+# 메시지 전송은 백그라운드 작업자가 하고 화면은 기다리지 않음 ('전송 중'으로 바로 표시)
+# 작업자 하나가 한 번에 메시지 하나를 보내므로 묶음 크기도 작업자 수를 넘지 않음
+SEND_WORKERS = int(get_secret("SEND_WORKERS", 32))
+SEND_RETRIES = int(get_secret("SEND_RETRIES", 3))
+# 브라우저 세션마다 아직 확인받지 못한 메시지 최대 수
+OUTBOX_LIMIT = int(get_secret("OUTBOX_LIMIT", 20))
 
+@st.cache_resource
+def get_api_client(base_url, pool_size, retries, backoff, wire_format, compression):
+    """프로세스 전체에서 공유하는 API 클라이언트 (모든 브라우저 세션/리런 공용)"""
+    return ApiClient(
+        base_url, pool_size=pool_size, retries=retries, backoff=backoff,
+        wire_format=wire_format, compression=compression
+    )
+
+def api_client_config():
+    """get_api_client 인자 전체 (클라이언트를 쓰는 공유 객체도 이걸 캐시 키로 받아서 설정이 바뀌면 같이 새로 만듦)"""
+    return (API_SERVER, API_POOL_SIZE, API_RETRIES, API_BACKOFF, API_WIRE_FORMAT, API_COMPRESSION)
+
+def api_client():
+    """현재 설정의 공유 API 클라이언트"""
+    return get_api_client(*api_client_config())
+
+class ApiHealthMonitor:
+    """백그라운드 스레드에서 API 서버 상태를 주기적으로 확인하는 모니터"""
+    
+    def __init__(self, client, interval=5.0, ttl=15.0):
+        self.client = client
+        self.interval = interval
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._status = {'healthy': False, 'checked_at': 0.0, 'latency': None, 'error': None}
+        # 첫 상태는 바로 확인하고 이후에는 스레드가 주기적으로 갱신
+        self.probe()
+        threading.Thread(target=self._run, name="api-health-monitor", daemon=True).start()
+    
+    def probe(self):
+        """서버에 한 번 요청해서 상태 갱신"""
+        started = time.monotonic()
+        try:
+            response = self.client.get("/", timeout=3)
+            healthy = response.status_code == 200
+            error = None if healthy else f"HTTP {response.status_code}"
+        except Exception as e:
+            healthy, error = False, str(e)
+        checked_at = time.monotonic()
+        with self._lock:
+            self._status = {
+                'healthy': healthy,
+                'checked_at': checked_at,
+                'latency': checked_at - started,
+                'error': error
+            }
+        return healthy
+    
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.probe()
+    
+    def status(self):
+        """마지막으로 확인한 상태 (TTL이 지났으면 stale)"""
+        with self._lock:
+            status = dict(self._status)
+        status['stale'] = time.monotonic() - status['checked_at'] > self.ttl
+        return status
+    
+    def is_healthy(self):
+        """캐시된 상태로 서버 사용 가능 여부 판단 (오래된 상태는 실패로 간주)"""
+        status = self.status()
+        return status['healthy'] and not status['stale']
+
+@st.cache_resource
+def get_health_monitor(client_config, interval, ttl):
+    """프로세스당 하나뿐인 API 서버 상태 모니터"""
+    return ApiHealthMonitor(get_api_client(*client_config), interval=interval, ttl=ttl)
+
+@timed("api.health")
 def check_api_server():
-    """API 서버 연결 확인"""
-    try:
-        response = requests.get(f"{API_SERVER}/", timeout=3)
-        return response.status_code == 200
-    except:
-        return False
+    """API 서버 연결 확인 (모니터의 캐시된 상태만 읽으므로 네트워크 요청 없음)"""
+    return get_health_monitor(api_client_config(), API_HEALTH_INTERVAL, API_HEALTH_TTL).is_healthy()
+
+@st.cache_resource
+def get_storage(client_config):
+    """공유 API 클라이언트를 쓰는 API 서버 저장소"""
+    return HttpStorage(get_api_client(*client_config))
 
+def storage():
+    """현재 설정의 API 서버 저장소"""
+    return get_storage(api_client_config())
+
+@st.cache_resource
+def get_write_coalescer(client_config, max_delay_ms, max_batch):
+    """프로세스당 하나뿐인 메시지 전송 묶음 스레드 (모든 브라우저 세션 공용)"""
+    return WriteCoalescer(get_storage(client_config), max_delay_ms / 1000, max_batch)
+
+def append_message(session_id, msg):
+    """메시지 전송 (WRITE_BATCH_SIZE > 1이면 다른 화면의 전송과 묶어서 POST /api/messages 하나로) → 성공 여부"""
+    if WRITE_BATCH_SIZE <= 1:
+        return storage().append_message(session_id, msg)
+    coalescer = get_write_coalescer(api_client_config(), WRITE_BATCH_DELAY_MS, WRITE_BATCH_SIZE)
+    return coalescer.append(session_id, msg)
+
+@st.cache_resource
+def get_send_queue(client_config, max_delay_ms, max_batch, workers, send_retries, backoff):
+    """프로세스당 하나뿐인 메시지 전송 작업자 (모든 브라우저 세션 공용)"""
+    if max_batch > 1:
+        send = get_write_coalescer(client_config, max_delay_ms, max_batch).append
+    else:
+        send = get_storage(client_config).append_message
+    return SendQueue(send, workers=workers, retries=send_retries, backoff=backoff)
+
+def send_queue():
+    """현재 설정의 메시지 전송 작업자"""
+    return get_send_queue(
+        api_client_config(), WRITE_BATCH_DELAY_MS, WRITE_BATCH_SIZE, SEND_WORKERS, SEND_RETRIES, API_BACKOFF
+    )
+
+def outbox():
+    """이 브라우저 세션의 보낼 메시지 대기열"""
+    if 'outbox' not in st.session_state:
+        st.session_state.outbox = Outbox(OUTBOX_LIMIT)
+    return st.session_state.outbox
+
+@timed("api.create_session")
 def create_session():
     """새 세션 생성"""
     try:
-        response = requests.post(f"{API_SERVER}/api/session", timeout=5)
-        data = response.json()
-        if data.get('success'):
-            return data['session_id']
-        return None
+        return storage().create_session()
     except Exception as e:
         st.error(f"세션 생성 실패: {e}")
         return None
 
-def get_session(session_id):
-    """세션 정보 가져오기"""
+@timed("api.get_session")
+def get_session(session_id, since=None, limit=None):
+    """세션 정보 가져오기 (since 커서를 주면 그 이후의 새 메시지만, limit만 주면 최근 limit개)"""
     try:
-        response = requests.get(f"{API_SERVER}/api/session/{session_id}", timeout=5)
-        data = response.json()
-        if data.get('success'):
-            return data['session']
+        return storage().get_session(session_id, since, limit)
+    except:
         return None
+
+@timed("api.session_info")
+def session_info(session_id):
+    """세션 메타데이터 (생성 시각 / 상태 / 메시지 수, 메시지는 받지 않음, 없으면 None)"""
+    try:
+        return storage().session_info(session_id)
     except:
         return None
 
-def add_message(session_id, username, message, msg_type='student'):
-    """메시지 추가"""
+def session_exists(session_id):
+    """세션 존재 여부 (메시지는 받지 않음, 보관된 세션 포함)"""
+    return session_info(session_id) is not None
+
+@timed("api.end_session")
+def end_session(session_id):
+    """세션 종료: 종료 메시지를 남기고 서버에 보관 요청"""
     try:
-        response = requests.post(
-            f"{API_SERVER}/api/session/{session_id}/message",
-            json={
-                'username': username,
-                'message': message,
-                'type': msg_type
-            },
-            timeout=5
-        )
-        data = response.json()
-        return data.get('success', False)
+        append_message(session_id, make_system_message("세션이 종료되었습니다"))
+        return storage().archive_session(session_id)
     except Exception as e:
-        st.error(f"메시지 전송 실패: {e}")
+        st.error(f"세션 보관 실패: {e}")
         return False
 
+@timed("api.add_message")
+def add_message(session_id, username, message, msg_type='student'):
+    """메시지 보내기 (전송 대기열에 넣고 바로 돌아옴, 서버 전송은 백그라운드) → 넣었는지"""
+    if send_queue().submit(outbox(), session_id, make_message(username, message, msg_type)):
+        return True
+    st.warning("아직 보내는 중인 메시지가 많습니다. 잠시 후 다시 보내세요")
+    return False
+
+def with_pending(chat):
+    """받아온 메시지 + 아직 받아오지 못한 내 메시지 (전송 중/실패 표시, 받아온 것은 대기열에서 뺌)"""
+    box = st.session_state.get('outbox')
+    if box is None:
+        return chat['messages']
+    # 예전 서버가 새 id를 붙여 저장한 내 메시지도 보낸 id로 맞춤
+    box.reconcile(storage().sent_message_ids(msg.get('id') for msg in chat['messages']))
+    return chat['messages'] + box.local_messages(chat['id'])
+
+def retry_failed_messages():
+    """'다시 보내기': 실패한 메시지를 다시 대기열로"""
+    box = outbox()
+    if box.retry_failed():
+        send_queue().kick(box)
+
+def discard_failed_messages():
+    """'지우기': 실패한 메시지 버리기"""
+    outbox().discard_failed()
+
+def show_send_failures():
+    """재시도까지 실패한 메시지가 있으면 다시 보내기 / 지우기"""
+    box = st.session_state.get('outbox')
+    failed = box.failed() if box is not None else 0
+    if not failed:
+        return
+    st.warning(f"⚠️ 메시지 {failed}개를 보내지 못했습니다")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("🔁 다시 보내기", key="outbox_retry", on_click=retry_failed_messages, use_container_width=True)
+    with col2:
+        st.button("🗑️ 지우기", key="outbox_discard", on_click=discard_failed_messages, use_container_width=True)
+
+@timed("api.add_participant")
 def add_participant(session_id, username):
     """참여자 추가"""
     try:
-        response = requests.post(
-            f"{API_SERVER}/api/session/{session_id}/participant",
-            json={'username': username},
-            timeout=5
-        )
-        data = response.json()
-        return data.get('success', False)
+        return storage().add_participant(session_id, username)
     except Exception as e:
         st.error(f"참여자 추가 실패: {e}")
         return False
 
-def get_messages(session_id):
-    """메시지 목록 가져오기"""
+@timed("api.get_messages")
+def get_messages(session_id, since=None):
+    """since 커서 이후의 새 메시지와 다음 커서 가져오기"""
     try:
-        response = requests.get(f"{API_SERVER}/api/session/{session_id}/messages", timeout=5)
-        data = response.json()
-        if data.get('success'):
-            return data['messages']
-        return []
+        return storage().list_messages(session_id, since)
     except:
-        return []
-
-def generate_qr_code(data):
-    """QR 코드 생성"""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    buf = BytesIO()
-    img.save(buf, format='PNG')
-    buf.seek(0)
-    return buf
+        return [], since
+
+@timed("api.get_older_messages")
+def get_older_messages(session_id, before, limit):
+    """before 커서 앞의 이전 메시지와 다음 before 커서 가져오기"""
+    try:
+        return storage().list_messages_before(session_id, before, limit)
+    except Exception as e:
+        st.error(f"이전 메시지 불러오기 실패: {e}")
+        return [], before
+
+def sync_chat(session_id):
+    """화면용 대화 기록 갱신 (chat_window.sync_window, 학생 화면의 새로고침은 접속 하트비트를 겸함)"""
+    chat = sync_window(session_id, get_session, CHAT_HISTORY_WINDOW)
+    if chat is not None and st.session_state.get('user_type') == 'student':
+        presence().heartbeat(session_id, client_id())
+    return chat
+
+def qr_cache():
+    """현재 설정의 QR 코드 캐시 (QR_DISK_CACHE면 파일에도 저장)"""
+    return get_qr_cache(QR_CACHE_SIZE, QR_CACHE_DIR if QR_DISK_CACHE else None)
+
+@st.cache_resource
+def get_presence(ttl):
+    """프로세스 전체에서 공유하는 접속자 추적"""
+    return PresenceTracker(ttl)
+
+def presence():
+    """현재 설정의 접속자 추적"""
+    return get_presence(PRESENCE_TTL)
+
+def show_participants(session_id):
+    """사이드바 접속자 수 (PRESENCE_REFRESH마다 이 숫자만 다시 그림)"""
+    show_live_metric("참여자", lambda: f"{presence().count(session_id)}명", PRESENCE_REFRESH)
+
+def client_id():
+    """브라우저 세션마다 고정된 클라이언트 ID"""
+    if 'client_id' not in st.session_state:
+        st.session_state.client_id = uuid.uuid4().hex
+    return st.session_state.client_id
+
+def poll_schedule():
+    """현재 화면(강사/학생)의 자동 새로고침 간격 정책"""
+    if st.session_state.get('user_type') == 'student':
+        return get_poll_schedule(STUDENT_POLL_INTERVAL, min(POLL_MAX_INTERVAL, PRESENCE_TTL * 2 / 3), POLL_BACKOFF, POLL_JITTER)
+    return get_poll_schedule(INSTRUCTOR_POLL_INTERVAL, POLL_MAX_INTERVAL, POLL_BACKOFF, POLL_JITTER)
+
+def render_cache():
+    """메시지 HTML 캐시 (CHAT_RENDER_CACHE_SIZE가 0이면 None)"""
+    return get_render_cache(CHAT_RENDER_CACHE_SIZE) if CHAT_RENDER_CACHE_SIZE > 0 else None
 
 # 메인 앱
+@timed("rerun")
 def main():
+    if METRICS_FILE or METRICS_PORT:
+        get_metrics_exporter(METRICS_FILE, METRICS_PORT)
+    
     # API 서버 연결 확인
     if not check_api_server():
         st.error(f"""
@@ -187,7 +439,6 @@ def main():
         **서버 실행 방법:**
         ```bash
         cd api-server
-        pip install -r requirements.txt
         python server.py
         ```
         
@@ -236,6 +487,7 @@ def main():
     elif st.session_state.user_type == 'student':
         show_student_interface()
 
+@timed("ui.mode_selection")
 def show_mode_selection():
     """모드 선택 화면"""
     st.markdown("""
@@ -262,14 +514,41 @@ def show_mode_selection():
         st.write("QR 코드를 스캔하거나 세션 ID를 입력하세요")
         session_input = st.text_input("세션 ID", key="student_session_id")
         if st.button("학생으로 참여", key="student") and session_input:
-            session = get_session(session_input)
-            if session:
+            if session_exists(session_input):
                 st.session_state.user_type = 'student'
                 st.session_state.session_id = session_input
                 st.rerun()
             else:
                 st.error("유효하지 않은 세션 ID입니다")
 
+@timed("ui.instructor_messages")
+def show_instructor_messages():
+    """강사 화면의 채팅 메시지 (자동 새로고침 때는 이 부분만 다시 실행)"""
+    session = sync_chat(st.session_state.session_id)
+    if not session:
+        return
+    track_poll(poll_schedule(), session, client_id())
+    
+    # 보낸 메시지는 서버에서 받아오기 전까지 '전송 중'으로 덧붙임
+    messages = with_pending(session)
+    
+    messages_container = st.container()
+    
+    with messages_container:
+        show_load_older(session, get_older_messages, CHAT_HISTORY_PAGE)
+        if not messages:
+            st.info("💡 학생들의 질문과 의견이 여기에 표시됩니다")
+        else:
+            show_history(
+                messages,
+                mode=CHAT_RENDER_MODE,
+                chunk_size=CHAT_RENDER_CHUNK,
+                cache=render_cache(),
+                session_id=st.session_state.session_id
+            )
+        show_send_failures()
+
+@timed("ui.instructor")
 def show_instructor_interface():
     """강사 인터페이스"""
     st.markdown("""
@@ -291,19 +570,20 @@ def show_instructor_interface():
                 else:
                     st.error("❌ 세션 생성 실패")
         else:
-            session = get_session(st.session_state.session_id)
+            session = sync_chat(st.session_state.session_id)
             if session:
                 st.success("🟢 세션 활성")
                 st.info(f"**세션 ID**\n{st.session_state.session_id}")
                 
-                participant_count = len(session.get('participants', {}))
-                st.metric("참여자", f"{participant_count}명")
+                # 접속 중인 학생 수 (하트비트 기준), 누적 입장 수는 참고로
+                show_participants(st.session_state.session_id)
+                st.caption(f"누적 입장 {len(session.get('participants', {}))}명")
                 
                 st.markdown("### 📱 QR 코드")
                 app_url = st.secrets.get("APP_URL", "https://your-app.streamlit.app") if hasattr(st, 'secrets') else "https://mediatte-lecture-chat.streamlit.app"
                 session_url = f"{app_url}?session={st.session_state.session_id}"
                 
-                qr_img = generate_qr_code(session_url)
+                qr_img = qr_image(qr_cache(), session_url)
                 st.image(qr_img, caption="학생들이 스캔", use_column_width=True)
                 
                 st.code(session_url, language=None)
@@ -316,51 +596,40 @@ def show_instructor_interface():
                     use_container_width=True
                 )
                 
+                # 연결 풀 통계
+                with st.expander("🔌 API 연결 통계"):
+                    stats = api_client().pool_stats()
+                    st.write(f"요청 {stats['requests']}회 · 연결 재사용 {stats['hits']}회 · 새 연결 {stats['misses']}회")
+                    st.progress(stats['hit_rate'], text=f"재사용률 {stats['hit_rate']:.0%}")
+                    validators = storage().validator_stats()
+                    st.write(f"새 내용 확인 {validators['conditional']}회 중 변경 없음(304) {validators['not_modified']}회")
+                
+                # 자동 새로고침 요청 수 (간격 조절 효과)
+                show_poll_panel()
+                
+                # 세션 종료 (서버가 기록을 보관해서 링크로 계속 볼 수 있음)
                 if st.button("🚪 세션 종료", use_container_width=True):
+                    end_session(st.session_state.session_id)
                     st.session_state.session_id = None
                     st.session_state.user_type = None
                     st.rerun()
+        
+        if METRICS_SIDEBAR:
+            show_metrics_panel()
     
     if st.session_state.session_id:
-        session = get_session(st.session_state.session_id)
+        session = sync_chat(st.session_state.session_id)
         
         if session:
             st.markdown("### 💬 실시간 채팅")
             
-            messages = session.get('messages', [])
-            
-            messages_container = st.container()
-            
-            with messages_container:
-                if not messages:
-                    st.info("💡 학생들의 질문과 의견이 여기에 표시됩니다")
-                else:
-                    for msg in messages:
-                        if msg.get('type') == 'system':
-                            st.markdown(f"""
-                            <div class="chat-message system-message">
-                                {msg.get('text', '')}
-                            </div>
-                            """, unsafe_allow_html=True)
-                        else:
-                            msg_time = msg.get('timestamp', '')
-                            if msg_time:
-                                try:
-                                    dt = datetime.fromisoformat(msg_time)
-                                    msg_time_str = dt.strftime('%H:%M')
-                                except:
-                                    msg_time_str = datetime.now().strftime('%H:%M')
-                            else:
-                                msg_time_str = datetime.now().strftime('%H:%M')
-                            
-                            msg_class = 'instructor-message' if msg.get('type') == 'instructor' else 'student-message'
-                            st.markdown(f"""
-                            <div class="chat-message {msg_class}">
-                                <strong>{msg.get('username', '익명')}</strong> 
-                                <span style="color: #999; font-size: 12px;">{msg_time_str}</span>
-                                <div style="margin-top: 4px;">{msg.get('message', '')}</div>
-                            </div>
-                            """, unsafe_allow_html=True)
+            # 자동 새로고침이 켜져 있으면 채팅 영역만 주기적으로 다시 실행
+            auto_refresh = st.session_state.get('instructor_auto_refresh', True)
+            refresh = auto_refresh_fragment(poll_schedule(), auto_refresh)
+            if refresh:
+                refresh(show_instructor_messages)()
+            else:
+                show_instructor_messages()
             
             st.markdown("---")
             col1, col2 = st.columns([5, 1])
@@ -378,20 +647,88 @@ def show_instructor_interface():
             
             if send_clicked and message_input:
                 if add_message(st.session_state.session_id, st.session_state.username, message_input, 'instructor'):
+                    # 답이 곧 올 수 있으니 자동 새로고침 간격을 당김
+                    wake_polling(poll_schedule())
                     st.rerun()
             
             st.markdown("---")
-            if st.checkbox("🔄 자동 새로고침 (3초)", value=True):
-                time.sleep(3)
-                st.rerun()
+            if st.checkbox("🔄 자동 새로고침", value=True, key="instructor_auto_refresh"):
+                show_poll_interval(poll_schedule())
+                if refresh is None:
+                    # fragment를 지원하지 않는 Streamlit 버전은 전체 페이지 새로고침
+                    with phase("sleep"):
+                        time.sleep(poll_state(poll_schedule())['scheduled'])
+                    st.rerun()
             else:
                 if st.button("🔄 수동 새로고침"):
                     st.rerun()
     else:
         st.info("👈 사이드바에서 '새 세션 시작'을 클릭하세요")
 
+@timed("ui.student_messages")
+def show_student_messages():
+    """학생 화면의 채팅 메시지 (자동 새로고침 때는 이 부분만 다시 실행)"""
+    session = sync_chat(st.session_state.session_id)
+    if not session:
+        return
+    if session.get('archived'):
+        # 보는 중에 강사가 세션을 종료함: 전체를 다시 실행해서 입력창을 없앰
+        st.rerun()
+    track_poll(poll_schedule(), session, client_id())
+    
+    # 보낸 메시지는 서버에서 받아오기 전까지 '전송 중'으로 덧붙임
+    messages = with_pending(session)
+    
+    messages_container = st.container()
+    
+    with messages_container:
+        show_load_older(session, get_older_messages, CHAT_HISTORY_PAGE)
+        show_history(
+            messages,
+            me=st.session_state.username,
+            mode=CHAT_RENDER_MODE,
+            chunk_size=CHAT_RENDER_CHUNK,
+            cache=render_cache(),
+            session_id=st.session_state.session_id
+        )
+        show_send_failures()
+
+@timed("ui.archived")
+def show_archived_session(session):
+    """종료된 세션: 기록만 보여주고 입력창/자동 새로고침 없음"""
+    with st.sidebar:
+        if st.button("🚪 나가기", use_container_width=True):
+            st.session_state.clear()
+            st.rerun()
+    st.info("🔒 종료된 세션입니다. 대화 기록만 볼 수 있습니다.")
+    show_load_older(session, get_older_messages, CHAT_HISTORY_PAGE)
+    show_history(
+        session.get('messages', []),
+        me=st.session_state.username,
+        mode=CHAT_RENDER_MODE,
+        chunk_size=CHAT_RENDER_CHUNK,
+        cache=render_cache(),
+        session_id=st.session_state.session_id
+    )
+
+@timed("ui.student")
 def show_student_interface():
     """학생 인터페이스"""
+    # QR/링크로 바로 들어온 경우도 색인만 보고 확인 (종료된 세션은 이름 없이 기록만 보기)
+    if not st.session_state.username:
+        info = session_info(st.session_state.session_id)
+        if info is None:
+            st.error("유효하지 않은 세션 ID입니다")
+            if st.button("처음으로"):
+                st.session_state.clear()
+                st.rerun()
+            return
+        if info['state'] == 'archived':
+            session = sync_chat(st.session_state.session_id)
+            if session:
+                show_archived_session(session)
+            return
+    
     if not st.session_state.username:
         st.markdown("""
         <div class="header-gradient">
@@ -438,7 +775,7 @@ def show_student_interface():
     </div>
     """, unsafe_allow_html=True)
     
-    session = get_session(st.session_state.session_id)
+    session = sync_chat(st.session_state.session_id)
     
     if not session:
         st.error("세션을 찾을 수 없습니다")
@@ -447,51 +784,28 @@ def show_student_interface():
             st.rerun()
         return
     
+    if session.get('archived'):
+        show_archived_session(session)
+        return
+    
     with st.sidebar:
         st.markdown(f"### 👤 {st.session_state.username}")
         st.success("🟢 연결됨")
         
-        participant_count = len(session.get('participants', {}))
-        st.metric("참여자", f"{participant_count}명")
+        show_participants(st.session_state.session_id)
         
         if st.button("🚪 나가기", use_container_width=True):
+            presence().leave(st.session_state.session_id, client_id())
             st.session_state.clear()
             st.rerun()
     
-    messages = session.get('messages', [])
-    
-    messages_container = st.container()
-    
-    with messages_container:
-        for msg in messages:
-            if msg.get('type') == 'system':
-                st.markdown(f"""
-                <div class="chat-message system-message">
-                    {msg.get('text', '')}
-                </div>
-                """, unsafe_allow_html=True)
-            else:
-                msg_time = msg.get('timestamp', '')
-                if msg_time:
-                    try:
-                        dt = datetime.fromisoformat(msg_time)
-                        msg_time_str = dt.strftime('%H:%M')
-                    except:
-                        msg_time_str = datetime.now().strftime('%H:%M')
-                else:
-                    msg_time_str = datetime.now().strftime('%H:%M')
-                
-                is_mine = msg.get('username') == st.session_state.username
-                msg_class = 'instructor-message' if msg.get('type') == 'instructor' else 'student-message'
-                display_name = '나' if is_mine else msg.get('username', '익명')
-                
-                st.markdown(f"""
-                <div class="chat-message {msg_class}">
-                    <strong>{display_name}</strong> 
-                    <span style="color: #999; font-size: 12px;">{msg_time_str}</span>
-                    <div style="margin-top: 4px;">{msg.get('message', '')}</div>
-                </div>
-                """, unsafe_allow_html=True)
+    # 자동 새로고침이 켜져 있으면 채팅 영역만 주기적으로 다시 실행
+    auto_refresh = st.session_state.get('student_auto_refresh', True)
+    refresh = auto_refresh_fragment(poll_schedule(), auto_refresh)
+    if refresh:
+        refresh(show_student_messages)()
+    else:
+        show_student_messages()
     
     st.markdown("---")
     col1, col2 = st.columns([5, 1])
@@ -509,12 +823,18 @@ def show_student_interface():
     
     if send_clicked and message_input:
         if add_message(st.session_state.session_id, st.session_state.username, message_input, 'student'):
+            # 답이 곧 올 수 있으니 자동 새로고침 간격을 당김
+            wake_polling(poll_schedule())
             st.rerun()
     
     st.markdown("---")
-    if st.checkbox("🔄 자동 새로고침 (2초)", value=True):
-        time.sleep(2)
-        st.rerun()
+    if st.checkbox("🔄 자동 새로고침", value=True, key="student_auto_refresh"):
+        show_poll_interval(poll_schedule())
+        if refresh is None:
+            # fragment를 지원하지 않는 Streamlit 버전은 전체 페이지 새로고침
+            with phase("sleep"):
+                time.sleep(poll_state(poll_schedule())['scheduled'])
+            st.rerun()
     else:
         if st.button("🔄 수동 새로고침"):
             st.rerun()
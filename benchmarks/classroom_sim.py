@@ -0,0 +1,255 @@
+"""
+강의실 부하 시뮬레이터 - 학생 N명 + 강사 1명이 실제 화면처럼 저장소를 사용
+
+app.py / app_api.py 화면이 부르는 것과 같은 저장소 함수(create_storage / HttpStorage)를 직접 호출합니다.
+(app.py를 import하면 Streamlit 화면 코드가 실행되므로 그 아래 저장소 계층을 씁니다)
+
+클라이언트마다 스레드 하나 (Streamlit도 브라우저 세션마다 스크립트 스레드 하나):
+    입장(add_participant) → 최근 기록(get_session limit) → 2~5초마다 새 메시지(get_session since)
+    → 정해진 속도로 메시지 전송(append_message)
+
+끝나면 모든 클라이언트가 마지막으로 한 번 더 받아온 뒤 확인합니다:
+    - 작업별 지연 시간 p50/p95/p99, 처리량
+    - 저장소에서 사라진 메시지 (전송 성공했는데 최종 기록에 없음), seq 중복/빈틈
+    - 클라이언트가 못 받은 메시지 / 두 번 받은 메시지
+    - 데이터 폴더 크기 증가 (http는 서버 쪽이라 제외)
+
+실행:
+    python benchmarks/classroom_sim.py --backend log --students 100 300 1000 --duration 30
+    python benchmarks/classroom_sim.py --backend http --url http://127.0.0.1:5000 --students 300
+"""
+
+import argparse
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from storage import STORAGE_BACKENDS, ApiClient, HttpStorage, create_storage, make_message
+
+OPERATIONS = ('join', 'tail', 'poll', 'send')
+
+class SimStats:
+    """작업별 지연 시간 / 오류 (여러 스레드가 같이 기록)"""
+    
+    def __init__(self):
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.errors = {op: 0 for op in OPERATIONS}
+        self.lock = threading.Lock()
+        # 전송 성공한 메시지 ID (http도 클라이언트가 붙인 ID를 그대로 저장)
+        self.acked = set()
+    
+    def timed(self, op, func, *args):
+        """func 실행 시간을 op로 기록 → (결과, 성공 여부)"""
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+        except Exception:
+            with self.lock:
+                self.errors[op] += 1
+            return None, False
+        # list.append는 스레드 안전
+        self.latencies[op].append(time.perf_counter() - started)
+        return result, True
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+class SimClient:
+    """학생/강사 한 명 (sync_chat과 같은 순서로 저장소 호출)"""
+    
+    def __init__(self, storage, session_id, name, msg_type, stats, poll_range, send_rate, window):
+        self.storage = storage
+        self.session_id = session_id
+        self.name = name
+        self.msg_type = msg_type
+        self.stats = stats
+        self.poll_range = poll_range
+        # 초당 전송 수
+        self.send_rate = send_rate
+        self.window = window
+        self.cursor = None
+        # 받은 메시지 seq (중복 확인용으로 목록, 빠진 것 확인용으로 첫 seq)
+        self.received = []
+        self.first_seq = None
+        self.sent = 0
+    
+    def run(self, stop):
+        if self.msg_type == 'student':
+            _, ok = self.stats.timed('join', self.storage.add_participant, self.session_id, self.name)
+            if not ok:
+                return
+        self.sync('tail')
+        next_send = time.monotonic() + self.send_gap()
+        while not stop.is_set():
+            next_poll = time.monotonic() + random.uniform(*self.poll_range)
+            # 폴링 사이에 전송할 차례가 오면 보내고, 폴링 시각이 되면 새 메시지를 받음
+            while not stop.is_set():
+                now = time.monotonic()
+                if next_send <= now:
+                    self.send()
+                    next_send = now + self.send_gap()
+                    continue
+                wait = min(next_send, next_poll) - now
+                if wait <= 0 or stop.wait(wait):
+                    break
+            if not stop.is_set():
+                self.sync('poll')
+    
+    def send_gap(self):
+        """다음 전송까지 간격 (푸아송 도착)"""
+        return random.expovariate(self.send_rate) if self.send_rate > 0 else float('inf')
+    
+    def send(self):
+        self.sent += 1
+        msg = make_message(self.name, f"{self.name}의 질문 {self.sent}", self.msg_type)
+        appended, ok = self.stats.timed('send', self.storage.append_message, self.session_id, msg)
+        if ok and appended:
+            with self.stats.lock:
+                self.stats.acked.add(msg['id'])
+    
+    def sync(self, op):
+        if self.cursor is None:
+            update, ok = self.stats.timed(op, self.storage.get_session, self.session_id, None, self.window)
+        else:
+            update, ok = self.stats.timed(op, self.storage.get_session, self.session_id, self.cursor)
+        if not ok or update is None:
+            return
+        for msg in update['messages']:
+            if self.first_seq is None:
+                self.first_seq = msg['seq']
+            self.received.append(msg['seq'])
+        self.cursor = update['cursor']
+
+def directory_size(path):
+    return sum(f.stat().st_size for f in Path(path).rglob('*') if f.is_file() and not f.name.endswith('-shm'))
+
+def simulate(storage, data_dir, students, duration, ramp, poll_range, student_rate, instructor_rate, window):
+    """한 번 실행 → 결과 dict"""
+    size_before = directory_size(data_dir) if data_dir else None
+    session_id = storage.create_session()
+    stats = SimStats()
+    stop = threading.Event()
+    clients = [SimClient(storage, session_id, '강사', 'instructor', stats, poll_range, instructor_rate, window)]
+    clients += [
+        SimClient(storage, session_id, f"학생{i}", 'student', stats, poll_range, student_rate, window)
+        for i in range(students)
+    ]
+    threads = [threading.Thread(target=client.run, args=(stop,), daemon=True) for client in clients]
+    
+    started = time.monotonic()
+    for i, thread in enumerate(threads):
+        # 학생들이 ramp초에 걸쳐 들어옴
+        target = started + ramp * i / len(threads)
+        delay = target - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        thread.start()
+    time.sleep(max(started + duration - time.monotonic(), 0))
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    operations = sum(len(values) for values in stats.latencies.values())
+    
+    # 모든 전송이 끝난 뒤 마지막으로 한 번씩 받아서 빠진 메시지 확인
+    for client in clients:
+        client.sync('poll')
+    final = storage.get_session(session_id)
+    stored = {msg['id'] for msg in final['messages']}
+    seqs = [msg['seq'] for msg in final['messages']]
+    last_seq = len(final['messages'])
+    
+    missed = duplicated = 0
+    for client in clients:
+        if client.first_seq is None:
+            continue
+        unique = set(client.received)
+        duplicated += len(client.received) - len(unique)
+        missed += (last_seq - client.first_seq + 1) - len(unique)
+    
+    size_after = directory_size(data_dir) if data_dir else None
+    return {
+        'students': students,
+        'elapsed': elapsed,
+        'stats': stats,
+        'throughput': operations / elapsed,
+        'messages': len(stats.latencies['send']),
+        'lost': len(stats.acked - stored),
+        'seq_ok': seqs == list(range(1, last_seq + 1)),
+        'missed': missed,
+        'duplicated': duplicated,
+        'growth': None if size_before is None else size_after - size_before
+    }
+
+def report(result):
+    stats = result['stats']
+    print(
+        f"\n학생 {result['students']}명 + 강사 1명, {result['elapsed']:.1f}초, "
+        f"처리량 {result['throughput']:,.0f} 작업/s, 전송 {result['messages']}건"
+    )
+    print(f"  {'작업':<6} {'횟수':>7} {'오류':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'최대':>9}")
+    for op in OPERATIONS:
+        values = stats.latencies[op]
+        print(
+            f"  {op:<6} {len(values):>7} {stats.errors[op]:>5} "
+            + " ".join(f"{percentile(values, p) * 1000:>7.1f}ms" for p in (50, 95, 99))
+            + f" {max(values, default=0) * 1000:>7.1f}ms"
+        )
+    print(
+        f"  저장소 유실 {result['lost']}건 · seq 연속 {'OK' if result['seq_ok'] else '깨짐'} · "
+        f"클라이언트 누락 {result['missed']}건 · 중복 수신 {result['duplicated']}건"
+    )
+    if result['growth'] is not None:
+        # 입장 기록 / 시스템 메시지로 늘어난 만큼도 전송 수로 나눔
+        per_send = result['growth'] / result['messages'] if result['messages'] else 0
+        print(f"  데이터 증가 {result['growth'] / 1024:,.1f}KB (전송 1건당 {per_send:,.0f}B, 입장/시스템 기록 포함)")
+    sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="강의실 부하 시뮬레이터")
+    parser.add_argument('--backend', default='log', choices=STORAGE_BACKENDS)
+    parser.add_argument('--url', default="http://127.0.0.1:5000", help="http 저장 방식의 API 서버")
+    parser.add_argument('--pool-size', type=int, default=32, help="http 연결 풀 크기 (app_api.py의 API_POOL_SIZE)")
+    parser.add_argument('--data-dir', default=None, help="데이터 폴더 (없으면 임시 폴더를 쓰고 끝나면 삭제)")
+    parser.add_argument('--students', type=int, nargs='+', default=[100, 300])
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--ramp', type=float, default=5, help="학생들이 들어오는 데 걸리는 시간 (초)")
+    parser.add_argument('--poll', type=float, nargs=2, default=[2, 5], metavar=('MIN', 'MAX'), help="폴링 간격 범위 (초)")
+    parser.add_argument('--student-rate', type=float, default=1.0, help="학생 한 명의 분당 메시지 수")
+    parser.add_argument('--instructor-rate', type=float, default=6.0, help="강사의 분당 메시지 수")
+    parser.add_argument('--window', type=int, default=200, help="처음 받을 최근 메시지 수 (CHAT_HISTORY_WINDOW)")
+    args = parser.parse_args()
+    
+    print(
+        f"저장 방식 {args.backend}, 폴링 {args.poll[0]:g}~{args.poll[1]:g}초, "
+        f"학생 분당 {args.student_rate:g}건 · 강사 분당 {args.instructor_rate:g}건"
+    )
+    for students in args.students:
+        data_dir = None
+        if args.backend == 'http':
+            storage = HttpStorage(ApiClient(args.url, pool_size=args.pool_size))
+        else:
+            data_dir = Path(args.data_dir) if args.data_dir else Path(tempfile.mkdtemp(prefix="classroom-sim-"))
+            storage = create_storage(args.backend, data_dir=data_dir)
+        try:
+            result = simulate(
+                storage, data_dir, students, args.duration, args.ramp, tuple(args.poll),
+                args.student_rate / 60, args.instructor_rate / 60, args.window
+            )
+        finally:
+            if data_dir is not None and args.data_dir is None:
+                shutil.rmtree(data_dir, ignore_errors=True)
+        report(result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+저장소 핵심 경로 마이크로 벤치마크 - 기록 크기에 따른 작업 시간 (asv 방식)
+
+벤치마크마다 매개변수 격자(저장 방식 × 세션 수 × 세션당 메시지 수 × 메시지 길이 등)의
+모든 조합을 timeit으로 측정하고, 결과를 커밋별 JSON으로 저장해서 커밋끼리 비교합니다.
+같은 데이터셋은 한 번만 만들고 조합마다 복사해서 쓰므로 측정끼리 서로 영향을 주지 않습니다.
+
+실행:
+    python benchmarks/micro_bench.py                           # 기본 격자, benchmarks/results/<커밋>.json
+    python benchmarks/micro_bench.py --grid quick --bench add_message get_session
+    python benchmarks/micro_bench.py --compare benchmarks/results/abc1234.json   # 지금 실행 결과와 비교
+    python benchmarks/micro_bench.py --compare old.json new.json --threshold 0.1
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from message_text import process_text
+from qr_code import make_qr_png
+from storage import MemoryStorage, create_storage, make_message, make_system_message
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# 공통 매개변수 격자 (벤치마크마다 필요한 것만 사용)
+GRIDS = {
+    'quick': {
+        'backend': ['memory', 'log', 'sqlite'],
+        'sessions': [1],
+        'messages': [100, 1000],
+        'length': [50]
+    },
+    'default': {
+        'backend': ['memory', 'json', 'log', 'sqlite'],
+        'sessions': [1, 20],
+        'messages': [100, 2000],
+        'length': [20, 500]
+    }
+}
+
+BENCHMARKS = {}
+
+def benchmark(*grid_params, **extra_params):
+    """벤치마크 등록 (grid_params는 공통 격자에서, extra_params는 이 벤치마크만의 값 목록)
+    
+    등록하는 함수는 준비만 하고 측정할 호출(인자 없는 함수)을 돌려줌
+    """
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (setup, grid_params, extra_params)
+        return setup
+    return register
+
+def sample_text(length, links=1):
+    """length 글자 정도의 메시지 (링크 links개 포함)"""
+    parts = [f"https://example.com/slides/{i}" for i in range(links)]
+    filler = "강의 자료 질문 있어요 "
+    text = " ".join(parts)
+    while len(text) < length:
+        text += filler
+    return text[:max(length, len(" ".join(parts)))]
+
+class Datasets:
+    """(저장 방식, 세션 수, 메시지 수, 길이)별 데이터셋 원본을 한 번만 만들고 측정마다 복사본을 줌"""
+    
+    def __init__(self):
+        self.root = Path(tempfile.mkdtemp(prefix="micro-bench-"))
+        self.templates = {}
+        self.copies = itertools.count()
+    
+    def open(self, backend, sessions, messages, length):
+        """새 복사본 저장소 → (저장소, 세션 ID 목록)"""
+        key = (backend, sessions, messages, length)
+        if backend == 'memory':
+            # 메모리는 복사할 파일이 없으므로 매번 새로 채움
+            storage = MemoryStorage()
+            return storage, self.populate(storage, sessions, messages, length)
+        if key not in self.templates:
+            template = self.root / "template-{}-{}-{}-{}".format(*key)
+            storage = create_storage(backend, data_dir=template)
+            if backend == 'json':
+                # json은 메시지마다 파일 전체를 다시 쓰므로 메모리에서 만든 뒤 한 번에 저장
+                memory = MemoryStorage()
+                session_ids = self.populate(memory, sessions, messages, length)
+                storage.save_sessions(memory.sessions)
+                storage.rebuild_index()
+            else:
+                session_ids = self.populate(storage, sessions, messages, length)
+            storage.index.flush()
+            self.templates[key] = (template, session_ids)
+        template, session_ids = self.templates[key]
+        copy = self.root / f"copy-{next(self.copies)}"
+        shutil.copytree(template, copy)
+        return create_storage(backend, data_dir=copy), session_ids
+    
+    def release(self):
+        """측정이 끝난 복사본 삭제 (원본은 유지)"""
+        for copy in self.root.glob("copy-*"):
+            shutil.rmtree(copy, ignore_errors=True)
+    
+    def populate(self, storage, sessions, messages, length):
+        session_ids = []
+        text = sample_text(length)
+        for _ in range(sessions):
+            session_id = storage.create_session()
+            for i in range(messages - 1):
+                storage.append_message(session_id, make_message(f"학생{i % 30}", text, 'student'))
+            session_ids.append(session_id)
+        return session_ids
+    
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+@benchmark('backend', 'sessions', 'messages')
+def create_session(data, backend, sessions, messages):
+    storage, _ = data.open(backend, sessions, messages, 50)
+    return storage.create_session
+
+@benchmark('backend', 'sessions', 'messages', 'length')
+def add_message(data, backend, sessions, messages, length):
+    storage, session_ids = data.open(backend, sessions, messages, length)
+    text = sample_text(length)
+    return lambda: storage.append_message(session_ids[-1], make_message('학생', text, 'student'))
+
+@benchmark('backend', 'sessions', 'messages')
+def add_participant(data, backend, sessions, messages):
+    storage, session_ids = data.open(backend, sessions, messages, 50)
+    names = itertools.count()
+    return lambda: storage.add_participant(session_ids[-1], f"참여자{next(names)}")
+
+@benchmark('backend', 'sessions', 'messages')
+def add_system_message(data, backend, sessions, messages):
+    storage, session_ids = data.open(backend, sessions, messages, 50)
+    return lambda: storage.append_message(session_ids[-1], make_system_message("학생1님이 입장했습니다"))
+
+@benchmark('backend', 'sessions', 'messages', 'length', mode=['full', 'tail', 'since'])
+def get_session(data, backend, sessions, messages, length, mode):
+    storage, session_ids = data.open(backend, sessions, messages, length)
+    session_id = session_ids[-1]
+    if mode == 'full':
+        return lambda: storage.get_session(session_id)
+    if mode == 'tail':
+        # 처음 들어온 화면 (CHAT_HISTORY_WINDOW 기본값)
+        return lambda: storage.get_session(session_id, limit=200)
+    # 새 메시지가 없는 자동 새로고침
+    cursor = storage.get_session(session_id, limit=0)['cursor']
+    return lambda: storage.get_session(session_id, since=cursor)
+
+@benchmark('backend', 'sessions', 'messages')
+def session_info(data, backend, sessions, messages):
+    storage, session_ids = data.open(backend, sessions, messages, 50)
+    return lambda: storage.session_info(session_ids[-1])
+
+@benchmark('length', links=[0, 3])
+def linkify_text(data, length, links):
+    # 저장할 때 한 번 하는 이스케이프 + 링크 변환 (message_text.process_text)
+    text = sample_text(length, links)
+    return lambda: process_text(text)
+
+@benchmark(url_length=[40, 120])
+def generate_qr_code(data, url_length):
+    # 캐시 없이 매번 만드는 경우 (앱은 render_qr_png가 결과를 캐시)
+    url = ("https://lecture-chat.streamlit.app?session=session-1700000000-abc123&" + "x" * url_length)[:url_length]
+    return lambda: make_qr_png(url)
+
+def cases(name, grid, backends=None):
+    """벤치마크 하나의 매개변수 조합 목록"""
+    _, grid_params, extra_params = BENCHMARKS[name]
+    axes = {param: grid[param] for param in grid_params}
+    if backends and 'backend' in axes:
+        axes['backend'] = backends
+    axes.update(extra_params)
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+def measure(func, repeat):
+    """호출 한 번 시간 (초): autorange로 0.2초 이상 걸리는 반복 횟수를 정하고 repeat번 측정"""
+    func()
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    times = [total / number for total in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'number': number,
+        'min': min(times),
+        'median': statistics.median(times),
+        'stddev': statistics.pstdev(times)
+    }
+
+def format_seconds(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g}{unit}"
+    return f"{seconds / 1e-9:.3g}ns"
+
+def format_params(params):
+    return " ".join(f"{key}={value}" for key, value in params.items())
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def run(names, grid, backends, repeat):
+    data = Datasets()
+    results = []
+    try:
+        for name in names:
+            setup = BENCHMARKS[name][0]
+            for params in cases(name, grid, backends):
+                timing = measure(setup(data, **params), repeat)
+                data.release()
+                results.append({'benchmark': name, 'params': params, **timing})
+                print(
+                    f"{name:<20} {format_params(params):<55} "
+                    f"{format_seconds(timing['median']):>9} ± {format_seconds(timing['stddev'])}"
+                )
+                sys.stdout.flush()
+    finally:
+        data.cleanup()
+    return {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'repeat': repeat,
+        'results': results
+    }
+
+def compare(base, new, threshold):
+    """두 실행 결과의 중앙값 비교 → 느려진 항목 수"""
+    def keyed(report):
+        return {
+            (result['benchmark'], json.dumps(result['params'], sort_keys=True)): result
+            for result in report['results']
+        }
+    before, after = keyed(base), keyed(new)
+    print(f"\n{base['commit']} → {new['commit']} (기준 ±{threshold:.0%})")
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        ratio = after[key]['median'] / before[key]['median']
+        if ratio > 1 + threshold:
+            mark = "🔺 느려짐"
+            regressions += 1
+        elif ratio < 1 / (1 + threshold):
+            mark = "🔻 빨라짐"
+        else:
+            continue
+        name, params = key
+        print(
+            f"{mark} {name:<20} {format_params(json.loads(params)):<55} "
+            f"{format_seconds(before[key]['median']):>9} → {format_seconds(after[key]['median']):>9} ({ratio:.2f}배)"
+        )
+    if not regressions:
+        print("느려진 항목 없음")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="저장소 핵심 경로 마이크로 벤치마크")
+    parser.add_argument('--bench', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--grid', choices=list(GRIDS), default='default')
+    parser.add_argument('--backends', nargs='+', default=None, help="격자의 저장 방식 대신 사용")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=None, help="결과 JSON 경로 (기본: benchmarks/results/<커밋>.json)")
+    parser.add_argument('--compare', nargs='+', metavar='JSON', help="기준 결과 (하나면 지금 실행 결과와, 둘이면 서로 비교)")
+    parser.add_argument('--threshold', type=float, default=0.2, help="이만큼 넘게 느려지면 실패로 봄 (0.2 = 20%%)")
+    args = parser.parse_args()
+    
+    if args.compare and len(args.compare) == 2:
+        base, new = (json.loads(Path(path).read_text(encoding='utf-8')) for path in args.compare)
+        sys.exit(1 if compare(base, new, args.threshold) else 0)
+    
+    report = run(args.bench, GRIDS[args.grid], args.backends, args.repeat)
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{report['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f"\n결과 저장: {output}")
+    
+    if args.compare:
+        base = json.loads(Path(args.compare[0]).read_text(encoding='utf-8'))
+        sys.exit(1 if compare(base, report, args.threshold) else 0)
+
+if __name__ == "__main__":
+    main()
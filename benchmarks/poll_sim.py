@@ -0,0 +1,177 @@
+"""
+자동 새로고침 간격 시뮬레이터 - 강의 한 시간 동안 학생 N명의 새로고침 요청 수 (가상 시간)
+
+app.py / app_api.py와 같은 PollSchedule을 가상 시계로 돌립니다. 저장소는 부르지 않고
+메시지 도착 시각(구간별 초당 메시지 수의 포아송 과정)만 보고 새로고침마다 새 내용이 있었는지 정합니다.
+    fixed: 지금까지의 고정 간격 (학생 STUDENT_POLL_INTERVAL초)
+    adaptive: 새 메시지가 오면 가장 짧은 간격, 조용하면 backoff배씩 max까지 (+ 클라이언트별 jitter)
+
+메시지를 보낸 학생은 바로 전체 새로고침하고 가장 짧은 간격으로 다시 등록합니다 (wake_polling).
+간격이 rerun_ratio배 이상 짧아지거나 가장 긴 간격에 도달해서 다시 등록하는 전체 새로고침도 요청 하나로 셉니다.
+
+결과: 구간별 평균/최대(1초 단위) 초당 요청 수, 전체 요청 수, 다시 등록 횟수,
+새 메시지가 학생 화면에 보이기까지의 지연 p50/p95.
+
+실행:
+    python benchmarks/poll_sim.py --students 300
+    python benchmarks/poll_sim.py --students 300 --jitter 0          # 주기가 맞물리는 경우
+    python benchmarks/poll_sim.py --profile 600:0.02 120:1.5 1800:0  # 구간별 "초:초당 메시지 수"
+"""
+
+import argparse
+import bisect
+import heapq
+import random
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from polling import PollSchedule
+
+MODES = ('fixed', 'adaptive')
+
+# 설명 10분(가끔 질문) → 질문 시간 2분 → 설명 15분 → 질문 시간 3분 → 자습 30분(조용)
+DEFAULT_PROFILE = ['600:0.02', '120:1.5', '900:0.02', '180:2', '1800:0']
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+def parse_profile(items):
+    """["초:초당 메시지 수", ...] → [(시작, 끝, 초당 메시지 수), ...]"""
+    segments = []
+    start = 0.0
+    for item in items:
+        duration, rate = item.split(':')
+        segments.append((start, start + float(duration), float(rate)))
+        start += float(duration)
+    return segments
+
+def message_times(segments, rng):
+    """구간별 포아송 도착 시각"""
+    times = []
+    for start, end, rate in segments:
+        if rate <= 0:
+            continue
+        t = start + rng.expovariate(rate)
+        while t < end:
+            times.append(t)
+            t += rng.expovariate(rate)
+    return times
+
+def simulate(mode, students, segments, messages, senders, args):
+    """→ (초별 요청 수, 다시 등록 횟수, 보이기까지 지연 목록)"""
+    clock = VirtualClock()
+    if mode == 'fixed':
+        schedule = PollSchedule(args.min, args.min, backoff=1.0, jitter=0.0, clock=clock)
+    else:
+        schedule = PollSchedule(args.min, args.max, backoff=args.backoff, jitter=args.jitter, clock=clock)
+    end = segments[-1][1]
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    
+    states = [schedule.new_state() for _ in range(students)]
+    # 클라이언트마다 마지막으로 본 메시지 수 / 예약된 새로고침 번호 (다시 예약하면 예전 항목은 무시)
+    seen = [0] * students
+    versions = [0] * students
+    per_second = [0] * (int(end) + 1)
+    reruns = 0
+    latencies = []
+    
+    events = []
+    for client in range(students):
+        # QR 코드를 보고 join_window초 안에 들어옴
+        joined = rng.uniform(0, args.join_window)
+        heapq.heappush(events, (joined, 'poll', client, 0))
+    for t, client in zip(messages, senders):
+        heapq.heappush(events, (t, 'send', client, None))
+    
+    def poll(client, t):
+        nonlocal reruns
+        state = states[client]
+        per_second[int(t)] += 1
+        cursor = bisect.bisect_right(messages, t)
+        latencies.extend(t - messages[i] for i in range(seen[client], cursor))
+        seen[client] = cursor
+        schedule.observe(state, cursor)
+        if state['scheduled'] is None or schedule.needs_rerun(state):
+            if state['scheduled'] is not None:
+                # 전체 새로고침으로 다시 등록 (fragment도 한 번 더 실행됨)
+                reruns += 1
+                per_second[int(t)] += 1
+            schedule.schedule(state)
+        versions[client] += 1
+        heapq.heappush(events, (t + state['scheduled'], 'poll', client, versions[client]))
+    
+    while events:
+        t, kind, client, version = heapq.heappop(events)
+        if t >= end:
+            break
+        clock.now = t
+        if kind == 'send':
+            if states[client]['scheduled'] is None:
+                # 아직 들어오기 전
+                continue
+            # 보낸 직후 전체 새로고침: 가장 짧은 간격으로 다시 등록
+            schedule.wake(states[client])
+            states[client]['scheduled'] = None
+            poll(client, t)
+        elif version == versions[client]:
+            poll(client, t)
+    return per_second, reruns, latencies
+
+def report(results, segments, students):
+    print(f"\n학생 {students}명 · 구간별 초당 요청 (평균 / 1초 최대)")
+    header = f"  {'구간':<22}" + "".join(f" {mode:>18}" for mode in results)
+    print(header)
+    for start, end, rate in segments:
+        label = f"{start / 60:.0f}~{end / 60:.0f}분 ({rate:g} msg/s)"
+        row = f"  {label:<22}"
+        for per_second, _, _ in results.values():
+            window = per_second[int(start):int(end)]
+            row += f" {sum(window) / len(window):>9.1f} / {max(window):>6}"
+        print(row)
+    print(f"  {'전체 요청':<22}" + "".join(f" {sum(r[0]):>18,}" for r in results.values()))
+    print(f"  {'다시 등록(전체 새로고침)':<22}" + "".join(f" {r[1]:>18,}" for r in results.values()))
+    print(f"  {'보이기까지 p50 / p95':<22}" + "".join(
+        f" {percentile(r[2], 50):>8.1f}s / {percentile(r[2], 95):>5.1f}s" for r in results.values()
+    ))
+    modes = list(results)
+    if len(modes) == 2:
+        base = sum(results[modes[0]][0])
+        print(f"  → {modes[1]} 요청 수 {sum(results[modes[1]][0]) / base:.0%} (fixed 대비)")
+
+def main():
+    parser = argparse.ArgumentParser(description="자동 새로고침 간격 시뮬레이터 (고정 간격 vs 간격 조절)")
+    parser.add_argument('--students', type=int, nargs='+', default=[300])
+    parser.add_argument('--profile', nargs='+', default=DEFAULT_PROFILE, help='구간별 "초:초당 메시지 수"')
+    parser.add_argument('--min', type=float, default=2.0, help="가장 짧은 간격 (STUDENT_POLL_INTERVAL)")
+    parser.add_argument('--max', type=float, default=20.0, help="가장 긴 간격 (POLL_MAX_INTERVAL)")
+    parser.add_argument('--backoff', type=float, default=2.0, help="조용할 때 늘리는 배수 (POLL_BACKOFF)")
+    parser.add_argument('--jitter', type=float, default=0.2, help="클라이언트별 간격 흩뜨리기 비율 (POLL_JITTER)")
+    parser.add_argument('--join-window', type=float, default=10.0, help="학생들이 들어오는 데 걸리는 시간 (초)")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    segments = parse_profile(args.profile)
+    for students in args.students:
+        rng = random.Random(args.seed)
+        messages = message_times(segments, rng)
+        senders = [rng.randrange(students) for _ in messages]
+        results = {mode: simulate(mode, students, segments, messages, senders, args) for mode in args.modes}
+        report(results, segments, students)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+채팅 기록 렌더링 벤치마크 - 메시지 수에 따른 새로고침(rerun) 시간 비교
+
+per_message(기존: 메시지마다 st.markdown), batch(HTML 하나로 묶기),
+batch + 메시지별 HTML 캐시를 Streamlit AppTest로 같은 기록에 대해 여러 번 다시 실행해서 측정합니다.
+
+실행:
+    python benchmarks/render_bench.py
+    python benchmarks/render_bench.py --counts 100 1000 5000 --repeat 10 --chunk 500
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def chat_script(root, count, mode, chunk_size, cached):
+    """AppTest로 실행할 화면: count개 메시지 기록을 mode 방식으로 표시"""
+    import sys
+    sys.path.insert(0, root)
+    
+    from chat_render import RenderCache, show_history
+    from storage import make_message
+    
+    # 저장된 기록처럼 make_message로 만든 레코드 (HTML 조각 포함), 다시 실행해도 재사용
+    if getattr(sys, '_render_bench_count', None) != count:
+        sys._render_bench_messages = [
+            {
+                **make_message(
+                    f"학생{i % 50}",
+                    f"질문 {i} 자료는 https://example.com/slides/{i} 에 있나요?",
+                    'instructor' if i % 10 == 0 else 'student'
+                ),
+                'id': f"msg-{i}"
+            }
+            for i in range(count)
+        ]
+        sys._render_bench_count = count
+    messages = sys._render_bench_messages
+    # AppTest 스크립트는 매번 새로 실행되므로 캐시는 모듈(sys)에 붙여서 유지
+    if cached and not hasattr(sys, '_render_bench_cache'):
+        sys._render_bench_cache = RenderCache(count * 2)
+    cache = sys._render_bench_cache if cached else None
+    show_history(messages, me='학생1', mode=mode, chunk_size=chunk_size, cache=cache)
+
+def measure(count, mode, chunk_size, repeat, cached=False):
+    """(rerun 시간 중앙값 초, 화면 요소 수)"""
+    if hasattr(sys, '_render_bench_cache'):
+        del sys._render_bench_cache
+    at = AppTest.from_function(chat_script, args=(str(ROOT), count, mode, chunk_size, cached), default_timeout=120)
+    at.run()
+    elements = len(at.markdown)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), elements
+
+def main():
+    parser = argparse.ArgumentParser(description="채팅 기록 렌더링 벤치마크")
+    parser.add_argument('--counts', type=int, nargs='+', default=[100, 500, 1000, 2000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--chunk', type=int, default=0, help="batch 방식의 덩어리 크기 (0이면 하나로)")
+    args = parser.parse_args()
+    
+    print(f"{'메시지 수':>8} | {'per_message':>20} | {'batch':>20} | {'batch + 캐시':>20} | 개선")
+    for count in args.counts:
+        before, before_elements = measure(count, 'per_message', args.chunk, args.repeat)
+        after, after_elements = measure(count, 'batch', args.chunk, args.repeat)
+        cached, cached_elements = measure(count, 'batch', args.chunk, args.repeat, cached=True)
+        print(
+            f"{count:>8} | "
+            f"{before * 1000:>9.1f}ms ({before_elements:>5}개) | "
+            f"{after * 1000:>9.1f}ms ({after_elements:>5}개) | "
+            f"{cached * 1000:>9.1f}ms ({cached_elements:>5}개) | "
+            f"{before / cached:.1f}배"
+        )
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
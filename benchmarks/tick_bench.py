@@ -0,0 +1,126 @@
+"""
+자동 새로고침 한 번의 CPU 시간 벤치마크 - 전체 새로고침(rerun) vs 채팅 영역 fragment
+
+학생 N명이 같은 세션을 보고 있을 때 새로고침 한 번에 드는 CPU 시간(time.process_time)을 학생 한 명 기준으로 잽니다.
+    full: 예전 방식 (time.sleep 뒤 st.rerun) - app.py 전체를 다시 실행 (CSS, 사이드바, 입력창 포함)
+    fragment: 채팅 영역만 다시 실행 - show_student_messages만 실행 (fragment가 run_every마다 부르는 함수)
+예전 방식의 sleep은 CPU를 쓰지 않으므로 빼고 재며, 대신 학생마다 스크립트 스레드 하나를 잡고 있었습니다.
+
+저장소 데이터가 저장소 폴더를 건드리지 않도록 앱 모듈을 임시 폴더에 복사해서 log 저장소로 실행합니다.
+라운드마다 새 메시지를 --new개 추가한 뒤 학생 화면을 한 번씩 새로고침합니다.
+Streamlit AppTest 자체의 비용(스크립트 스레드, 요소 트리 변환)도 두 방식에 똑같이 포함됩니다.
+
+실행:
+    python benchmarks/tick_bench.py
+    python benchmarks/tick_bench.py --clients 1 10 50 --messages 200 --rounds 5 --new 1
+"""
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def fragment_script(app_dir):
+    """AppTest로 실행할 화면: 자동 새로고침 fragment 한 번 (app.show_student_messages만)"""
+    import sys
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)
+    
+    import app
+    app.show_student_messages()
+
+def student_state(session_id, number):
+    """학생 화면이 이름 입력을 마친 뒤의 session_state"""
+    return {
+        'user_type': 'student',
+        'session_id': session_id,
+        'username': f"학생{number}",
+        'message_counter': 0
+    }
+
+def open_clients(app_dir, session_id, count, mode):
+    """학생 화면 count개를 열고 첫 실행까지 마치기"""
+    clients = []
+    for number in range(count):
+        if mode == 'full':
+            at = AppTest.from_file(str(app_dir / "app.py"), default_timeout=120)
+        else:
+            at = AppTest.from_function(fragment_script, args=(str(app_dir),), default_timeout=120)
+        for key, value in student_state(session_id, number).items():
+            at.session_state[key] = value
+        at.run()
+        if mode == 'full':
+            # 예전 방식은 자동 새로고침이 sleep + st.rerun이라 fragment 없이 전체를 다시 실행
+            at.checkbox(key="student_auto_refresh").uncheck().run()
+        assert not at.exception, at.exception
+        clients.append(at)
+    return clients
+
+def measure(app_dir, store, session_id, count, mode, rounds, new):
+    """학생 한 명의 새로고침 한 번당 CPU 시간 (초)"""
+    from storage import make_message
+    
+    clients = open_clients(app_dir, session_id, count, mode)
+    cpu = 0.0
+    for round_number in range(rounds):
+        for i in range(new):
+            store.append_message(session_id, make_message("강사", f"공지 {round_number}-{i}", 'instructor'))
+        started = time.process_time()
+        for at in clients:
+            at.run()
+        cpu += time.process_time() - started
+        for at in clients:
+            assert not at.exception, at.exception
+    return cpu / (rounds * count)
+
+def prepare(app_dir, messages):
+    """임시 폴더에 앱 모듈을 복사하고 messages개 메시지가 있는 세션 만들기"""
+    for path in ROOT.glob("*.py"):
+        shutil.copy(path, app_dir / path.name)
+    sys.path.insert(0, str(app_dir))
+    
+    from storage import create_storage, make_message
+    
+    store = create_storage('log', data_dir=app_dir / "data")
+    session_id = store.create_session()
+    for i in range(messages):
+        store.append_message(
+            session_id,
+            make_message(f"학생{i % 50}", f"질문 {i} 자료는 https://example.com/slides/{i} 에 있나요?", 'student')
+        )
+    store.index.flush()
+    return store, session_id
+
+def main():
+    parser = argparse.ArgumentParser(description="자동 새로고침 한 번의 CPU 시간 벤치마크")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--messages', type=int, default=200, help="세션에 미리 넣어 둘 메시지 수")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--new', type=int, default=1, help="라운드마다 추가할 새 메시지 수")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        app_dir = Path(tmp)
+        store, session_id = prepare(app_dir, args.messages)
+        
+        print(f"{'학생 수':>6} | {'전체 새로고침':>12} | {'fragment':>10} | 개선 | 잠든 스레드 (전체 → fragment)")
+        for count in args.clients:
+            full = measure(app_dir, store, session_id, count, 'full', args.rounds, args.new)
+            fragment = measure(app_dir, store, session_id, count, 'fragment', args.rounds, args.new)
+            print(
+                f"{count:>6} | "
+                f"{full * 1000:>10.1f}ms | "
+                f"{fragment * 1000:>8.1f}ms | "
+                f"{full / fragment:.1f}배 | "
+                f"{count} → 0"
+            )
+            sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+API 응답 형식 벤치마크 - 세션 전체 기록(GET /api/session/<id>)의 전송 바이트와 인코딩/디코딩 시간
+
+서버(api-server/server.py)의 encode_body / compress_body로 응답 본문을 만들고,
+클라이언트(storage.ApiClient.decode)와 같은 방식으로 압축을 풀고 파싱합니다.
+    형식: json, msgpack (msgpack 설치 시)
+    압축: 없음, gzip, zstd (zstandard 설치 시)
+
+--url을 주면 실제 서버에 같은 크기의 세션을 만들고 HttpStorage.get_session으로 받는 시간도 잽니다
+(서버와 클라이언트에 msgpack / zstandard가 모두 있어야 모든 조합이 실제로 쓰임).
+
+실행:
+    python benchmarks/wire_bench.py --messages 1000 10000
+    python benchmarks/wire_bench.py --messages 1000 10000 --url http://127.0.0.1:5000
+"""
+
+import argparse
+import gzip
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "api-server"))
+
+import server
+from storage import ApiClient, HttpStorage, make_message
+
+FORMATS = ('json', 'msgpack')
+ENCODINGS = ('identity', 'gzip', 'zstd')
+
+SAMPLE_TEXTS = [
+    "교수님 방금 슬라이드 다시 설명해 주실 수 있나요?",
+    "과제 제출 마감이 언제인가요",
+    "참고 자료 링크 공유합니다 https://example.com/lecture/notes?week=3",
+    "네 이해했습니다 감사합니다!",
+    "2번 예제에서 시간 복잡도가 O(n log n)인 이유가 궁금합니다",
+    "<script> 같은 태그가 있으면 어떻게 보이나요?",
+]
+
+def build_session(count, participants=300):
+    """서버 응답과 같은 모양의 세션 (메시지 count개, 참여자 participants명)"""
+    messages = [server.make_system_message("세션이 시작되었습니다")]
+    for i in range(count - 1):
+        if i % 20 == 0:
+            messages.append(server.make_system_message(f"학생{i % participants:03d}님이 입장했습니다"))
+        else:
+            msg_type = 'instructor' if i % 7 == 0 else 'student'
+            messages.append(server.make_message(f"학생{i % participants:03d}", SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)], msg_type))
+    for seq, msg in enumerate(messages, 1):
+        msg['seq'] = seq
+    return {
+        'success': True,
+        'session': {
+            'id': 'session-bench',
+            'created_at': '2026-01-01T09:00:00',
+            'participants': {f"학생{i:03d}": {'joined_at': '2026-01-01T09:00:00'} for i in range(participants)},
+            'cursor': len(messages),
+            'messages': messages
+        }
+    }
+
+def available():
+    """이 환경에서 쓸 수 있는 (형식, 압축) 조합"""
+    formats = [fmt for fmt in FORMATS if fmt == 'json' or server.msgpack is not None]
+    encodings = [enc for enc in ENCODINGS if enc != 'zstd' or server.zstandard is not None]
+    return [(fmt, enc) for fmt in formats for enc in encodings]
+
+def media_type(fmt):
+    return server.MSGPACK_TYPE if fmt == 'msgpack' else server.JSON_TYPE
+
+def timed(func, repeat):
+    """여러 번 실행한 시간의 중앙값 (초)"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+def encode(payload, fmt, enc):
+    body = server.encode_body(payload, media_type(fmt))
+    return body if enc == 'identity' else server.compress_body(body, enc)
+
+def decode(body, fmt, enc):
+    if enc == 'gzip':
+        body = gzip.decompress(body)
+    elif enc == 'zstd':
+        body = server.zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if fmt == 'msgpack':
+        return server.msgpack.unpackb(body)
+    return json.loads(body)
+
+def bench_offline(count, repeat):
+    payload = build_session(count)
+    results = []
+    for fmt, enc in available():
+        body = encode(payload, fmt, enc)
+        assert decode(body, fmt, enc) == payload
+        results.append({
+            'format': fmt,
+            'encoding': enc,
+            'bytes': len(body),
+            'encode': timed(lambda: encode(payload, fmt, enc), repeat),
+            'decode': timed(lambda: decode(body, fmt, enc), repeat)
+        })
+    return results
+
+def bench_live(url, count, repeat):
+    """실제 서버에 세션을 만들고 클라이언트 설정별로 전체 기록 받기"""
+    writer = HttpStorage(ApiClient(url))
+    session_id = writer.create_session()
+    batch = []
+    for i in range(count - 1):
+        batch.append((session_id, make_message(f"학생{i % 300:03d}", SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)])))
+        if len(batch) == server.MAX_BATCH_SIZE:
+            writer.append_messages(batch)
+            batch = []
+    if batch:
+        writer.append_messages(batch)
+    
+    results = []
+    for fmt, enc in available():
+        client = ApiClient(url, wire_format=fmt, compression=enc != 'identity')
+        if enc == 'gzip':
+            client.session.headers['Accept-Encoding'] = 'gzip'
+        storage = HttpStorage(client)
+        response = client.get(f"/api/session/{session_id}", headers={'Accept': client.accept}, stream=True)
+        wire = len(response.raw.read(decode_content=False))
+        got = response.headers.get('Content-Type', '').split(';')[0], response.headers.get('Content-Encoding', 'identity')
+        assert len(storage.get_session(session_id)['messages']) == count
+        results.append({
+            'format': fmt,
+            'encoding': enc,
+            'bytes': wire,
+            'fetch': timed(lambda: storage.get_session(session_id), repeat),
+            'served': got
+        })
+    return results
+
+def report(count, offline, live):
+    print(f"\n메시지 {count:,}개 · 참여자 300명")
+    print(f"  {'형식':<8} {'압축':<9} {'바이트':>11} {'비율':>6} {'인코딩':>9} {'디코딩':>9}" + (f" {'받기(HTTP)':>11}" if live else ""))
+    base = offline[0]['bytes']
+    live_by_key = {(row['format'], row['encoding']): row for row in live or []}
+    for row in offline:
+        line = (
+            f"  {row['format']:<8} {row['encoding']:<9} {row['bytes']:>11,} {row['bytes'] / base:>6.0%} "
+            f"{row['encode'] * 1000:>7.1f}ms {row['decode'] * 1000:>7.1f}ms"
+        )
+        live_row = live_by_key.get((row['format'], row['encoding']))
+        if live_row:
+            line += f" {live_row['fetch'] * 1000:>9.1f}ms"
+            if live_row['served'] != (media_type(row['format']), row['encoding']):
+                line += f"  (서버 응답: {live_row['served'][0]}, {live_row['served'][1]})"
+        print(line)
+    sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="API 응답 형식 벤치마크 (전송 바이트 / 인코딩 / 디코딩 시간)")
+    parser.add_argument('--messages', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=7, help="시간 측정 반복 횟수 (중앙값)")
+    parser.add_argument('--url', default=None, help="실제 서버로도 측정 (예: http://127.0.0.1:5000)")
+    args = parser.parse_args()
+    
+    missing = [name for name, module in (('msgpack', server.msgpack), ('zstandard', server.zstandard)) if module is None]
+    if missing:
+        print(f"설치되지 않아 빠지는 조합: {', '.join(missing)}")
+    for count in args.messages:
+        offline = bench_offline(count, args.repeat)
+        live = bench_live(args.url, count, args.repeat) if args.url else None
+        report(count, offline, live)
+
+if __name__ == "__main__":
+    main()
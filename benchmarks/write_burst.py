@@ -0,0 +1,148 @@
+"""
+메시지 폭주 벤치마크 - "질문 있나요?" 직후 학생 N명이 동시에 📤를 누르는 상황
+
+라운드마다 학생 스레드 N개가 동시에 메시지 하나씩 보내고, 마지막 응답까지 걸린 시간을 잽니다.
+    direct: 메시지마다 storage.append_message (json은 매번 전체 읽기/저장, http는 매번 POST)
+    coalesced: WriteCoalescer로 묶어서 storage.append_messages (묶음마다 쓰기 한 번, http는 POST /api/messages 한 번)
+
+결과: 폭주 중 지속 처리량(메시지/s), 메시지별 응답 지연 p50/p99, 묶음 수/평균 묶음 크기,
+끝난 뒤 저장소에 모든 메시지가 빠짐없이 seq 순서대로 있는지.
+
+실행:
+    python benchmarks/write_burst.py --backends json log sqlite --students 50 200
+    python benchmarks/write_burst.py --backends log sqlite --fsync           # 쓰기마다 / 묶음마다 fsync
+    python benchmarks/write_burst.py --backends http --url http://127.0.0.1:5000
+"""
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from storage import STORAGE_BACKENDS, ApiClient, HttpStorage, WriteCoalescer, create_storage, make_message
+
+MODES = ('direct', 'coalesced')
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+def run_bursts(append, session_id, students, rounds, pause):
+    """라운드마다 학생 전원이 동시에 한 번씩 전송 → (폭주 시간 합계, 지연 목록, 실패 수)"""
+    start = threading.Barrier(students + 1)
+    end = threading.Barrier(students + 1)
+    latencies = []
+    failures = []
+    
+    def student(i):
+        for r in range(rounds):
+            start.wait()
+            msg = make_message(f"학생{i}", f"학생{i}의 질문 {r}", 'student')
+            sent = time.perf_counter()
+            try:
+                ok = append(session_id, msg)
+            except Exception:
+                ok = False
+            # list.append는 스레드 안전
+            latencies.append(time.perf_counter() - sent)
+            if not ok:
+                failures.append(msg['id'])
+            end.wait()
+    
+    threads = [threading.Thread(target=student, args=(i,), daemon=True) for i in range(students)]
+    for thread in threads:
+        thread.start()
+    busy = 0.0
+    for _ in range(rounds):
+        start.wait()
+        released = time.perf_counter()
+        end.wait()
+        busy += time.perf_counter() - released
+        # 다음 질문까지 잠깐 쉼 (묶음 스레드도 비어 있는 상태에서 시작)
+        time.sleep(pause)
+    for thread in threads:
+        thread.join()
+    return busy, latencies, len(failures)
+
+def bench(storage, mode, students, rounds, pause, delay_ms, batch):
+    session_id = storage.create_session()
+    coalescer = None
+    if mode == 'coalesced':
+        coalescer = WriteCoalescer(storage, max_delay=delay_ms / 1000, max_batch=batch)
+        append = coalescer.append
+    else:
+        append = storage.append_message
+    busy, latencies, failures = run_bursts(append, session_id, students, rounds, pause)
+    
+    # 시작 메시지 + 보낸 메시지가 seq 1부터 빈틈없이 있어야 함
+    final = storage.get_session(session_id)
+    seqs = [msg['seq'] for msg in final['messages']]
+    expected = students * rounds - failures + 1
+    return {
+        'mode': mode,
+        'sent': students * rounds,
+        'failures': failures,
+        'throughput': (students * rounds) / busy if busy else 0.0,
+        'p50': percentile(latencies, 50),
+        'p99': percentile(latencies, 99),
+        'mean': statistics.mean(latencies) if latencies else 0.0,
+        'batches': coalescer.stats() if coalescer else None,
+        'complete': seqs == list(range(1, expected + 1))
+    }
+
+def report(backend, students, results, fsync):
+    print(f"\n{backend} · 학생 {students}명{' · fsync' if fsync else ''}")
+    print(f"  {'방식':<10} {'메시지/s':>10} {'p50':>9} {'p99':>9} {'묶음':>7} {'평균 묶음':>9}  확인")
+    for result in results:
+        stats = result['batches']
+        batches = f"{stats['batches']:>7} {stats['avg_batch']:>9.1f}" if stats else f"{'-':>7} {'-':>9}"
+        check = "OK" if result['complete'] and not result['failures'] else f"실패 {result['failures']}건 / 누락 또는 순서 오류"
+        print(
+            f"  {result['mode']:<10} {result['throughput']:>10,.0f} "
+            f"{result['p50'] * 1000:>7.1f}ms {result['p99'] * 1000:>7.1f}ms {batches}  {check}"
+        )
+    if len(results) == 2 and results[0]['throughput']:
+        print(f"  → 묶어서 쓰기 {results[1]['throughput'] / results[0]['throughput']:.1f}배")
+    sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="메시지 폭주 벤치마크 (메시지별 쓰기 vs 묶어서 쓰기)")
+    parser.add_argument('--backends', nargs='+', default=['json', 'log', 'sqlite'], choices=STORAGE_BACKENDS)
+    parser.add_argument('--url', default="http://127.0.0.1:5000", help="http 저장 방식의 API 서버")
+    parser.add_argument('--students', type=int, nargs='+', default=[50, 200])
+    parser.add_argument('--rounds', type=int, default=10, help="폭주 횟수 (학생마다 라운드당 메시지 하나)")
+    parser.add_argument('--pause', type=float, default=0.05, help="라운드 사이 쉬는 시간 (초)")
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--delay-ms', type=float, default=5, help="묶음을 모으는 최대 시간 (WRITE_BATCH_DELAY_MS)")
+    parser.add_argument('--batch', type=int, default=64, help="묶음 최대 크기 (WRITE_BATCH_SIZE)")
+    parser.add_argument('--fsync', action='store_true', help="쓰기마다(묶으면 묶음마다) fsync")
+    args = parser.parse_args()
+    
+    for backend in args.backends:
+        for students in args.students:
+            results = []
+            for mode in args.modes:
+                data_dir = None
+                if backend == 'http':
+                    storage = HttpStorage(ApiClient(args.url, pool_size=students))
+                else:
+                    data_dir = Path(tempfile.mkdtemp(prefix="write-burst-"))
+                    storage = create_storage(backend, data_dir=data_dir, fsync=args.fsync)
+                try:
+                    results.append(bench(storage, mode, students, args.rounds, args.pause, args.delay_ms, args.batch))
+                finally:
+                    if data_dir is not None:
+                        shutil.rmtree(data_dir, ignore_errors=True)
+            report(backend, students, results, args.fsync and backend != 'http')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+채팅 기록 HTML 렌더링 - app.py / app_api.py 공용
+
+메시지마다 st.markdown을 호출하면 기록이 길어질수록 화면 요소 수가 늘어나서
+새로고침마다 브라우저로 보내고 비교하는 비용도 같이 늘어납니다.
+"batch" 방식은 기록 전체(또는 chunk_size개씩 묶은 덩어리)를 HTML 하나로 만들어
+요소 수를 일정하게 유지합니다.
+
+메시지 본문의 이스케이프/링크 변환은 저장할 때 한 번만 하고 (message_text.process_text)
+레코드의 'html'을 그대로 씁니다. 'html'이 없는 예전 레코드만 여기서 변환합니다.
+
+메시지는 한 번 쓰이면 바뀌지 않으므로 메시지별 HTML은 (세션 ID, 메시지 ID, 내 메시지 여부)를
+키로 프로세스 공용 LRU 캐시에 보관하고 새 메시지만 새로 만듭니다.
+메시지 ID는 클라이언트가 정하고 서버는 세션 안에서만 중복을 막으므로 세션 ID도 키에 넣습니다.
+아직 서버에 저장되지 않은 내 메시지('status'가 있는 로컬 사본)는 상태가 바뀌므로 캐시하지 않습니다.
+"""
+
+import html
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import streamlit as st
+
+from metrics import timed
+from message_text import process_text
+from storage import message_ts
+
+RENDER_MODES = ('batch', 'per_message')
+
+# 아직 서버에서 받아오지 못한 내 메시지의 상태 표시 (outbox.Outbox.local_messages)
+STATUS_LABELS = {
+    'pending': '<span style="color: #999; font-size: 12px;">⏳ 전송 중</span>',
+    'failed': '<span style="color: #dc2626; font-size: 12px;">⚠️ 전송 실패</span>'
+}
+
+def format_time(msg):
+    """메시지 시각 → HH:MM (시각이 없거나 잘못됐으면 현재 시각)"""
+    ts = message_ts(msg)
+    if ts is None:
+        return datetime.now().strftime('%H:%M')
+    return datetime.fromtimestamp(ts / 1000).strftime('%H:%M')
+
+def message_body(msg):
+    """저장된 HTML 조각 (없으면 예전 레코드이므로 지금 변환)"""
+    body = msg.get('html')
+    if body is not None:
+        return body
+    if msg.get('type') == 'system':
+        return process_text(msg.get('text', ''), linkify=False)['html']
+    return process_text(msg.get('message', ''))['html']
+
+def render_message(msg, me=None):
+    """메시지 하나의 HTML (me와 이름이 같으면 '나'로 표시)"""
+    body = message_body(msg)
+    if msg.get('type') == 'system':
+        return f'<div class="chat-message system-message">{body}</div>'
+    
+    username = msg.get('username', '익명')
+    display_name = '나' if me is not None and username == me else html.escape(username)
+    msg_class = 'instructor-message' if msg.get('type') == 'instructor' else 'student-message'
+    status = STATUS_LABELS.get(msg.get('status'))
+    # 아직 저장되지 않은 메시지는 흐리게
+    style = ' style="opacity: 0.6;"' if status else ''
+    label = f' {status}' if status else ''
+    return (
+        f'<div class="chat-message {msg_class}"{style}>'
+        f'<strong>{display_name}</strong> '
+        f'<span style="color: #999; font-size: 12px;">{format_time(msg)}</span>{label}'
+        f'<div style="margin-top: 4px;">{body}</div>'
+        '</div>'
+    )
+
+class RenderCache:
+    """메시지별 HTML LRU 캐시 (여러 화면/스레드가 같이 사용)"""
+    
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, msg, me=None, session_id=None):
+        """캐시에 있으면 그대로, 없으면 만들어서 저장 (다른 세션의 같은 ID와 섞이지 않게 세션 ID도 키에)"""
+        msg_id = msg.get('id')
+        if msg_id is None or msg.get('status'):
+            return render_message(msg, me)
+        # 화면마다 다른 부분은 '나' 표시뿐이므로 사용자 이름 대신 내 메시지 여부만 키에 넣음
+        key = (session_id, msg_id, me is not None and msg.get('username') == me)
+        with self.lock:
+            fragment = self.entries.get(key)
+            if fragment is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return fragment
+        
+        fragment = render_message(msg, me)
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = fragment
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return fragment
+    
+    def stats(self):
+        """캐시 항목 수 / 적중률"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+@st.cache_resource
+def get_render_cache(max_entries=5000):
+    """프로세스 전체에서 공유하는 메시지 HTML 캐시"""
+    return RenderCache(max_entries)
+
+def renderer(cache, session_id):
+    """메시지 하나를 그리는 함수 (cache가 있으면 세션 ID를 붙여 캐시를 거침)"""
+    if cache is None:
+        return render_message
+    return lambda msg, me: cache.render(msg, me, session_id)
+
+def render_chunks(messages, me=None, chunk_size=0, cache=None, session_id=None):
+    """메시지 목록 → HTML 덩어리 목록 (chunk_size가 0이면 하나로)"""
+    if not messages:
+        return []
+    render = renderer(cache, session_id)
+    size = chunk_size if chunk_size and chunk_size > 0 else len(messages)
+    # 덩어리 경계를 앞에서부터 고정해서 새 메시지가 와도 앞쪽 덩어리 내용은 그대로 유지
+    return [
+        "\n".join(render(msg, me) for msg in messages[start:start + size])
+        for start in range(0, len(messages), size)
+    ]
+
+@timed("render")
+def show_history(messages, me=None, mode='batch', chunk_size=0, cache=None, session_id=None):
+    """채팅 기록 표시 (batch: 덩어리마다 st.markdown 한 번, per_message: 메시지마다 한 번)"""
+    if mode == 'per_message':
+        render = renderer(cache, session_id)
+        for msg in messages:
+            st.markdown(render(msg, me), unsafe_allow_html=True)
+        return
+    for chunk in render_chunks(messages, me, chunk_size, cache, session_id):
+        st.markdown(chunk, unsafe_allow_html=True)
@@ -0,0 +1,76 @@
+"""
+화면용 대화 기록 창 - app.py / app_api.py 공용
+
+브라우저 세션마다 st.session_state.chat에 최근 메시지 창과 다음 커서를 들고 있다가
+새로고침마다 커서 이후에 추가된 내용만 받아서 합칩니다.
+저장소 호출은 각 앱이 넘겨주는 함수(get_session, get_older_messages)로 합니다.
+"""
+
+import streamlit as st
+
+from metrics import timed
+
+@timed("sync")
+def sync_window(session_id, get_session, window):
+    """새로 추가된 내용만 받아서 화면용 대화 기록(st.session_state.chat)에 합치기
+    
+    처음에는 최근 window개만 받고, 쌓인 메시지가 window의 두 배를 넘으면 최근 window개로 다시 받아서
+    세션이 길어져도 화면 하나가 들고 있는 메시지 수(메모리/렌더링 비용)를 제한함
+    """
+    chat = st.session_state.get('chat')
+    if not chat or chat['id'] != session_id:
+        chat = {
+            'id': session_id,
+            'messages': [],
+            'participants': {},
+            'cursor': None,
+            'before': None,
+            'window': window
+        }
+    
+    if chat['cursor'] is None:
+        update = get_session(session_id, limit=chat['window'])
+    else:
+        update = get_session(session_id, since=chat['cursor'])
+    if update is None:
+        return None
+    if update.get('archived') and not chat.get('archived'):
+        # 보는 중에 세션이 보관됨: 로컬 저장소는 보관본의 커서(메시지 수)가 달라서 처음부터 다시 받음
+        chat['archived'] = True
+        if chat['cursor'] is not None:
+            chat['cursor'] = None
+            st.session_state.chat = chat
+            return sync_window(session_id, get_session, window)
+    if chat['cursor'] is None:
+        chat['messages'] = update['messages']
+        chat['before'] = update.get('before')
+    else:
+        chat['messages'].extend(update['messages'])
+    chat['participants'].update(update.get('participants', {}))
+    chat['cursor'] = update['cursor']
+    st.session_state.chat = chat
+    if len(chat['messages']) > chat['window'] * 2:
+        chat['cursor'] = None
+        return sync_window(session_id, get_session, window)
+    return chat
+
+def load_older_messages(get_older_messages, page_size):
+    """'이전 메시지 더 보기': before 커서 앞의 한 페이지를 앞에 붙이고 창 크기를 늘림"""
+    chat = st.session_state.get('chat')
+    if not chat or chat.get('before') is None:
+        return
+    older, before = get_older_messages(chat['id'], chat['before'], page_size)
+    chat['messages'][:0] = older
+    chat['before'] = before
+    chat['window'] += len(older)
+
+def show_load_older(chat, get_older_messages, page_size):
+    """더 이전 메시지가 있으면 불러오기 버튼 표시"""
+    if chat.get('before') is not None:
+        st.button(
+            "⬆️ 이전 메시지 더 보기",
+            key="load_older",
+            on_click=load_older_messages,
+            args=(get_older_messages, page_size),
+            use_container_width=True
+        )
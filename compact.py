@@ -0,0 +1,49 @@
+"""
+저장소 정리 - 유휴 세션 보관 + 핫 저장소 압축
+
+오래 활동이 없는 세션을 data/archive/<세션 ID>.json.gz로 옮긴 뒤
+저장 방식별로 남은 파일을 정리합니다 (json: 들여쓰기 없이 다시 저장, sqlite: WAL 정리 + VACUUM,
+log: 없어진 세션의 색인 정리, 세션 색인: 세션마다 한 줄로 다시 씀). http 모드는 서버가 직접 보관합니다 (server.py --archive-idle).
+json / log 저장소는 잠금 파일 flock으로 앱의 쓰기와 차례를 맞추므로 앱이 실행 중이어도 됩니다 (Windows 제외).
+
+실행:
+    python compact.py --storage log --idle-hours 6
+    python compact.py --storage sqlite --session session-1700000000-abc123
+"""
+
+import argparse
+from pathlib import Path
+
+from storage import STORAGE_BACKENDS, create_storage
+
+def directory_size(path):
+    """폴더(또는 파일) 전체 크기 (바이트, SQLite -shm은 열린 연결용 공유 메모리라 제외)"""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file() and not f.name.endswith('-shm'))
+
+def main():
+    parser = argparse.ArgumentParser(description="유휴 세션 보관 + 저장소 정리")
+    parser.add_argument('--storage', default='log', choices=[b for b in STORAGE_BACKENDS if b not in ('memory', 'http')])
+    parser.add_argument('--data-dir', default=str(Path(__file__).parent / "data"))
+    parser.add_argument('--idle-hours', type=float, default=6, help="이 시간 동안 활동이 없는 세션을 보관 (0이면 보관하지 않음)")
+    parser.add_argument('--session', nargs='*', default=[], help="지금 바로 보관할 세션 ID")
+    args = parser.parse_args()
+    
+    before = directory_size(args.data_dir)
+    storage = create_storage(args.storage, data_dir=args.data_dir)
+    
+    archived = [session_id for session_id in args.session if storage.archive_session(session_id)]
+    if args.idle_hours > 0:
+        archived += storage.archive_idle_sessions(args.idle_hours * 3600)
+    storage.compact()
+    
+    after = directory_size(args.data_dir)
+    print(f"보관한 세션 {len(archived)}개")
+    for session_id in archived:
+        print(f"  {session_id}")
+    print(f"데이터 폴더 {before / 1024:.1f}KB → {after / 1024:.1f}KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+메시지 본문 처리 - storage.py와 api-server/server.py 공용 (표준 라이브러리만 사용)
+
+본문은 저장할 때 한 번만 HTML 이스케이프와 URL 링크 변환을 거쳐 원문 옆에 'html' 조각으로 저장되므로
+두 저장 경로(앱의 저장소, API 서버)가 같은 함수를 써야 화면에 같은 HTML이 나옵니다.
+"""
+
+import html
+import re
+
+# 링크로 바꿀 URL (http://, https:// 로 시작, 공백/따옴표/꺾쇠에서 끝남)
+URL_PATTERN = re.compile(r'https?://[^\s<>"\']+')
+
+LINK_TEMPLATE = '<a href="{url}" target="_blank" style="color: #667eea; text-decoration: underline;">{url}</a>'
+
+def process_text(text, linkify=True):
+    """메시지 본문을 저장할 때 한 번만 처리: HTML 이스케이프 + URL 링크 변환 + 메타데이터
+    
+    → {'html': 화면용 HTML 조각, 'link_count': 링크 수, 'length': 글자 수}
+    """
+    parts = []
+    link_count = 0
+    last = 0
+    if linkify:
+        for match in URL_PATTERN.finditer(text):
+            parts.append(html.escape(text[last:match.start()]))
+            parts.append(LINK_TEMPLATE.format(url=html.escape(match.group(0))))
+            link_count += 1
+            last = match.end()
+    parts.append(html.escape(text[last:]))
+    # 빈 줄이 있으면 HTML 블록이 끊기므로 줄바꿈은 <br>로
+    return {
+        'html': ''.join(parts).replace('\n', '<br>'),
+        'link_count': link_count,
+        'length': len(text)
+    }
@@ -0,0 +1,226 @@
+"""
+단계별 실행 시간 계측 - 화면 새로고침(rerun)을 단계별로 나눠 프로세스 전체 히스토그램으로 집계
+
+app.py / app_api.py의 main()과 화면 함수, 저장소/API 함수에 timed('단계 이름')을 붙여서
+저장소 읽기, API 왕복, QR 생성, HTML 렌더링, 대기(sleep) 중 어디에 시간이 드는지 봅니다.
+집계는 Prometheus 텍스트 형식으로 파일(node_exporter textfile 수집기 등)이나
+로컬 HTTP 엔드포인트(/metrics)로 내보냅니다.
+
+가져온 모듈은 새로고침마다 다시 실행되지 않으므로 REGISTRY 하나가 프로세스 전체에서 공유됩니다.
+내보내기(get_metrics_exporter)와 강사용 패널(show_metrics_panel)도 두 앱이 같이 씁니다.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import streamlit as st
+
+# 히스토그램 구간 상한 (초)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_NAME = "lecture_chat_phase_seconds"
+
+class Histogram:
+    """구간별 개수 / 합계 / 전체 개수 (구간은 value <= 상한인 첫 구간)"""
+    
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # 마지막 칸은 +Inf 구간
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def quantile(self, q):
+        """구간 안에서 선형 보간한 분위수 추정 (Prometheus histogram_quantile과 같은 방식)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    # +Inf 구간은 마지막 상한으로
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+class PhaseMetrics:
+    """단계 이름 → 실행 시간 히스토그램 (여러 화면/스레드가 같이 기록)"""
+    
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.started_at = time.time()
+    
+    def observe(self, phase, seconds):
+        with self.lock:
+            histogram = self.histograms.get(phase)
+            if histogram is None:
+                histogram = self.histograms[phase] = Histogram(self.buckets)
+            histogram.observe(seconds)
+    
+    @contextmanager
+    def phase(self, name):
+        """with 블록 실행 시간을 name 단계로 기록 (st.rerun 같은 예외로 끝나도 기록)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+    
+    def timed(self, name):
+        """함수 실행 시간을 name 단계로 기록하는 데코레이터"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+    
+    def summary(self):
+        """단계별 요약 (총 시간이 큰 순서)"""
+        with self.lock:
+            rows = [
+                {
+                    'phase': phase,
+                    'count': histogram.count,
+                    'total': histogram.sum,
+                    'avg': histogram.sum / histogram.count,
+                    'p50': histogram.quantile(0.5),
+                    'p95': histogram.quantile(0.95),
+                    'p99': histogram.quantile(0.99)
+                }
+                for phase, histogram in self.histograms.items()
+            ]
+        return sorted(rows, key=lambda row: row['total'], reverse=True)
+    
+    def prometheus_text(self):
+        """Prometheus 텍스트 형식 (버전 0.0.4)"""
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each phase of a Streamlit rerun.",
+            f"# TYPE {METRIC_NAME} histogram"
+        ]
+        with self.lock:
+            for phase in sorted(self.histograms):
+                histogram = self.histograms[phase]
+                label = phase.replace('\\', '\\\\').replace('"', '\\"')
+                cumulative = 0
+                for bound, n in zip(self.buckets, histogram.counts):
+                    cumulative += n
+                    lines.append(f'{METRIC_NAME}_bucket{{phase="{label}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_bucket{{phase="{label}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{METRIC_NAME}_sum{{phase="{label}"}} {histogram.sum:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{phase="{label}"}} {histogram.count}')
+        lines += [
+            "# HELP lecture_chat_process_start_time_seconds Start time of the process since unix epoch.",
+            "# TYPE lecture_chat_process_start_time_seconds gauge",
+            f"lecture_chat_process_start_time_seconds {self.started_at:.3f}"
+        ]
+        return "\n".join(lines) + "\n"
+
+class MetricsExporter:
+    """백그라운드에서 Prometheus 텍스트를 파일로 주기적으로 쓰거나 로컬 HTTP(/metrics)로 제공"""
+    
+    def __init__(self, registry, path=None, port=0, host='127.0.0.1', interval=15.0):
+        self.registry = registry
+        self.path = Path(path) if path else None
+        self.interval = interval
+        self.server = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            threading.Thread(target=self._write_loop, name="metrics-file", daemon=True).start()
+        if port:
+            self.server = ThreadingHTTPServer((host, port), self._handler())
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+    
+    def write(self):
+        """파일에 한 번 쓰기 (임시 파일에 쓴 뒤 교체해서 수집기가 반쯤 쓴 파일을 읽지 않게 함)"""
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(self.registry.prometheus_text(), encoding='utf-8')
+        tmp_path.replace(self.path)
+    
+    def _write_loop(self):
+        while True:
+            try:
+                self.write()
+            except OSError:
+                # 다음 주기에 다시 시도
+                pass
+            time.sleep(self.interval)
+    
+    def _handler(self):
+        registry = self.registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                # 수집기가 주기적으로 부르므로 접근 로그는 남기지 않음
+                pass
+        
+        return Handler
+
+# 프로세스 전체에서 공유하는 계측 (모듈은 한 번만 로드됨)
+REGISTRY = PhaseMetrics()
+
+timed = REGISTRY.timed
+
+phase = REGISTRY.phase
+
+@st.cache_resource
+def get_metrics_exporter(path, port):
+    """프로세스당 하나뿐인 단계별 시간 내보내기 (파일 쓰기 스레드 / HTTP 서버)"""
+    return MetricsExporter(REGISTRY, path or None, port)
+
+def show_metrics_panel(registry=REGISTRY):
+    """강사용 디버그 패널: 이 프로세스의 단계별 실행 시간 (METRICS_SIDEBAR)"""
+    with st.expander("⏱️ 단계별 실행 시간"):
+        rows = registry.summary()
+        if not rows:
+            st.caption("아직 기록이 없습니다")
+            return
+        st.dataframe(
+            [
+                {
+                    '단계': row['phase'],
+                    '횟수': row['count'],
+                    '합계(s)': round(row['total'], 3),
+                    '평균(ms)': round(row['avg'] * 1000, 1),
+                    'p50(ms)': round(row['p50'] * 1000, 1),
+                    'p95(ms)': round(row['p95'] * 1000, 1)
+                }
+                for row in rows
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
+        st.download_button(
+            "📈 Prometheus 형식으로 저장",
+            data=registry.prometheus_text(),
+            file_name="metrics.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
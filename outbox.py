@@ -0,0 +1,141 @@
+"""
+보내는 메시지 대기열 - 전송은 백그라운드 작업자가 하고 화면은 바로 다시 그림
+
+브라우저 세션(클라이언트)마다 Outbox 하나를 두고, 프로세스 전체가 공유하는 SendQueue의
+작업자 스레드(최대 workers개)가 Outbox를 하나씩 맡아 넣은 순서대로 보냅니다.
+화면은 아직 서버에서 받아오지 못한 내 메시지를 '전송 중'으로 바로 보여 주고,
+동기화로 같은 id의 메시지를 받으면(reconcile) Outbox에서 뺍니다.
+재시도까지 모두 실패한 메시지는 '실패'로 남겨서 다시 보내거나 지울 수 있게 합니다.
+
+재시도한 메시지가 두 번 저장되지 않도록 서버는 메시지 id로 중복을 걸러냅니다.
+보낸 id를 무시하고 새 id를 붙이는 예전 서버(API 버전 1)는 HttpStorage.sent_message_ids로
+서버가 돌려준 id를 보낸 id로 바꿔서 맞춥니다.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+class Outbox:
+    """클라이언트 하나의 보낼 메시지 (넣은 순서 유지, 작업자 스레드와 화면이 같이 사용)
+    
+    항목 상태: 'pending'(대기) → 'sending'(보내는 중) → 'sent'(서버 확인) / 'failed'(재시도 모두 실패)
+    """
+    
+    def __init__(self, limit=20):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.entries = []
+        # 작업자가 이 Outbox를 맡고 있는지 (Outbox마다 작업자 하나라 순서가 바뀌지 않음)
+        self.draining = False
+    
+    def add(self, session_id, msg):
+        """보낼 메시지 추가 → 추가했는지 (아직 확인받지 못한 메시지가 limit개면 False)"""
+        with self.lock:
+            unconfirmed = sum(1 for entry in self.entries if entry['status'] != 'sent')
+            if unconfirmed >= self.limit:
+                return False
+            self.entries.append({'session_id': session_id, 'msg': msg, 'status': 'pending', 'error': None})
+            return True
+    
+    def next_pending(self):
+        """다음으로 보낼 항목 ('sending'으로 바꿈, 없으면 작업자가 손을 떼고 None)"""
+        with self.lock:
+            for entry in self.entries:
+                if entry['status'] == 'pending':
+                    entry['status'] = 'sending'
+                    return entry
+            self.draining = False
+            return None
+    
+    def finish(self, entry, ok, error=None):
+        """전송 결과 기록"""
+        with self.lock:
+            entry['status'] = 'sent' if ok else 'failed'
+            entry['error'] = error
+    
+    def reconcile(self, synced_ids):
+        """서버에서 받아온 메시지(synced_ids)와 같은 항목은 빼기 (실패로 표시됐어도 서버에 있으면 뺌)"""
+        with self.lock:
+            self.entries = [entry for entry in self.entries if entry['msg']['id'] not in synced_ids]
+    
+    def local_messages(self, session_id):
+        """화면에 덧붙일 아직 받아오지 못한 내 메시지 ('status': 'pending' / 'failed', 확인받은 것은 표시 없이)"""
+        with self.lock:
+            messages = []
+            for entry in self.entries:
+                if entry['session_id'] != session_id:
+                    continue
+                status = {'pending': 'pending', 'sending': 'pending', 'failed': 'failed'}.get(entry['status'])
+                messages.append({**entry['msg'], 'status': status} if status else entry['msg'])
+            return messages
+    
+    def failed(self):
+        """실패한 항목 수"""
+        with self.lock:
+            return sum(1 for entry in self.entries if entry['status'] == 'failed')
+    
+    def retry_failed(self):
+        """실패한 항목을 다시 대기 상태로 → 바꾼 수"""
+        with self.lock:
+            count = 0
+            for entry in self.entries:
+                if entry['status'] == 'failed':
+                    entry['status'] = 'pending'
+                    entry['error'] = None
+                    count += 1
+            return count
+    
+    def discard_failed(self):
+        """실패한 항목 지우기"""
+        with self.lock:
+            self.entries = [entry for entry in self.entries if entry['status'] != 'failed']
+
+class SendQueue:
+    """프로세스 전체에서 공유하는 전송 작업자 (최대 workers개, Outbox마다 작업자 하나가 순서대로 보냄)
+    
+    send(session_id, msg) → 성공 여부. 예외(네트워크 오류/시간 초과)는 backoff * 2^n초 쉬고 retries번까지
+    다시 보내고, False(서버가 거절: 없는 세션, 종료된 세션 등)는 다시 보내지 않음
+    """
+    
+    def __init__(self, send, workers=4, retries=3, backoff=0.5):
+        self.send = send
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="send-queue")
+    
+    def submit(self, outbox, session_id, msg):
+        """메시지를 Outbox에 넣고 바로 돌아옴 → 넣었는지 (Outbox가 가득 차면 False)"""
+        if not outbox.add(session_id, msg):
+            return False
+        self.kick(outbox)
+        return True
+    
+    def kick(self, outbox):
+        """Outbox에 보낼 항목이 생겼으니 맡은 작업자가 없으면 하나 붙임"""
+        with outbox.lock:
+            if outbox.draining:
+                return
+            outbox.draining = True
+        self.executor.submit(self._drain, outbox)
+    
+    def _drain(self, outbox):
+        while True:
+            entry = outbox.next_pending()
+            if entry is None:
+                return
+            self._deliver(outbox, entry)
+    
+    def _deliver(self, outbox, entry):
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                ok = self.send(entry['session_id'], entry['msg'])
+            except Exception as e:
+                error = str(e)
+                continue
+            outbox.finish(entry, ok, None if ok else "서버가 메시지를 받지 않았습니다")
+            return
+        outbox.finish(entry, False, error)
@@ -0,0 +1,221 @@
+"""
+자동 새로고침 간격 조절 - 새 메시지가 오는 동안은 짧게, 조용하면 지수적으로 늘림
+
+자동 새로고침(fragment run_every)마다 새로 받은 내용이 있었는지(커서가 바뀌었는지) 보고
+있으면 가장 짧은 간격으로 당기고, 지금 간격의 절반만큼 조용했으면 backoff배씩 max_interval까지 늘립니다.
+클라이언트마다 고정된 jitter 배율을 곱해서 학생 수백 명의 새로고침 주기가 서로 어긋나게 합니다.
+
+fragment의 run_every는 전체 실행 때 정해지므로 다시 등록하려면 전체 새로고침이 한 번 필요합니다.
+간격이 rerun_ratio배 이상 짧아져야 할 때(새 메시지)는 바로 다시 등록하지만, 늘어날 때는 중간 단계마다
+다시 등록하지 않고 등록된 짧은 간격으로 계속 새로고침하면서 max_interval에 도달했을 때 한 번만 다시 등록합니다.
+조용해질 때마다 한 번, 다시 바빠질 때 한 번이 전부라서 fragment로 줄인 전체 새로고침이 다시 늘지 않습니다.
+
+PollStats는 프로세스 전체 클라이언트의 현재 간격과 실제 새로고침 횟수로 초당 요청 수를 집계합니다.
+
+아래쪽 함수들은 app.py / app_api.py 공용 화면 연결부입니다 (간격 정책은 각 앱이 설정으로 만들어 넘김).
+"""
+
+import random
+import threading
+import time
+from collections import deque
+
+import streamlit as st
+
+class PollSchedule:
+    """새로고침 간격 정책 (상태는 클라이언트마다 new_state()로 따로 보관)"""
+    
+    def __init__(self, min_interval, max_interval, backoff=2.0, jitter=0.2, rerun_ratio=1.5, clock=time.monotonic):
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.rerun_ratio = rerun_ratio
+        self.clock = clock
+    
+    def new_state(self):
+        """클라이언트 하나의 새로고침 상태"""
+        return {
+            'interval': self.min_interval,
+            # 클라이언트마다 고정 (매번 바꾸면 간격이 흔들려서 다시 등록할 일만 늘어남)
+            'jitter': random.uniform(1 - self.jitter, 1 + self.jitter),
+            'cursor': None,
+            'polled_at': None,
+            # 간격을 마지막으로 당기거나 늘린 시각 (그 뒤로 지금 간격의 절반만큼 조용하면 늘림)
+            'changed_at': None,
+            # 지금 fragment에 등록된 간격 (None이면 자동 새로고침 꺼짐)
+            'scheduled': None
+        }
+    
+    def observe(self, state, cursor):
+        """새로고침 한 번의 결과 반영 → 새 내용이 있었는지 (cursor가 지난번과 다르면 있었던 것)
+        
+        새로고침 횟수가 아니라 시간으로 늘림: 등록된 간격이 짧게 남아 있거나 사용자 조작 같은
+        전체 새로고침이 끼어들어도 지금 간격의 절반만큼 조용했을 때만 한 단계 늘어남
+        """
+        now = self.clock()
+        first = state['polled_at'] is None
+        changed = not first and cursor != state['cursor']
+        if changed:
+            state['interval'] = self.min_interval
+        if first or changed:
+            state['changed_at'] = now
+        elif now - state.get('changed_at', state['polled_at']) >= state['interval'] / 2:
+            state['interval'] = min(state['interval'] * self.backoff, self.max_interval)
+            state['changed_at'] = now
+        state['interval'] = min(max(state['interval'], self.min_interval), self.max_interval)
+        state['cursor'] = cursor
+        state['polled_at'] = now
+        return changed
+    
+    def wake(self, state):
+        """직접 메시지를 보낸 경우 등 곧 새 내용이 올 때 가장 짧은 간격으로"""
+        state['interval'] = self.min_interval
+        state['changed_at'] = self.clock()
+    
+    def run_every(self, state):
+        """fragment에 등록할 간격 (jitter 적용, 0.1초 단위)"""
+        return round(state['interval'] * state['jitter'], 1)
+    
+    def schedule(self, state):
+        """지금 간격을 등록한 것으로 기록 → 등록할 간격"""
+        state['scheduled'] = self.run_every(state)
+        return state['scheduled']
+    
+    def needs_rerun(self, state):
+        """다시 등록해야 하는지: 등록된 간격보다 rerun_ratio배 이상 짧아져야 하거나, 가장 긴 간격에 도달했는데 아직 등록 전
+        
+        늘어나는 중간 단계(예: 3→6→12초)에서는 다시 등록하지 않음 (등록된 짧은 간격으로 계속 새로고침하면서 늘어남)
+        """
+        scheduled = state['scheduled']
+        if not scheduled:
+            return False
+        target = self.run_every(state)
+        if target < scheduled:
+            return scheduled / target >= self.rerun_ratio
+        return state['interval'] == self.max_interval and target != scheduled
+
+class PollStats:
+    """프로세스 전체 자동 새로고침 집계 (최근 window초의 실제 횟수, 클라이언트별 현재 간격)"""
+    
+    def __init__(self, window=60.0, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.started_at = clock()
+        # 최근 window초 동안의 새로고침 시각
+        self.polls = deque()
+        # 클라이언트 ID → (등록된 간격, 고정 간격이었다면의 간격, 마지막 새로고침 시각)
+        self.clients = {}
+    
+    def record(self, client_id, interval, base_interval):
+        """클라이언트의 새로고침 한 번"""
+        now = self.clock()
+        with self.lock:
+            self.polls.append(now)
+            self.clients[client_id] = (interval, base_interval, now)
+            while self.polls[0] <= now - self.window:
+                self.polls.popleft()
+    
+    def report(self):
+        """클라이언트 수 / 현재 간격 기준 예상 초당 요청 / 실제 초당 요청 / 고정 간격이었다면의 초당 요청"""
+        now = self.clock()
+        with self.lock:
+            self._expire(now)
+            clients = list(self.clients.values())
+            measured = len(self.polls) / min(self.window, max(now - self.started_at, 1.0))
+        intervals = sorted(interval for interval, _, _ in clients)
+        return {
+            'clients': len(clients),
+            'expected_rps': sum(1 / interval for interval in intervals),
+            'measured_rps': measured,
+            'fixed_rps': sum(1 / base for _, base, _ in clients),
+            'median_interval': intervals[len(intervals) // 2] if intervals else 0.0
+        }
+    
+    def _expire(self, now):
+        while self.polls and self.polls[0] <= now - self.window:
+            self.polls.popleft()
+        # 간격의 두 배(최소 window초)가 지나도록 새로고침이 없으면 화면을 닫은 것으로 봄 (읽을 때만 훑음)
+        stale = [
+            client_id for client_id, (interval, _, last) in self.clients.items()
+            if now - last > max(interval * 2, self.window)
+        ]
+        for client_id in stale:
+            del self.clients[client_id]
+
+@st.cache_resource
+def get_poll_schedule(min_interval, max_interval, backoff, jitter):
+    """화면 종류별 자동 새로고침 간격 정책"""
+    return PollSchedule(min_interval, max_interval, backoff=backoff, jitter=jitter)
+
+@st.cache_resource
+def get_poll_stats(window=60.0):
+    """프로세스 전체에서 공유하는 자동 새로고침 집계 (기본은 최근 1분)"""
+    return PollStats(window)
+
+def fragment_every(seconds):
+    """seconds마다 자기 부분만 다시 실행하는 fragment 데코레이터 (미지원 버전이면 None)"""
+    fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+    if fragment is None:
+        return None
+    return fragment(run_every=seconds)
+
+def show_live_metric(label, value, seconds):
+    """seconds마다 이 숫자만 다시 그리기 (value는 그릴 때마다 부르는 함수, fragment 미지원이면 전체 실행 때만)"""
+    def draw():
+        st.metric(label, value())
+    refresh = fragment_every(seconds)
+    if refresh:
+        refresh(draw)()
+    else:
+        draw()
+
+def poll_state(schedule):
+    """이 브라우저 세션의 자동 새로고침 상태"""
+    if 'poll' not in st.session_state:
+        st.session_state.poll = schedule.new_state()
+    return st.session_state.poll
+
+def auto_refresh_fragment(schedule, enabled):
+    """지금 간격으로 자동 새로고침 fragment 데코레이터 만들기 (꺼져 있거나 미지원 버전이면 None)"""
+    state = poll_state(schedule)
+    if not enabled:
+        state['scheduled'] = None
+        return None
+    return fragment_every(schedule.schedule(state))
+
+def track_poll(schedule, chat, client_id):
+    """자동 새로고침 한 번 반영: 새 내용이 있으면 간격을 당기고 없으면 늘림
+    
+    fragment 간격은 전체 실행 때만 바뀌므로 간격이 많이 달라졌으면 전체를 다시 실행해서 다시 등록
+    """
+    state = poll_state(schedule)
+    schedule.observe(state, chat['cursor'])
+    if state['scheduled'] is None:
+        return
+    get_poll_stats().record(client_id, state['scheduled'], schedule.min_interval)
+    if schedule.needs_rerun(state):
+        st.rerun()
+
+def show_poll_interval(schedule):
+    """자동 새로고침 체크박스 아래 지금 간격 안내"""
+    state = poll_state(schedule)
+    if state['scheduled']:
+        st.caption(f"지금 {state['scheduled']:g}초마다 · 새 메시지가 없으면 최대 {schedule.max_interval:g}초까지 늘어남")
+
+def wake_polling(schedule):
+    """메시지를 보낸 직후: 답이 곧 올 수 있으니 가장 짧은 간격으로"""
+    schedule.wake(poll_state(schedule))
+
+def show_poll_panel():
+    """강사용: 이 프로세스의 자동 새로고침 요청 수 (간격 조절 전 고정 간격과 비교)"""
+    with st.expander("📡 자동 새로고침"):
+        report = get_poll_stats().report()
+        st.write(
+            f"새로고침 중인 화면 {report['clients']}개 · 간격 중앙값 {report['median_interval']:g}초"
+        )
+        st.write(
+            f"초당 요청 {report['expected_rps']:.1f}회 (최근 1분 실제 {report['measured_rps']:.1f}회, "
+            f"고정 간격이면 {report['fixed_rps']:.1f}회)"
+        )
@@ -0,0 +1,77 @@
+"""
+접속 중인 참여자 추적 - 화면 새로고침이 곧 하트비트
+
+클라이언트마다 마지막 하트비트 기준 만료 시각을 두고, 만료 시각 순 힙에서
+지난 항목만 꺼내 정리합니다. 세션별 접속자 수는 들어오고 나갈 때마다 바로 갱신하므로
+읽을 때 참여자 목록을 훑지 않습니다.
+"""
+
+import heapq
+import threading
+import time
+
+class PresenceTracker:
+    """세션별 접속자 (ttl초 동안 하트비트가 없으면 나간 것으로 봄)"""
+    
+    def __init__(self, ttl=30.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # (세션 ID, 클라이언트 ID) → 만료 시각
+        self.deadlines = {}
+        # 세션 ID → 접속자 수
+        self.counts = {}
+        # (만료 시각, 세션 ID, 클라이언트 ID), 클라이언트마다 항목 하나
+        self.heap = []
+    
+    def heartbeat(self, session_id, client_id):
+        """하트비트 (처음이면 접속자 수 증가)"""
+        now = self.clock()
+        key = (session_id, client_id)
+        with self.lock:
+            self._expire(now)
+            if key not in self.deadlines:
+                self.counts[session_id] = self.counts.get(session_id, 0) + 1
+                heapq.heappush(self.heap, (now + self.ttl, session_id, client_id))
+            # 이미 힙에 있으면 만료 시각만 늦춤 (힙 항목은 꺼낼 때 다시 넣음)
+            self.deadlines[key] = now + self.ttl
+    
+    def leave(self, session_id, client_id):
+        """명시적으로 나가기"""
+        with self.lock:
+            if self.deadlines.pop((session_id, client_id), None) is not None:
+                self._decrement(session_id)
+    
+    def count(self, session_id):
+        """현재 접속자 수"""
+        with self.lock:
+            self._expire(self.clock())
+            return self.counts.get(session_id, 0)
+    
+    def total(self):
+        """전체 세션의 접속자 수"""
+        with self.lock:
+            self._expire(self.clock())
+            return len(self.deadlines)
+    
+    def _expire(self, now):
+        """만료 시각이 지난 힙 항목 정리 (그 사이 하트비트가 왔으면 새 만료 시각으로 다시 넣음)"""
+        while self.heap and self.heap[0][0] <= now:
+            _, session_id, client_id = heapq.heappop(self.heap)
+            key = (session_id, client_id)
+            deadline = self.deadlines.get(key)
+            if deadline is None:
+                # 이미 나간 클라이언트
+                continue
+            if deadline > now:
+                heapq.heappush(self.heap, (deadline, session_id, client_id))
+            else:
+                del self.deadlines[key]
+                self._decrement(session_id)
+    
+    def _decrement(self, session_id):
+        remaining = self.counts[session_id] - 1
+        if remaining:
+            self.counts[session_id] = remaining
+        else:
+            del self.counts[session_id]
@@ -0,0 +1,92 @@
+"""
+QR 코드 PNG 생성 - app.py / app_api.py 공용
+
+같은 입력의 PNG는 프로세스 공용 LRU 캐시(QrCache)에서 재사용하고,
+cache_dir을 주면 파일로도 저장해서 재시작 후에도 다시 만들지 않습니다.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+import streamlit as st
+
+from metrics import timed
+
+def make_qr_png(data, box_size=10, border=4, error_correction=qrcode.constants.ERROR_CORRECT_L):
+    """QR 코드 PNG 바이트 (캐시 없이 매번 생성)"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=error_correction,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    
+    img = qr.make_image(fill_color="black", back_color="white")
+    
+    # PNG 바이트로 변환
+    buf = BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+class QrCache:
+    """QR 코드 PNG LRU 캐시 (여러 화면/스레드가 같이 사용, cache_dir이 있으면 파일에도 저장)"""
+    
+    def __init__(self, max_entries=64, cache_dir=None):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def png(self, data, box_size=10, border=4, error_correction=qrcode.constants.ERROR_CORRECT_L):
+        """QR 코드 PNG 바이트 (같은 입력은 캐시에서)"""
+        key = (data, box_size, border, error_correction)
+        with self.lock:
+            png = self.entries.get(key)
+            if png is not None:
+                self.entries.move_to_end(key)
+                return png
+        
+        png = self._load(key)
+        if png is None:
+            png = make_qr_png(data, box_size, border, error_correction)
+            self._save(key, png)
+        with self.lock:
+            self.entries[key] = png
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return png
+    
+    def _file(self, key):
+        digest = hashlib.sha256("|".join(str(part) for part in key).encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{digest}.png"
+    
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        cache_file = self._file(key)
+        return cache_file.read_bytes() if cache_file.exists() else None
+    
+    def _save(self, key, png):
+        if self.cache_dir is None:
+            return
+        # 임시 파일에 쓴 뒤 교체해서 읽는 쪽이 반쯤 쓴 파일을 보지 않게 함
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        cache_file = self._file(key)
+        tmp_file = cache_file.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_file.write_bytes(png)
+        tmp_file.replace(cache_file)
+
+@st.cache_resource
+def get_qr_cache(max_entries=64, cache_dir=None):
+    """프로세스 전체에서 공유하는 QR 코드 캐시"""
+    return QrCache(max_entries, cache_dir)
+
+@timed("qr")
+def qr_image(cache, data):
+    """st.image에 넘길 QR 코드 이미지"""
+    return BytesIO(cache.png(data))
@@ -0,0 +1,1682 @@
+"""
+강의 채팅 저장소 - 저장 방식이 달라도 같은 인터페이스로 사용
+
+- "json": data/sessions.json 하나에 전체 저장 (기존 방식)
+- "log": 세션별 append-only 로그 (data/sessions/<세션 ID>.jsonl)
+- "memory": 프로세스 메모리 (재시작하면 사라짐, 테스트/벤치마크용)
+- "sqlite": SQLite WAL 모드 (data/chat.db)
+- "http": API 서버 (api-server/server.py)
+
+since 커서의 의미는 저장 방식마다 다르므로 (바이트 위치, 메시지 수, seq)
+돌려받은 cursor 값을 그대로 다음 호출에 넘겨야 합니다.
+
+종료되었거나 오래 쓰이지 않은 세션은 archive_session / archive_idle_sessions로
+핫 저장소에서 빼서 세션별 gzip 파일(data/archive/<세션 ID>.json.gz)로 옮기며,
+보관된 세션도 get_session / list_messages_before로 그대로 읽을 수 있습니다 ('archived': True).
+
+여러 메시지는 append_messages로 저장소 쓰기 한 번(fsync를 켜면 fsync 한 번)에 추가할 수 있고,
+WriteCoalescer는 동시에 들어온 메시지 추가를 짧게 모아서 그렇게 한 번에 씁니다 (group commit).
+
+세션 색인(SessionIndex, data/index-<저장 방식>.jsonl)은 세션 ID → 생성 시각 / 상태 / 메시지 수를
+따로 보관해서 입장 확인(session_info)이 메시지 본문이나 저장소 전체를 읽지 않게 합니다.
+
+메시지 레코드에는 저장할 때 세션 안에서 1부터 빈틈없이 늘어나는 'seq'가 붙고,
+시각은 epoch 밀리초 정수 'ts'로 저장합니다 (예전 레코드는 ISO 문자열 'timestamp').
+이전 메시지를 거꾸로 불러오는 before 커서도 마찬가지입니다 (None이면 더 이전 메시지 없음).
+
+"http"는 세션/메시지 목록을 msgpack이 설치되어 있으면 MessagePack으로, 응답은 zstd(zstandard 설치 시) 또는
+gzip으로 압축해서 받습니다 (서버가 지원하지 않으면 JSON / 압축 없이).
+"""
+
+import bisect
+import gzip
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from message_text import process_text
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: 프로세스 안 잠금만 (앱을 멈추고 compact.py 실행)
+    fcntl = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+DATA_DIR = Path(__file__).parent / "data"
+
+SESSION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+STORAGE_BACKENDS = ('json', 'log', 'memory', 'sqlite', 'http')
+
+# API 응답 형식 ("auto": msgpack이 설치되어 있으면 MessagePack, 아니면 JSON)
+WIRE_FORMATS = ('auto', 'msgpack', 'json')
+
+MSGPACK_TYPE = 'application/msgpack'
+
+# zstd 프레임 시작 바이트 (urllib3가 zstd를 풀지 못해서 압축된 채로 온 본문 확인용)
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+def new_session_id():
+    """새 세션 ID"""
+    return f"session-{int(time.time())}-{uuid.uuid4().hex[:6]}"
+
+def now_ms():
+    """현재 시각 (epoch 밀리초)"""
+    return time.time_ns() // 1_000_000
+
+def message_ts(msg):
+    """메시지 시각 (epoch 밀리초, 'ts'가 없는 예전 레코드는 ISO 'timestamp'에서 변환, 둘 다 없으면 None)"""
+    ts = msg.get('ts')
+    if ts is not None:
+        return ts
+    try:
+        return int(datetime.fromisoformat(msg['timestamp']).timestamp() * 1000)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def make_message(username, message, user_type='student'):
+    """일반 메시지 레코드 (원문 옆에 미리 만든 HTML 조각과 메타데이터를 같이 저장, seq는 저장소가 붙임)"""
+    ts = now_ms()
+    return {
+        'id': f"msg-{ts}-{uuid.uuid4().hex[:6]}",
+        'username': username,
+        'message': message,
+        'type': user_type,
+        'ts': ts,
+        **process_text(message)
+    }
+
+def make_system_message(text):
+    """시스템 메시지 레코드 (이름이 들어갈 수 있으므로 HTML은 이스케이프만)"""
+    ts = now_ms()
+    return {
+        'id': f"sys-{ts}-{uuid.uuid4().hex[:6]}",
+        'text': text,
+        'type': 'system',
+        'ts': ts,
+        'html': process_text(text, linkify=False)['html']
+    }
+
+def page_before(messages, before, limit):
+    """before(메시지 위치) 바로 앞의 최대 limit개 → (메시지 목록, 더 이전 페이지용 before 커서)"""
+    end = len(messages) if before is None else min(before, len(messages))
+    start = max(end - limit, 0)
+    return messages[start:end], start or None
+
+def session_last_active(session):
+    """세션의 마지막 활동 시각 (마지막 메시지 시각, 메시지가 없으면 생성 시각, epoch 밀리초)"""
+    if session['messages']:
+        ts = message_ts(session['messages'][-1])
+        if ts is not None:
+            return ts
+    return message_ts({'timestamp': session.get('created_at')}) or 0
+
+def slice_session(session, since, limit=None):
+    """세션 사본에서 since(이미 받은 메시지 수) 이후 메시지만 남기고 커서 추가 (since 없이 limit이면 최근 limit개)"""
+    messages = session['messages']
+    sliced = {
+        **session,
+        'participants': dict(session['participants']),
+        'cursor': len(messages)
+    }
+    if since is None and limit is not None:
+        sliced['messages'], sliced['before'] = page_before(messages, None, limit)
+    else:
+        sliced['messages'] = messages[since or 0:]
+    return sliced
+
+class FileLock:
+    """스레드 잠금 + 잠금 파일 flock (같은 파일을 쓰는 다른 프로세스, 예를 들어 앱과 compact.py도 차례로)
+    
+    path가 None이거나 fcntl이 없으면 프로세스 안 잠금만
+    """
+    
+    def __init__(self, path=None):
+        self.lock = threading.Lock()
+        self.fd = None
+        if path is not None and fcntl is not None:
+            self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    
+    def __enter__(self):
+        self.lock.acquire()
+        if self.fd is not None:
+            try:
+                fcntl.flock(self.fd, fcntl.LOCK_EX)
+            except BaseException:
+                self.lock.release()
+                raise
+        return self
+    
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
+    
+    def __del__(self):
+        if self.fd is not None:
+            os.close(self.fd)
+
+class SessionArchive:
+    """종료/유휴 세션 보관소 (세션마다 gzip JSON 파일 하나, 한 번 쓰면 바뀌지 않음)"""
+    
+    def __init__(self, directory, cache_size=16):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.cache_size = cache_size
+        # 보관된 세션을 계속 보는 화면이 있어도 매번 압축을 풀지 않도록 최근 것만 보관
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def path(self, session_id):
+        """보관 파일 경로 (잘못된 세션 ID면 None)"""
+        if not session_id or not SESSION_ID_PATTERN.fullmatch(session_id):
+            return None
+        return self.directory / f"{session_id}.json.gz"
+    
+    def exists(self, session_id):
+        path = self.path(session_id)
+        return path is not None and path.exists()
+    
+    def write(self, session):
+        """세션 전체를 압축해서 저장 (임시 파일에 쓴 뒤 교체) → 성공 여부
+        
+        이미 보관된 세션보다 메시지가 적으면 덮어쓰지 않음 (보관 후 다시 생긴 빈 세션이 기록을 지우지 않게)
+        """
+        existing = self.read(session['id'])
+        if existing is not None and len(existing['messages']) > len(session['messages']):
+            return False
+        record = {key: value for key, value in session.items() if key not in ('cursor', 'before')}
+        record['archived_at'] = now_ms()
+        path = self.path(record['id'])
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, separators=(',', ':'))
+        tmp_path.replace(path)
+        with self.lock:
+            self.cache.pop(record['id'], None)
+        return True
+    
+    def read(self, session_id):
+        """보관된 세션 전체 (없으면 None)"""
+        with self.lock:
+            session = self.cache.get(session_id)
+            if session is not None:
+                self.cache.move_to_end(session_id)
+                return session
+        if not self.exists(session_id):
+            return None
+        with gzip.open(self.path(session_id), 'rt', encoding='utf-8') as f:
+            session = json.load(f)
+        with self.lock:
+            self.cache[session_id] = session
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return session
+    
+    def get_session(self, session_id, since=None, limit=None):
+        """보관된 세션을 저장소 get_session과 같은 형태로 (커서 = 메시지 수)"""
+        session = self.read(session_id)
+        if session is None:
+            return None
+        return {**slice_session(session, since, limit), 'archived': True}
+    
+    def list_messages_before(self, session_id, before=None, limit=50):
+        session = self.read(session_id)
+        if session is None:
+            return [], None
+        return page_before(session['messages'], before, limit)
+    
+    def scan(self):
+        """보관된 모든 세션의 (세션 ID, 생성 시각, 메시지 수) (색인을 다시 만들 때만 사용)"""
+        for path in self.directory.glob("*.json.gz"):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                session = json.load(f)
+            yield session['id'], session.get('created_at'), len(session['messages'])
+
+class SessionIndex:
+    """세션 색인: 세션 ID → {'created_at', 'state'('active' / 'archived'), 'message_count'}
+    
+    append-only JSONL 파일에 바뀐 항목만 한 줄씩 붙이고 (같은 ID는 뒤의 줄이 이김) 메모리에 전체를 둠.
+    다른 프로세스가 붙인 줄도 읽을 때 파일 끝에서 이어 읽음 (path가 None이면 메모리에만).
+    메시지 수는 메모리에서 바로 올리고 파일에는 flush_interval초마다 모아서 씀
+    (비정상 종료로 빠진 메시지 수는 다음 시작 때 create_storage가 recount로 맞춤)
+    """
+    
+    def __init__(self, path=None, flush_interval=5.0):
+        self.path = Path(path) if path is not None else None
+        self.flush_interval = flush_interval
+        self.entries = {}
+        # 메시지 수가 바뀌었지만 아직 파일에 쓰지 않은 세션
+        self.dirty = set()
+        self.offset = 0
+        self.inode = None
+        self.flushed_at = time.monotonic()
+        # 파일이 없으면 처음이거나 예전 데이터이므로 create_storage가 rebuild로 채움
+        self.loaded = self.path is not None and self.path.exists()
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        # compact.py가 파일을 다시 쓰는 동안 다른 프로세스가 붙인 줄이 없어지지 않게
+        self.lock = FileLock(None if self.path is None else self.path.with_suffix('.lock'))
+        if self.path is not None:
+            with self.lock:
+                self._refresh()
+    
+    def get(self, session_id):
+        """세션 메타데이터 {'id', 'created_at', 'state', 'message_count'} (없으면 None)"""
+        with self.lock:
+            self._refresh()
+            entry = self.entries.get(session_id)
+            return None if entry is None else {'id': session_id, **entry}
+    
+    def add(self, session_id, created_at):
+        """새 세션 (바로 파일에 씀)"""
+        with self.lock:
+            self.entries[session_id] = {'created_at': created_at, 'state': 'active', 'message_count': 0}
+            self._write([session_id])
+    
+    def count_message(self, session_id, seq):
+        """메시지가 추가됨 (seq가 곧 메시지 수)"""
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is None:
+                return
+            entry['message_count'] = max(entry['message_count'], seq)
+            self.dirty.add(session_id)
+            if time.monotonic() - self.flushed_at >= self.flush_interval:
+                self._flush()
+    
+    def set_state(self, session_id, state):
+        """세션 상태 변경 (바로 파일에 씀)"""
+        with self.lock:
+            entry = self.entries.get(session_id)
+            if entry is None:
+                return
+            entry['state'] = state
+            self._write([session_id])
+    
+    def flush(self):
+        """아직 쓰지 않은 메시지 수를 파일에 씀"""
+        with self.lock:
+            self._flush()
+    
+    def recount(self, sessions):
+        """(세션 ID, 생성 시각, 메시지 수) 목록에 맞게 메시지 수를 고치고 빠진 세션을 채움 (바로 파일에 씀)"""
+        with self.lock:
+            self._refresh()
+            changed = []
+            for session_id, created_at, count in sessions:
+                entry = self.entries.get(session_id)
+                if entry is None:
+                    self.entries[session_id] = {'created_at': created_at, 'state': 'active', 'message_count': count}
+                elif entry['message_count'] != count:
+                    entry['message_count'] = count
+                else:
+                    continue
+                changed.append(session_id)
+            if changed:
+                self._write(changed)
+    
+    def replace(self, entries):
+        """색인 전체를 entries로 바꿔서 다시 씀"""
+        with self.lock:
+            self.entries = {session_id: dict(entry) for session_id, entry in entries.items()}
+            self._rewrite()
+    
+    def compact(self):
+        """세션마다 한 줄만 남도록 파일을 다시 씀"""
+        with self.lock:
+            self._refresh()
+            self._rewrite()
+    
+    def _refresh(self):
+        """다른 프로세스가 붙인 줄 읽기 (파일이 다시 쓰였으면 처음부터)"""
+        if self.path is None:
+            return
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode = stat.st_ino
+            self.offset = 0
+        if stat.st_size == self.offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read()
+        for line in data.splitlines(keepends=True):
+            # 아직 쓰는 중인 마지막 줄은 다음 번에 읽음
+            if not line.endswith(b"\n"):
+                break
+            self.offset += len(line)
+            record = json.loads(line)
+            entry = self.entries.setdefault(record.pop('id'), {'message_count': 0})
+            # 메시지 수는 늦게 쓰이므로 메모리 쪽이 더 클 수 있음
+            record['message_count'] = max(entry['message_count'], record.get('message_count', 0))
+            entry.update(record)
+    
+    def _write(self, session_ids):
+        self.dirty.difference_update(session_ids)
+        if self.path is None:
+            return
+        lines = [
+            json.dumps({'id': session_id, **self.entries[session_id]}, ensure_ascii=False) + "\n"
+            for session_id in session_ids
+        ]
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(lines))
+    
+    def _flush(self):
+        self.flushed_at = time.monotonic()
+        if self.dirty:
+            self._write([session_id for session_id in self.dirty if session_id in self.entries])
+            self.dirty.clear()
+    
+    def _rewrite(self):
+        self.dirty.clear()
+        self.flushed_at = time.monotonic()
+        if self.path is None:
+            return
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for session_id, entry in self.entries.items():
+                f.write(json.dumps({'id': session_id, **entry}, ensure_ascii=False) + "\n")
+        tmp_path.replace(self.path)
+        stat = self.path.stat()
+        self.inode, self.offset = stat.st_ino, stat.st_size
+
+class Storage:
+    """저장소 인터페이스 (모든 저장 방식이 같은 메서드를 제공)"""
+    
+    # 종료/유휴 세션 보관소 (create_storage가 설정, None이면 보관하지 않음)
+    archive = None
+    
+    # 세션 색인 (create_storage가 설정, None이면 저장소에서 직접 확인)
+    index = None
+    
+    def create_session(self):
+        """새 세션 생성 → 세션 ID"""
+        session_id = new_session_id()
+        # 같은 초에 만든 세션끼리 ID가 겹치면 다시 만듦 (색인이 있으면 바로 확인)
+        while self.session_info(session_id) is not None:
+            session_id = new_session_id()
+        created_at = datetime.now().isoformat()
+        self._create_session(session_id, created_at)
+        if self.index is not None:
+            self.index.add(session_id, created_at)
+        self.append_message(session_id, make_system_message("세션이 시작되었습니다"))
+        return session_id
+    
+    def get_session(self, session_id, since=None, limit=None):
+        """세션 정보 (since 커서를 주면 그 이후에 추가된 메시지/참여자만, 'cursor'에 다음 커서)
+        
+        since 없이 limit을 주면 최근 limit개 메시지만 돌려주고 'before'에 이전 메시지용 커서를 넣음
+        핫 저장소에 없으면 보관소에서 읽음 ('archived': True, 커서 = 메시지 수)
+        """
+        session = self._get_session(session_id, since, limit)
+        if session is None and self.archive is not None:
+            return self.archive.get_session(session_id, since, limit)
+        return session
+    
+    def append_message(self, session_id, msg):
+        """메시지 레코드 추가 (세션의 다음 seq를 붙여서) → 성공 여부"""
+        seq = self._append_message(session_id, msg)
+        if seq is None:
+            return False
+        if self.index is not None:
+            self.index.count_message(session_id, seq)
+        return True
+    
+    def append_messages(self, items):
+        """여러 메시지를 저장소 쓰기 한 번으로 추가 [(세션 ID, 메시지 레코드)] → 메시지별 성공 여부"""
+        seqs = self._append_messages(items)
+        if self.index is not None:
+            for (session_id, _), seq in zip(items, seqs):
+                if seq is not None:
+                    self.index.count_message(session_id, seq)
+        return [seq is not None for seq in seqs]
+    
+    def add_participant(self, session_id, username):
+        """참여자 추가 (입장 시스템 메시지 포함) → 성공 여부"""
+        if not self._add_participant(session_id, username, datetime.now().isoformat()):
+            return False
+        self.append_message(session_id, make_system_message(f"{username}님이 입장했습니다"))
+        return True
+    
+    def list_messages(self, session_id, since=None):
+        """since 커서 이후의 새 메시지와 다음 커서"""
+        session = self.get_session(session_id, since)
+        if session is None:
+            return [], since
+        return session['messages'], session['cursor']
+    
+    def list_messages_before(self, session_id, before=None, limit=50):
+        """before 커서 바로 앞의 메시지 최대 limit개 (before가 None이면 최신부터) → (메시지 목록, 다음 before 커서)"""
+        if self.archive is not None and not self.session_exists(session_id):
+            return self.archive.list_messages_before(session_id, before, limit)
+        return self._list_messages_before(session_id, before, limit)
+    
+    def session_exists(self, session_id):
+        """핫 저장소에 세션이 있는지 (보관된 세션은 is_archived)"""
+        if self.index is not None:
+            info = self.index.get(session_id)
+            return info is not None and info['state'] == 'active'
+        return self._get_session(session_id, limit=0) is not None
+    
+    def is_archived(self, session_id):
+        """보관된 세션인지"""
+        if self.index is not None:
+            info = self.index.get(session_id)
+            return info is not None and info['state'] == 'archived'
+        return self.archive is not None and self.archive.exists(session_id)
+    
+    def session_info(self, session_id):
+        """세션 메타데이터 {'id', 'created_at', 'state', 'message_count'} (없으면 None)
+        
+        색인이 있으면 메시지 본문을 읽지 않음 (세션/메시지 수와 관계없이 비용 일정)
+        """
+        if self.index is not None:
+            return self.index.get(session_id)
+        session = self.get_session(session_id, limit=0)
+        if session is None:
+            return None
+        return {
+            'id': session_id,
+            'created_at': session.get('created_at'),
+            'state': 'archived' if session.get('archived') else 'active',
+            'message_count': None
+        }
+    
+    def archive_session(self, session_id):
+        """세션을 핫 저장소에서 빼서 압축 보관 파일로 옮김 (세션 종료) → 성공 여부"""
+        if self.archive is None:
+            return False
+        return self._archive(session_id)
+    
+    def archive_idle_sessions(self, max_idle_seconds):
+        """마지막 활동 후 max_idle_seconds가 지난 세션을 모두 보관 → 보관한 세션 ID 목록"""
+        if self.archive is None:
+            return []
+        cutoff = now_ms() - int(max_idle_seconds * 1000)
+        idle = [session_id for session_id, last_active in self._session_activity() if last_active < cutoff]
+        return [session_id for session_id in idle if self._archive(session_id)]
+    
+    def compact(self):
+        """핫 저장소 파일 정리 (저장 방식마다 다름) + 색인 파일 다시 쓰기"""
+        self._compact()
+        if self.index is not None:
+            self.index.compact()
+    
+    def rebuild_index(self):
+        """저장소와 보관소를 훑어서 색인을 처음부터 다시 만듦 (색인 파일이 없을 때 한 번)"""
+        entries = {}
+        if self.archive is not None:
+            for session_id, created_at, count in self.archive.scan():
+                entries[session_id] = {'created_at': created_at, 'state': 'archived', 'message_count': count}
+        for session_id, created_at, count in self._scan_sessions():
+            entries[session_id] = {'created_at': created_at, 'state': 'active', 'message_count': count}
+        self.index.replace(entries)
+    
+    def recount_index(self):
+        """색인의 메시지 수를 핫 저장소에 맞춤 (시작할 때, 모아서 쓰던 메시지 수가 비정상 종료로 빠졌을 수 있음)
+        
+        보관된 세션은 보관할 때 바로 쓰므로 진행 중인 세션만 훑음
+        """
+        self.index.recount(self._scan_sessions())
+    
+    def _archive(self, session_id):
+        if not self._move_to_archive(session_id):
+            return False
+        if self.index is not None:
+            self.index.set_state(session_id, 'archived')
+        return True
+    
+    def _get_session(self, session_id, since=None, limit=None):
+        raise NotImplementedError
+    
+    def _list_messages_before(self, session_id, before=None, limit=50):
+        raise NotImplementedError
+    
+    def _create_session(self, session_id, created_at):
+        raise NotImplementedError
+    
+    def _append_message(self, session_id, msg):
+        """메시지 추가 → 붙인 seq (세션이 없으면 None)"""
+        raise NotImplementedError
+    
+    def _append_messages(self, items):
+        """메시지 여러 개 추가 → 메시지별 seq (기본은 하나씩, 저장 방식마다 한 번에 쓰도록 바꿈)"""
+        return [self._append_message(session_id, msg) for session_id, msg in items]
+    
+    def _add_participant(self, session_id, username, joined_at):
+        raise NotImplementedError
+    
+    def _move_to_archive(self, session_id):
+        """세션 전체를 보관소에 쓰고 핫 저장소에서 삭제 (쓰기와 겹치지 않게 잠금 안에서)"""
+        raise NotImplementedError
+    
+    def _session_activity(self):
+        """(세션 ID, 마지막 활동 시각 epoch 밀리초) 목록"""
+        raise NotImplementedError
+    
+    def _scan_sessions(self):
+        """핫 저장소의 모든 (세션 ID, 생성 시각, 메시지 수) (색인을 다시 만들 때만 사용)"""
+        raise NotImplementedError
+    
+    def _compact(self):
+        pass
+
+class MemoryStorage(Storage):
+    """프로세스 메모리 저장소 (커서 = 이미 받은 메시지 수)"""
+    
+    def __init__(self):
+        self.sessions = {}
+        self.lock = threading.Lock()
+    
+    def _create_session(self, session_id, created_at):
+        with self.lock:
+            self.sessions[session_id] = {
+                'id': session_id,
+                'created_at': created_at,
+                'messages': [],
+                'participants': {}
+            }
+    
+    def session_exists(self, session_id):
+        return session_id in self.sessions
+    
+    def _get_session(self, session_id, since=None, limit=None):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return None
+            return slice_session(session, since, limit)
+    
+    def _list_messages_before(self, session_id, before=None, limit=50):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return [], None
+            return page_before(session['messages'], before, limit)
+    
+    def _move_to_archive(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return False
+            if not self.archive.write(session):
+                return False
+            del self.sessions[session_id]
+            return True
+    
+    def _session_activity(self):
+        with self.lock:
+            return [(session_id, session_last_active(session)) for session_id, session in self.sessions.items()]
+    
+    def _scan_sessions(self):
+        with self.lock:
+            return [
+                (session_id, session['created_at'], len(session['messages']))
+                for session_id, session in self.sessions.items()
+            ]
+    
+    def _append_message(self, session_id, msg):
+        return self._append_messages([(session_id, msg)])[0]
+    
+    def _append_messages(self, items):
+        seqs = []
+        with self.lock:
+            for session_id, msg in items:
+                session = self.sessions.get(session_id)
+                if session is None:
+                    seqs.append(None)
+                    continue
+                seq = len(session['messages']) + 1
+                session['messages'].append({**msg, 'seq': seq})
+                seqs.append(seq)
+        return seqs
+    
+    def _add_participant(self, session_id, username, joined_at):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                return False
+            session['participants'][username] = {'joined_at': joined_at}
+            return True
+
+class JsonFileStorage(Storage):
+    """JSON 파일 하나에 모든 세션을 저장 (기존 방식, 쓸 때마다 전체를 다시 저장)"""
+    
+    def __init__(self, path, fsync=False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 읽고 고쳐서 다시 저장하는 동안 다른 프로세스(compact.py 등)의 저장이 끼어들지 않게
+        self.lock = FileLock(self.path.with_suffix('.lock'))
+        self.fsync = fsync
+    
+    def load_sessions(self):
+        """세션 데이터 로드"""
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+    
+    def save_sessions(self, sessions):
+        """세션 데이터 저장 (들여쓰기 없이, 읽는 쪽이 쓰다 만 파일을 보지 않도록 임시 파일에 쓴 뒤 교체)"""
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(sessions, f, ensure_ascii=False, separators=(',', ':'))
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        tmp_path.replace(self.path)
+    
+    def _create_session(self, session_id, created_at):
+        with self.lock:
+            sessions = self.load_sessions()
+            sessions[session_id] = {
+                'id': session_id,
+                'created_at': created_at,
+                'messages': [],
+                'participants': {}
+            }
+            self.save_sessions(sessions)
+    
+    def _get_session(self, session_id, since=None, limit=None):
+        session = self.load_sessions().get(session_id)
+        if session is None:
+            return None
+        return slice_session(session, since, limit)
+    
+    def _list_messages_before(self, session_id, before=None, limit=50):
+        session = self.load_sessions().get(session_id)
+        if session is None:
+            return [], None
+        return page_before(session['messages'], before, limit)
+    
+    def _move_to_archive(self, session_id):
+        with self.lock:
+            sessions = self.load_sessions()
+            session = sessions.pop(session_id, None)
+            if session is None or not self.archive.write(session):
+                return False
+            self.save_sessions(sessions)
+            return True
+    
+    def _session_activity(self):
+        return [(session_id, session_last_active(session)) for session_id, session in self.load_sessions().items()]
+    
+    def _scan_sessions(self):
+        return [
+            (session_id, session['created_at'], len(session['messages']))
+            for session_id, session in self.load_sessions().items()
+        ]
+    
+    def _compact(self):
+        # 예전 들여쓰기 형식 파일도 한 번 다시 저장하면 줄어듦
+        with self.lock:
+            self.save_sessions(self.load_sessions())
+    
+    def _append_message(self, session_id, msg):
+        return self._append_messages([(session_id, msg)])[0]
+    
+    def _append_messages(self, items):
+        # 파일 전체를 한 번 읽고 한 번 저장
+        seqs = []
+        with self.lock:
+            sessions = self.load_sessions()
+            for session_id, msg in items:
+                session = sessions.get(session_id)
+                if session is None:
+                    seqs.append(None)
+                    continue
+                seq = len(session['messages']) + 1
+                session['messages'].append({**msg, 'seq': seq})
+                seqs.append(seq)
+            if any(seq is not None for seq in seqs):
+                self.save_sessions(sessions)
+        return seqs
+    
+    def _add_participant(self, session_id, username, joined_at):
+        with self.lock:
+            sessions = self.load_sessions()
+            if session_id not in sessions:
+                return False
+            sessions[session_id]['participants'][username] = {'joined_at': joined_at}
+            self.save_sessions(sessions)
+            return True
+
+class LogStorage(Storage):
+    """세션별 append-only 로그 (쓰기는 한 줄 추가, 커서 = 이미 읽은 바이트 수)
+    
+    최근 메시지/이전 페이지를 바로 찾을 수 있도록 세션마다 메시지 줄의 시작 위치와
+    참여자 목록을 메모리에 색인해 두고, 로그가 늘어난 만큼만 이어서 읽음
+    """
+    
+    def __init__(self, directory, fsync=False):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # 쓰기와 보관(읽고 지우기)이 다른 프로세스(compact.py 등)와도 겹치지 않게
+        self.lock = FileLock(self.directory / ".lock")
+        self.index_lock = threading.Lock()
+        self.indexes = {}
+        self.fsync = fsync
+    
+    def log_path(self, session_id):
+        """세션 로그 파일 경로 (잘못된 세션 ID면 None)"""
+        if not session_id or not SESSION_ID_PATTERN.fullmatch(session_id):
+            return None
+        return self.directory / f"{session_id}.jsonl"
+    
+    def append_record(self, session_id, record, create=False):
+        """세션 로그 끝에 레코드 한 줄 추가 → 성공 여부 (create가 아니면 로그가 있어야 함)"""
+        with self.lock:
+            return self.write_records(session_id, [record], create)
+    
+    def write_record(self, session_id, record):
+        """레코드 한 줄 쓰기 (self.lock 안에서 호출)"""
+        return self.write_records(session_id, [record])
+    
+    def write_records(self, session_id, records, create=False):
+        """레코드 여러 줄을 한 번에 쓰기 (self.lock 안에서 호출, fsync도 한 번) → 성공 여부
+        
+        create가 아니면 로그를 새로 만들지 않음 (보관되어 없어진 세션에 쓰면 빈 세션이 다시 생김)
+        """
+        path = self.log_path(session_id)
+        if path is None:
+            return False
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        opener = None if create else (lambda file, flags: os.open(file, flags & ~os.O_CREAT))
+        try:
+            with open(path, 'a', encoding='utf-8', opener=opener) as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+        except FileNotFoundError:
+            return False
+        return True
+    
+    def read_records(self, session_id, offset=0):
+        """offset(바이트) 이후의 레코드 읽기 → (레코드 목록, 다음 offset)"""
+        path = self.log_path(session_id)
+        if path is None:
+            return None, offset
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            # 없는 세션이거나 방금 보관됨
+            return None, offset
+        # 아직 쓰는 중인 마지막 줄은 다음 번에 읽음
+        end = data.rfind(b"\n") + 1
+        records = [json.loads(line) for line in data[:end].splitlines()]
+        return records, offset + end
+    
+    def refresh_index(self, session_id):
+        """세션 색인을 로그 끝까지 갱신 → 색인 (로그가 없으면 None)"""
+        path = self.log_path(session_id)
+        if path is None:
+            return None
+        with self.index_lock:
+            index = self.indexes.get(session_id)
+            if index is None:
+                index = {'offset': 0, 'created_at': None, 'participants': {}, 'message_offsets': []}
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(index['offset'])
+                    data = f.read()
+            except FileNotFoundError:
+                # 없는 세션이거나 방금 보관됨
+                self.indexes.pop(session_id, None)
+                return None
+            self.indexes[session_id] = index
+            position = index['offset']
+            for line in data.splitlines(keepends=True):
+                # 아직 쓰는 중인 마지막 줄은 다음 번에 읽음
+                if not line.endswith(b"\n"):
+                    break
+                record = json.loads(line)
+                kind = record.get('kind')
+                if kind == 'message':
+                    index['message_offsets'].append(position)
+                elif kind == 'participant':
+                    index['participants'][record['username']] = {'joined_at': record['joined_at']}
+                elif kind == 'session':
+                    index['created_at'] = record.get('created_at')
+                position += len(line)
+            index['offset'] = position
+            return {
+                'offset': index['offset'],
+                'created_at': index['created_at'],
+                'participants': dict(index['participants']),
+                'message_offsets': index['message_offsets']
+            }
+    
+    def read_message_range(self, session_id, start, end):
+        """로그의 [start, end) 바이트 구간에 있는 메시지 레코드만 읽기"""
+        with open(self.log_path(session_id), 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        messages = []
+        for line in data.splitlines():
+            record = json.loads(line)
+            if record.pop('kind') == 'message':
+                messages.append(record)
+        return messages
+    
+    def page_before(self, session_id, index, before, limit):
+        """색인에서 before(바이트 위치) 앞의 메시지 최대 limit개 → (메시지 목록, 다음 before 커서)"""
+        offsets = index['message_offsets']
+        end = index['offset'] if before is None else min(before, index['offset'])
+        stop = bisect.bisect_left(offsets, end)
+        start = max(stop - limit, 0)
+        if start == stop:
+            return [], (end if start else None)
+        messages = self.read_message_range(session_id, offsets[start], end)
+        return messages, (offsets[start] if start else None)
+    
+    def session_exists(self, session_id):
+        path = self.log_path(session_id)
+        return path is not None and path.exists()
+    
+    def _create_session(self, session_id, created_at):
+        self.append_record(session_id, {'kind': 'session', 'id': session_id, 'created_at': created_at}, create=True)
+    
+    def _get_session(self, session_id, since=None, limit=None):
+        if since is None and limit is not None:
+            # 최근 limit개만: 색인으로 필요한 구간만 읽음
+            index = self.refresh_index(session_id)
+            if index is None:
+                return None
+            try:
+                messages, before = self.page_before(session_id, index, None, limit)
+            except FileNotFoundError:
+                # 색인을 읽은 뒤 보관됨 → 보관소에서 읽도록
+                return None
+            return {
+                'id': session_id,
+                'created_at': index['created_at'],
+                'messages': messages,
+                'participants': index['participants'],
+                'cursor': index['offset'],
+                'before': before
+            }
+        
+        records, cursor = self.read_records(session_id, since or 0)
+        if records is None:
+            return None
+        session = {'id': session_id, 'messages': [], 'participants': {}, 'cursor': cursor}
+        for record in records:
+            kind = record.pop('kind')
+            if kind == 'session':
+                session.update(record)
+            elif kind == 'participant':
+                session['participants'][record.pop('username')] = record
+            elif kind == 'message':
+                session['messages'].append(record)
+        return session
+    
+    def _list_messages_before(self, session_id, before=None, limit=50):
+        index = self.refresh_index(session_id)
+        try:
+            if index is not None:
+                return self.page_before(session_id, index, before, limit)
+        except FileNotFoundError:
+            pass
+        # 읽는 도중 보관됨
+        if self.archive is not None:
+            return self.archive.list_messages_before(session_id, before, limit)
+        return [], None
+    
+    def _move_to_archive(self, session_id):
+        with self.lock:
+            session = self._get_session(session_id)
+            if session is None or not self.archive.write(session):
+                return False
+            self.log_path(session_id).unlink()
+            with self.index_lock:
+                self.indexes.pop(session_id, None)
+            return True
+    
+    def _session_activity(self):
+        # 로그는 쓸 때마다 파일 끝에 붙으므로 수정 시각이 곧 마지막 활동 시각
+        activity = []
+        for path in self.directory.glob("*.jsonl"):
+            try:
+                activity.append((path.stem, int(path.stat().st_mtime * 1000)))
+            except FileNotFoundError:
+                # 훑는 도중 보관됨
+                continue
+        return activity
+    
+    def _scan_sessions(self):
+        sessions = []
+        for path in self.directory.glob("*.jsonl"):
+            index = self.refresh_index(path.stem)
+            if index is not None:
+                sessions.append((path.stem, index['created_at'], len(index['message_offsets'])))
+        return sessions
+    
+    def _compact(self):
+        # 보관되어 없어진 세션의 색인 정리
+        with self.index_lock:
+            for session_id in [sid for sid in self.indexes if not self.session_exists(sid)]:
+                del self.indexes[session_id]
+    
+    def _append_message(self, session_id, msg):
+        return self._append_messages([(session_id, msg)])[0]
+    
+    def _append_messages(self, items):
+        # 세션 로그마다 한 번에 씀 (묶음에 세션이 여러 개면 세션 수만큼)
+        seqs = []
+        records = {}
+        with self.lock:
+            # 색인의 메시지 수로 다음 seq 결정 (쓰기 잠금 안이라 번호가 겹치지 않음)
+            next_seq = {}
+            for session_id, msg in items:
+                if session_id not in next_seq:
+                    index = self.refresh_index(session_id) if self.session_exists(session_id) else None
+                    next_seq[session_id] = None if index is None else len(index['message_offsets']) + 1
+                seq = next_seq[session_id]
+                if seq is not None:
+                    records.setdefault(session_id, []).append({'kind': 'message', **msg, 'seq': seq})
+                    next_seq[session_id] = seq + 1
+                seqs.append(seq)
+            for session_id, session_records in records.items():
+                self.write_records(session_id, session_records)
+        return seqs
+    
+    def _add_participant(self, session_id, username, joined_at):
+        # 확인과 쓰기를 같은 잠금 안에서 (보관으로 로그가 지워지는 중이면 실패)
+        return self.append_record(session_id, {'kind': 'participant', 'username': username, 'joined_at': joined_at})
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS participants (
+    session_id TEXT NOT NULL,
+    username TEXT NOT NULL,
+    joined_at TEXT NOT NULL,
+    PRIMARY KEY (session_id, username)
+);
+"""
+
+# 메시지 테이블 (timestamp는 'ts'가 없던 예전 레코드용)
+SQLITE_MESSAGES_TABLE = """
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    username TEXT,
+    message TEXT,
+    text TEXT,
+    ts INTEGER,
+    timestamp TEXT,
+    html TEXT,
+    link_count INTEGER,
+    length INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_session_seq ON messages (session_id, seq);
+"""
+
+# 예전 데이터베이스에 없을 수 있는 messages 열 (열 이름, 타입)
+SQLITE_MESSAGE_COLUMNS = (
+    ('ts', 'INTEGER'),
+    ('html', 'TEXT'),
+    ('link_count', 'INTEGER'),
+    ('length', 'INTEGER'),
+)
+
+def migrate_messages_table(conn):
+    """예전 messages 테이블을 현재 스키마로 맞추기"""
+    columns = {row['name']: row for row in conn.execute("PRAGMA table_info(messages)")}
+    if not columns:
+        conn.executescript(SQLITE_MESSAGES_TABLE)
+        return
+    if columns['timestamp']['notnull']:
+        # timestamp가 필수였던 테이블은 제약을 바꿀 수 없으므로 새 테이블로 옮김
+        copied = ', '.join(name for name in columns if name != 'session_id')
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("ALTER TABLE messages RENAME TO messages_old")
+            conn.execute("DROP INDEX IF EXISTS idx_messages_session_seq")
+            for statement in SQLITE_MESSAGES_TABLE.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute(f"INSERT INTO messages (session_id, {copied}) SELECT session_id, {copied} FROM messages_old")
+            conn.execute("DROP TABLE messages_old")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return
+    for name, column_type in SQLITE_MESSAGE_COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE messages ADD COLUMN {name} {column_type}")
+
+class SqlitePool:
+    """여러 스레드가 돌려 쓰는 SQLite 연결 풀 (WAL 모드라 쓰는 동안에도 읽기 가능)"""
+    
+    def __init__(self, path, size=8, synchronous='NORMAL'):
+        self.path = path
+        self.size = size
+        self.synchronous = synchronous
+        self._idle = queue.LifoQueue()
+        with self.connection() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+            migrate_messages_table(conn)
+    
+    def _connect(self):
+        # isolation_level=None: 문장마다 바로 커밋 (문장 하나가 곧 트랜잭션 하나)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL: 체크포인트 때만 fsync, FULL: 커밋마다 WAL을 fsync
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if self._idle.qsize() < self.size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+def row_to_message(row):
+    """messages 테이블 행 → 메시지 레코드 (빈 칸은 빼고)"""
+    return {key: row[key] for key in row.keys() if key != 'session_id' and row[key] is not None}
+
+class SqliteStorage(Storage):
+    """SQLite 저장소 (커서 = 마지막으로 받은 메시지의 seq)"""
+    
+    def __init__(self, path, pool_size=8, fsync=False):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.pool = SqlitePool(path, size=pool_size, synchronous='FULL' if fsync else 'NORMAL')
+    
+    def session_exists(self, session_id):
+        with self.pool.connection() as conn:
+            return conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is not None
+    
+    def _create_session(self, session_id, created_at):
+        with self.pool.connection() as conn:
+            conn.execute("INSERT INTO sessions (id, created_at) VALUES (?, ?)", (session_id, created_at))
+    
+    def _append_message(self, session_id, msg):
+        with self.pool.connection() as conn:
+            return self.insert_message(conn, session_id, msg)
+    
+    def _append_messages(self, items):
+        # 트랜잭션 하나로 (커밋 한 번 = fsync 한 번)
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                seqs = [self.insert_message(conn, session_id, msg) for session_id, msg in items]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return seqs
+    
+    def insert_message(self, conn, session_id, msg):
+        """메시지 한 행 추가 → seq (세션이 있을 때만, seq는 같은 문장 안에서 다음 번호로)"""
+        cursor = conn.execute(
+            """
+            INSERT INTO messages (session_id, seq, id, type, username, message, text, ts, timestamp, html, link_count, length)
+            SELECT :session_id,
+                   (SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE session_id = :session_id),
+                   :id, :type, :username, :message, :text, :ts, :timestamp, :html, :link_count, :length
+            WHERE EXISTS (SELECT 1 FROM sessions WHERE id = :session_id)
+            """,
+            {
+                'session_id': session_id,
+                'id': msg['id'],
+                'type': msg['type'],
+                'username': msg.get('username'),
+                'message': msg.get('message'),
+                'text': msg.get('text'),
+                'ts': msg.get('ts'),
+                'timestamp': msg.get('timestamp'),
+                'html': msg.get('html'),
+                'link_count': msg.get('link_count'),
+                'length': msg.get('length')
+            }
+        )
+        if cursor.rowcount != 1:
+            return None
+        return conn.execute("SELECT seq FROM messages WHERE rowid = ?", (cursor.lastrowid,)).fetchone()['seq']
+    
+    def _add_participant(self, session_id, username, joined_at):
+        with self.pool.connection() as conn:
+            cursor = conn.execute(
+                """
+                INSERT OR REPLACE INTO participants (session_id, username, joined_at)
+                SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM sessions WHERE id = ?)
+                """,
+                (session_id, username, joined_at, session_id)
+            )
+            return cursor.rowcount == 1
+    
+    def _get_session(self, session_id, since=None, limit=None):
+        # 메시지는 (session_id, seq) 인덱스로 since 이후(또는 최근 limit개)만 읽음
+        tail = since is None and limit is not None
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT id, created_at FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            participants = {
+                p['username']: {'joined_at': p['joined_at']}
+                for p in conn.execute("SELECT username, joined_at FROM participants WHERE session_id = ?", (session_id,))
+            }
+            if tail:
+                last_seq = conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                messages, before = self.page_before(conn, session_id, last_seq + 1, limit)
+            else:
+                rows = conn.execute(
+                    "SELECT * FROM messages WHERE session_id = ? AND seq > ? ORDER BY seq",
+                    (session_id, since or 0)
+                ).fetchall()
+                messages = [row_to_message(r) for r in rows]
+        
+        session = {
+            'id': row['id'],
+            'created_at': row['created_at'],
+            'messages': messages,
+            'participants': participants
+        }
+        if tail:
+            session['cursor'] = last_seq
+            session['before'] = before
+        else:
+            session['cursor'] = messages[-1]['seq'] if messages else (since or 0)
+        return session
+    
+    def page_before(self, conn, session_id, before, limit):
+        """seq가 before보다 작은 메시지 최대 limit개 → (메시지 목록, 다음 before 커서)"""
+        rows = conn.execute(
+            "SELECT * FROM messages WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+            (session_id, before, limit)
+        ).fetchall()
+        messages = [row_to_message(r) for r in reversed(rows)]
+        # seq는 1부터 빈틈없이 증가하므로 첫 seq가 1보다 크면 더 이전 메시지가 있음
+        first_seq = messages[0]['seq'] if messages else before
+        return messages, (first_seq if first_seq > 1 else None)
+    
+    def _list_messages_before(self, session_id, before=None, limit=50):
+        with self.pool.connection() as conn:
+            if before is None:
+                before = conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM messages WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+            return self.page_before(conn, session_id, before, limit)
+    
+    def _move_to_archive(self, session_id):
+        with self.pool.connection() as conn:
+            # 쓰기 잠금을 먼저 잡아서 읽은 뒤 지우기 전까지 새 메시지가 끼어들지 않게 함
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                session = self._get_session(session_id)
+                if session is None or not self.archive.write(session):
+                    conn.execute("ROLLBACK")
+                    return False
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM participants WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                conn.execute("COMMIT")
+                return True
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    
+    def _session_activity(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT s.id, s.created_at, MAX(m.ts) AS last_ts
+                FROM sessions s LEFT JOIN messages m ON m.session_id = s.id
+                GROUP BY s.id
+                """
+            ).fetchall()
+        return [
+            (row['id'], row['last_ts'] or message_ts({'timestamp': row['created_at']}) or 0)
+            for row in rows
+        ]
+    
+    def _scan_sessions(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """
+                SELECT s.id, s.created_at, COALESCE(MAX(m.seq), 0) AS message_count
+                FROM sessions s LEFT JOIN messages m ON m.session_id = s.id
+                GROUP BY s.id
+                """
+            ).fetchall()
+        return [(row['id'], row['created_at'], row['message_count']) for row in rows]
+    
+    def _compact(self):
+        # 보관으로 지운 행이 차지하던 공간을 돌려받고 WAL 파일도 비움
+        with self.pool.connection() as conn:
+            # VACUUM도 WAL을 거쳐 쓰므로 체크포인트는 그 다음에
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+class ApiClient:
+    """keep-alive 연결 풀을 공유하는 API 클라이언트
+    
+    wire_format: 세션/메시지 목록 응답 형식 (WIRE_FORMATS, msgpack이 없으면 JSON)
+    compression: 압축된 응답 요청 (zstandard가 있으면 zstd, 없으면 gzip)
+    """
+    
+    def __init__(self, base_url, pool_size=32, retries=2, backoff=0.3, wire_format='auto', compression=True):
+        self.base_url = base_url.rstrip('/')
+        # 연결 오류는 모든 요청에서, 읽기 오류/5xx 응답은 GET에서만 재시도
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        # 서버가 MessagePack을 모르면 JSON으로 답함
+        if msgpack is not None and wire_format != 'json':
+            self.accept = f"{MSGPACK_TYPE}, application/json;q=0.9"
+        else:
+            self.accept = 'application/json'
+        if not compression:
+            self.session.headers['Accept-Encoding'] = 'identity'
+        elif zstandard is not None:
+            self.session.headers['Accept-Encoding'] = 'zstd, gzip'
+    
+    def decode(self, response):
+        """응답 본문 → 객체 (Content-Type을 보고 MessagePack / JSON)
+        
+        gzip은 requests가 풀어 주고, zstd는 urllib3가 풀지 못했으면(backports.zstd 없음) 여기서 풂
+        """
+        body = response.content
+        if response.headers.get('Content-Encoding') == 'zstd' and body.startswith(ZSTD_MAGIC):
+            body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        if response.headers.get('Content-Type', '').startswith(MSGPACK_TYPE):
+            return msgpack.unpackb(body)
+        return json.loads(body)
+    
+    def api_version(self, response):
+        """응답을 보낸 서버의 API 버전 (X-API-Version 헤더가 없던 예전 서버는 1)"""
+        try:
+            return int(response.headers.get('X-API-Version', 1))
+        except ValueError:
+            return 1
+    
+    def get(self, path, **kwargs):
+        return self.session.get(f"{self.base_url}{path}", **kwargs)
+    
+    def post(self, path, **kwargs):
+        return self.session.post(f"{self.base_url}{path}", **kwargs)
+    
+    def pool_stats(self):
+        """연결 풀 통계 (hit = 기존 연결 재사용, miss = 새 연결 생성)"""
+        pools = self.adapter.poolmanager.pools
+        total_requests = 0
+        new_connections = 0
+        for key in pools.keys():
+            pool = pools[key]
+            if pool is not None:
+                total_requests += pool.num_requests
+                new_connections += pool.num_connections
+        hits = max(total_requests - new_connections, 0)
+        return {
+            'requests': total_requests,
+            'hits': hits,
+            'misses': new_connections,
+            'hit_rate': hits / total_requests if total_requests else 0.0
+        }
+
+def messages_since(messages, cursor, since):
+    """커서를 지원하지 않는 서버(전체 기록 응답)도 since 이후 메시지만 남기기"""
+    if cursor is None:
+        cursor = len(messages)
+        messages = messages[since or 0:]
+    return messages, cursor
+
+def message_payload(msg):
+    """API 서버로 보낼 메시지 내용 (시간은 서버가 새로 붙이고, id는 재시도해도 한 번만 추가되도록 그대로)"""
+    if msg['type'] == 'system':
+        return {'id': msg['id'], 'type': 'system', 'text': msg['text']}
+    return {'id': msg['id'], 'username': msg['username'], 'message': msg['message'], 'type': msg['type']}
+
+class HttpStorage(Storage):
+    """API 서버 저장소 (커서 = 이미 받은 메시지 수, 네트워크 오류는 예외로 전달)
+    
+    새 내용 폴링은 조건부 GET: 응답의 ETag를 다음 요청 경로(같은 세션, since = 받은 커서)에 기억해 두고
+    If-None-Match로 보내서, 바뀐 것이 없으면 서버가 본문 없이 304로 답하고 JSON 파싱 없이 빈 결과를 만듦
+    """
+    
+    def __init__(self, client, validator_cache_size=1024):
+        self.client = client
+        # (경로, since) → (ETag, 새 내용이 없을 때의 응답), LRU
+        self.validators = OrderedDict()
+        self.validator_cache_size = validator_cache_size
+        self.validator_lock = threading.Lock()
+        self.conditional_requests = 0
+        self.not_modified = 0
+        # 예전 서버(API 버전 1)가 붙인 메시지 id → 보낸 id, LRU
+        # (예전 서버는 보낸 id를 무시하므로 받아온 메시지를 전송 대기열의 메시지와 맞출 때 씀)
+        self.sent_ids = OrderedDict()
+        self.sent_id_cache_size = 4096
+        self.sent_id_lock = threading.Lock()
+    
+    def _remember_sent_id(self, stored_id, sent_id):
+        with self.sent_id_lock:
+            self.sent_ids[stored_id] = sent_id
+            while len(self.sent_ids) > self.sent_id_cache_size:
+                self.sent_ids.popitem(last=False)
+    
+    def sent_message_ids(self, ids):
+        """받아온 메시지 id 중 예전 서버가 새로 붙인 것은 보낸 id로 바꾼 집합 (API 버전 2 서버면 그대로)"""
+        if not self.sent_ids:
+            return set(ids)
+        with self.sent_id_lock:
+            return {self.sent_ids.get(message_id, message_id) for message_id in ids}
+    
+    def _cached(self, path, since):
+        """(경로, since)에 기억해 둔 (ETag, 응답) (없으면 None)"""
+        with self.validator_lock:
+            entry = self.validators.get((path, since))
+            if entry is not None:
+                self.validators.move_to_end((path, since))
+                self.conditional_requests += 1
+            return entry
+    
+    def _remember(self, path, cursor, response, unchanged):
+        """다음 폴링(since = cursor)이 보낼 ETag와, 바뀐 것이 없을 때 돌려줄 응답 기억"""
+        etag = response.headers.get('ETag')
+        if not etag or cursor is None:
+            return
+        with self.validator_lock:
+            self.validators[(path, cursor)] = (etag, unchanged)
+            self.validators.move_to_end((path, cursor))
+            while len(self.validators) > self.validator_cache_size:
+                self.validators.popitem(last=False)
+    
+    def _get(self, path, params, cached):
+        """GET (기억해 둔 ETag가 있으면 조건부) → 응답, 304면 None"""
+        headers = {'Accept': self.client.accept}
+        if cached is not None:
+            headers['If-None-Match'] = cached[0]
+        response = self.client.get(path, params=params, headers=headers, timeout=5)
+        if response.status_code == 304 and cached is not None:
+            with self.validator_lock:
+                self.not_modified += 1
+            return None
+        return response
+    
+    def validator_stats(self):
+        """조건부 GET 횟수 / 그중 304(바뀐 것 없음) 횟수"""
+        with self.validator_lock:
+            return {
+                'conditional': self.conditional_requests,
+                'not_modified': self.not_modified,
+                'hit_rate': self.not_modified / self.conditional_requests if self.conditional_requests else 0.0
+            }
+    
+    def create_session(self):
+        data = self.client.decode(self.client.post("/api/session", timeout=5))
+        if data.get('success'):
+            return data['session_id']
+        return None
+    
+    def get_session(self, session_id, since=None, limit=None):
+        path = f"/api/session/{session_id}"
+        tail = since is None and limit is not None
+        if tail:
+            params = {'limit': limit}
+        else:
+            params = {} if since is None else {'since': since}
+        cached = self._cached(path, since) if since is not None else None
+        response = self._get(path, params, cached)
+        if response is None:
+            # 바뀐 것 없음: 지난 응답의 세션 정보에 새 메시지 없이
+            return {**cached[1], 'messages': []}
+        data = self.client.decode(response)
+        if not data.get('success'):
+            return None
+        session = data['session']
+        session['messages'], session['cursor'] = messages_since(
+            session.get('messages', []), session.get('cursor'), since
+        )
+        if tail and 'before' not in session:
+            # limit을 모르는 서버는 전체 기록을 주므로 여기서 자름
+            session['messages'], session['before'] = page_before(session['messages'], None, limit)
+        session.setdefault('participants', {})
+        unchanged = {key: value for key, value in session.items() if key not in ('messages', 'before')}
+        self._remember(path, session['cursor'], response, unchanged)
+        return session
+    
+    def list_messages_before(self, session_id, before=None, limit=50):
+        params = {'limit': limit} if before is None else {'before': before, 'limit': limit}
+        response = self.client.get(
+            f"/api/session/{session_id}/messages", params=params, headers={'Accept': self.client.accept}, timeout=5
+        )
+        data = self.client.decode(response)
+        if not data.get('success'):
+            return [], None
+        if 'before' not in data:
+            # before를 모르는 서버는 전체 기록을 주므로 여기서 자름
+            return page_before(data['messages'], before, limit)
+        return data['messages'], data['before']
+    
+    def list_messages(self, session_id, since=None):
+        path = f"/api/session/{session_id}/messages"
+        params = {} if since is None else {'since': since}
+        cached = self._cached(path, since) if since is not None else None
+        response = self._get(path, params, cached)
+        if response is None:
+            return [], since
+        data = self.client.decode(response)
+        if not data.get('success'):
+            return [], since
+        messages, cursor = messages_since(data['messages'], data.get('cursor'), since)
+        self._remember(path, cursor, response, None)
+        return messages, cursor
+    
+    def append_message(self, session_id, msg):
+        response = self.client.post(f"/api/session/{session_id}/message", json=message_payload(msg), timeout=5)
+        data = self.client.decode(response)
+        if data.get('success') and self.client.api_version(response) < 2:
+            # 예전 서버는 보낸 id 대신 새 id를 붙여서 저장하고 저장한 메시지를 돌려줌
+            stored_id = (data.get('message') or {}).get('id')
+            if stored_id and stored_id != msg['id']:
+                self._remember_sent_id(stored_id, msg['id'])
+        return data.get('success', False)
+    
+    def append_messages(self, items):
+        # 요청 하나로 보내고 메시지별 결과를 받음
+        payload = {'messages': [{'session_id': session_id, **message_payload(msg)} for session_id, msg in items]}
+        response = self.client.post("/api/messages", json=payload, timeout=10)
+        if response.status_code == 404 and self.client.api_version(response) < 2:
+            # 묶음 요청을 모르는 서버면 하나씩
+            return [self.append_message(session_id, msg) for session_id, msg in items]
+        data = self.client.decode(response)
+        if not data.get('success'):
+            return [False] * len(items)
+        return [result.get('success', False) for result in data['results']]
+    
+    def add_participant(self, session_id, username):
+        # 입장 시스템 메시지는 서버가 추가
+        response = self.client.post(f"/api/session/{session_id}/participant", json={'username': username}, timeout=5)
+        return self.client.decode(response).get('success', False)
+    
+    def session_info(self, session_id):
+        # 서버가 세션 목록에서 바로 답함 (메시지는 받지 않음)
+        response = self.client.get(f"/api/session/{session_id}/info", timeout=5)
+        if response.status_code == 404 and self.client.api_version(response) < 2:
+            # info를 모르는 서버면 최근 0개짜리 세션 정보로 (예전 서버는 없는 세션도 404라서 구분하지 않음)
+            return super().session_info(session_id)
+        data = self.client.decode(response)
+        if data.get('success'):
+            return data['info']
+        return None
+    
+    def session_exists(self, session_id):
+        info = self.session_info(session_id)
+        return info is not None and info['state'] == 'active'
+    
+    def is_archived(self, session_id):
+        info = self.session_info(session_id)
+        return info is not None and info['state'] == 'archived'
+    
+    def archive_session(self, session_id):
+        # 보관(압축 파일 저장)과 보관된 세션 읽기는 서버가 처리
+        response = self.client.post(f"/api/session/{session_id}/archive", timeout=10)
+        return self.client.decode(response).get('success', False)
+    
+    def archive_idle_sessions(self, max_idle_seconds):
+        # 유휴 세션 보관은 서버가 직접 함 (server.py --archive-idle)
+        return []
+
+def create_storage(backend, data_dir=DATA_DIR, api_server=None, api_client=None, fsync=False):
+    """저장 방식 이름으로 저장소 만들기 (fsync: 쓰기마다 디스크까지 내려보냄, 파일 저장 방식만)"""
+    data_dir = Path(data_dir)
+    if backend == 'http':
+        return HttpStorage(api_client or ApiClient(api_server or "http://localhost:5000"))
+    if backend == 'json':
+        storage = JsonFileStorage(data_dir / "sessions.json", fsync=fsync)
+    elif backend == 'log':
+        storage = LogStorage(data_dir / "sessions", fsync=fsync)
+    elif backend == 'memory':
+        storage = MemoryStorage()
+    elif backend == 'sqlite':
+        storage = SqliteStorage(data_dir / "chat.db", fsync=fsync)
+    else:
+        raise ValueError(f"알 수 없는 저장 방식: {backend} (가능한 값: {', '.join(STORAGE_BACKENDS)})")
+    storage.archive = SessionArchive(data_dir / "archive")
+    # memory는 재시작하면 세션이 사라지므로 색인도 메모리에만
+    storage.index = SessionIndex(None if backend == 'memory' else data_dir / f"index-{backend}.jsonl")
+    if not storage.index.loaded:
+        storage.rebuild_index()
+    else:
+        storage.recount_index()
+    return storage
+
+class PendingWrite:
+    """WriteCoalescer에 넣은 메시지 하나 (묶음이 쓰이면 결과가 채워짐)"""
+    
+    def __init__(self, session_id, msg):
+        self.session_id = session_id
+        self.msg = msg
+        self.done = threading.Event()
+        self.ok = False
+        self.error = None
+    
+    def result(self):
+        """묶음이 쓰일 때까지 기다림 → 성공 여부 (쓰기 오류는 그대로 예외로)"""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.ok
+
+class WriteCoalescer:
+    """동시에 들어온 메시지 추가를 모아서 저장소 쓰기 한 번으로 처리 (group commit)
+    
+    쉬고 있던 쓰기 스레드가 첫 메시지를 받으면 max_delay초 동안(또는 max_batch개가 찰 때까지) 더 모은 뒤
+    storage.append_messages로 한 번에 씀. 쓰는 동안 밀린 메시지는 기다리지 않고 다음 묶음이 됨.
+    보낸 쪽은 자기 메시지가 쓰일 때까지 기다렸다가 메시지별 결과를 받음.
+    """
+    
+    def __init__(self, storage, max_delay=0.005, max_batch=64):
+        self.storage = storage
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.messages = 0
+        threading.Thread(target=self._run, name="write-coalescer", daemon=True).start()
+    
+    def append(self, session_id, msg):
+        """메시지 추가 (묶음이 쓰일 때까지 기다림) → 성공 여부"""
+        pending = PendingWrite(session_id, msg)
+        self.queue.put(pending)
+        return pending.result()
+    
+    def stats(self):
+        """쓴 묶음 수 / 메시지 수 / 묶음당 평균 메시지 수"""
+        with self.lock:
+            return {
+                'batches': self.batches,
+                'messages': self.messages,
+                'avg_batch': self.messages / self.batches if self.batches else 0.0
+            }
+    
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            # 앞 묶음을 쓰는 동안 밀린 메시지는 기다리지 않고 바로 묶음으로
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if len(batch) == 1:
+                # 쉬다가 깨어났으면 뒤따라오는 메시지를 max_delay 동안 더 모음
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                    except queue.Empty:
+                        break
+            self._commit(batch)
+    
+    def _commit(self, batch):
+        try:
+            results = self.storage.append_messages([(pending.session_id, pending.msg) for pending in batch])
+        except Exception as e:
+            # 묶음 전체가 실패하면 모두에게 같은 오류
+            results = [False] * len(batch)
+            for pending in batch:
+                pending.error = e
+        for pending, ok in zip(batch, results):
+            pending.ok = ok
+            pending.done.set()
+        with self.lock:
+            self.batches += 1
+            self.messages += len(batch)